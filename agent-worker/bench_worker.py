@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark the agent worker loop against a local queue backend.
+
+For each concurrency setting, enqueues N synthetic tasks into a fresh queue
+(in-memory or SQLite), runs one or more worker loops (run_worker) with a
+handler that sleeps --work-ms, and reports:
+
+  tasks/s        completed tasks over wall time, first enqueue to last completion
+  pickup p50/p99 enqueue -> handler start (claim + notify + scheduling latency)
+  e2e p50/p99    enqueue -> result stored
+  calls/task     claim + result-write calls to the backend per task (coalescing
+                 brings this well below the two of claim-one, write-one)
+
+--rtt-ms adds a simulated network round trip to every claim and result write,
+which is what dominates against a hosted database such as Supabase.
+
+Tasks are enqueued as a burst after the workers are up (--rate 0), or at a
+steady --rate tasks/s to measure pickup latency of an idle-ish worker.
+
+Examples:
+  python bench_worker.py
+  python bench_worker.py --backend sqlite --tasks 2000 --concurrency 1,8,32 --replicas 2
+  python bench_worker.py --rate 50 --work-ms 20
+  python bench_worker.py --rtt-ms 30 --write-batch 1   # uncoalesced writes, for comparison
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("WORKER_NOTIFY", "realtime")  # local queues push notifications in-process
+
+from task_queue import InMemoryTaskQueue, SQLiteTaskQueue  # noqa: E402
+from worker import run_worker  # noqa: E402
+
+
+class _TimedQueue:
+    """
+    Wraps a queue to count backend calls (each delayed by rtt seconds) and
+    record when each task's result is stored
+    """
+
+    def __init__(self, queue, completed_at, done, rtt=0.0):
+        self._queue = queue
+        self._completed_at = completed_at
+        self._done = done
+        self._rtt = rtt
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self._queue, name)
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+        if self._rtt:
+            time.sleep(self._rtt)
+
+    def claim(self, limit, worker_id, lease_seconds):
+        if limit <= 0:
+            return []  # no free slots: the backends return without a round trip
+        self._count()
+        return self._queue.claim(limit, worker_id, lease_seconds)
+
+    def finish_many(self, results, worker_id):
+        self._count()
+        stored = self._queue.finish_many(results, worker_id)
+        now = time.perf_counter()
+        for task_id, _, _ in results:
+            self._completed_at[task_id] = now
+            self._done.release()
+        return stored
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_once(backend, tasks, concurrency, replicas, work_ms, rate, write_batch, flush_ms, rtt_ms, tmp):
+    if backend == "sqlite":
+        queue = SQLiteTaskQueue(os.path.join(tmp, f"bench-{concurrency}-{replicas}.sqlite3"))
+    else:
+        queue = InMemoryTaskQueue()
+
+    started_at = {}
+    completed_at = {}
+    done = threading.Semaphore(0)
+    timed = _TimedQueue(queue, completed_at, done, rtt_ms / 1000)
+
+    def handler(task):
+        started_at[task["id"]] = time.perf_counter()
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        return {"answer": "ok"}
+
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=run_worker, name=f"bench-worker-{i}", kwargs=dict(
+            queue=timed, handler=handler, stop=stop, concurrency=concurrency,
+            batch_size=concurrency, worker_id=f"bench-{i}", verbose=False,
+            write_batch_size=write_batch, write_flush_interval=flush_ms / 1000,
+        ))
+        for i in range(replicas)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.2)  # let the loops reach their first wait
+
+    enqueued_at = {}
+    begin = time.perf_counter()
+    for i in range(tasks):
+        if rate:
+            delay = begin + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        now = time.perf_counter()
+        enqueued_at[queue.enqueue({"prompt": f"bench task {i}"})] = now
+
+    for _ in range(tasks):
+        done.acquire()
+    elapsed = max(completed_at.values()) - begin
+    calls = timed.calls
+
+    stop.set()
+    queue.notify()
+    for worker in workers:
+        worker.join()
+    queue.close()
+
+    pickup = [(started_at[t] - enqueued_at[t]) * 1000 for t in enqueued_at]
+    e2e = [(completed_at[t] - enqueued_at[t]) * 1000 for t in enqueued_at]
+    return tasks / elapsed, pickup, e2e, calls / tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--tasks", type=int, default=1000, help="tasks per run")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated WORKER_CONCURRENCY values")
+    parser.add_argument("--replicas", type=int, default=1, help="worker loops sharing the queue")
+    parser.add_argument("--work-ms", type=float, default=5.0, help="simulated handler time per task")
+    parser.add_argument("--rate", type=float, default=0.0, help="enqueue rate in tasks/s (0 = one burst)")
+    parser.add_argument("--write-batch", type=int, default=100, help="WORKER_WRITE_BATCH_SIZE (1 = no coalescing)")
+    parser.add_argument("--flush-ms", type=float, default=200.0, help="WORKER_WRITE_FLUSH_INTERVAL in ms")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated round trip per backend call")
+    args = parser.parse_args()
+
+    print(f"backend={args.backend} tasks={args.tasks} replicas={args.replicas} "
+          f"work={args.work_ms:g}ms rate={'burst' if not args.rate else f'{args.rate:g}/s'} "
+          f"write-batch={args.write_batch} flush={args.flush_ms:g}ms rtt={args.rtt_ms:g}ms")
+    print(f"{'concurrency':>11}  {'tasks/s':>9}  {'pickup p50':>10}  {'pickup p99':>10}  "
+          f"{'e2e p50':>9}  {'e2e p99':>9}  {'calls/task':>10}  (latencies in ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+            throughput, pickup, e2e, calls = run_once(args.backend, args.tasks, concurrency, args.replicas,
+                                                      args.work_ms, args.rate, args.write_batch, args.flush_ms,
+                                                      args.rtt_ms, tmp)
+            print(f"{concurrency:>11}  {throughput:>9.1f}  {percentile(pickup, 50):>10.2f}  "
+                  f"{percentile(pickup, 99):>10.2f}  {percentile(e2e, 50):>9.2f}  {percentile(e2e, 99):>9.2f}  "
+                  f"{calls:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
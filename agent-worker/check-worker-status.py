@@ -1,89 +1,387 @@
 #!/usr/bin/env python3
-"""Check the status of worker processes and recent tasks"""
+"""
+Check the status of worker processes and recent tasks
 
+  python check-worker-status.py              summary plus recent, pending and processing tasks
+  python check-worker-status.py --summary    counts and percentiles only
+  python check-worker-status.py --watch 5    live dashboard, refreshed every 5 seconds
+
+Counts and percentiles come from the agent_task_status_summary RPC (migration
+20260110040000), so nothing is counted by downloading rows. Completed/failed
+totals are planner estimates unless --exact. Task lists select only the
+columns they print (the prompt and answer are extracted server side, never the
+whole payloads), and --watch fetches only rows whose updated_at moved past the
+last refresh.
+"""
+
+import argparse
 import os
+import time
 from dotenv import load_dotenv
 from supabase import create_client
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 
 load_dotenv()
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_KEY")
-
-if not url or not key:
-    print("❌ Error: Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
-    exit(1)
-
-supabase = create_client(url, key)
-
-print("=" * 60)
-print("🔍 AGENT WORKER STATUS CHECK")
-print("=" * 60)
-
-# Check recent tasks
-print("\n📋 Recent Tasks (last 10):")
-recent_tasks = supabase.table("agent_task_requests").select("*").order("created_at", desc=True).limit(10).execute()
-
-if not recent_tasks.data:
-    print("   No tasks found in database")
-else:
-    for task in recent_tasks.data:
-        prompt = task.get('request_payload', {}).get('prompt', 'N/A')
-        created = datetime.fromisoformat(task['created_at'].replace('Z', '+00:00'))
-        updated = datetime.fromisoformat(task['updated_at'].replace('Z', '+00:00'))
-        duration = (updated - created).total_seconds()
-        
-        status_icon = {
-            'pending': '⏳',
-            'processing': '⚙️',
-            'completed': '✅',
-            'failed': '❌'
-        }.get(task['status'], '❓')
-        
-        print(f"\n   {status_icon} Task: {task['id'][:8]}...")
-        print(f"      Status: {task['status']}")
-        print(f"      Prompt: {prompt[:50]}...")
-        print(f"      Created: {created.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"      Updated: {updated.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"      Duration: {duration:.2f}s")
-        
-        if task.get('response_payload'):
-            answer = task['response_payload'].get('answer', 'N/A')
-            print(f"      Response: {answer[:50]}...")
-
-# Check pending tasks
-print("\n\n⏳ Pending Tasks:")
-pending_tasks = supabase.table("agent_task_requests").select("*").eq("status", "pending").execute()
-
-if not pending_tasks.data:
-    print("   ✅ No pending tasks - worker is caught up!")
-else:
-    print(f"   ⚠️  Found {len(pending_tasks.data)} pending task(s):")
-    for task in pending_tasks.data:
-        prompt = task.get('request_payload', {}).get('prompt', 'N/A')
-        created = datetime.fromisoformat(task['created_at'].replace('Z', '+00:00'))
-        age_seconds = (datetime.now(created.tzinfo) - created).total_seconds()
-        print(f"      - {task['id'][:8]}... | Age: {age_seconds:.0f}s | Prompt: {prompt[:40]}...")
-
-# Check for stuck processing tasks
-print("\n\n⚙️  Processing Tasks (might be stuck):")
-processing_tasks = supabase.table("agent_task_requests").select("*").eq("status", "processing").execute()
-
-if not processing_tasks.data:
-    print("   ✅ No stuck processing tasks")
-else:
-    print(f"   ⚠️  Found {len(processing_tasks.data)} task(s) stuck in 'processing' state:")
-    for task in processing_tasks.data:
-        prompt = task.get('request_payload', {}).get('prompt', 'N/A')
-        created = datetime.fromisoformat(task['created_at'].replace('Z', '+00:00'))
-        age_seconds = (datetime.now(created.tzinfo) - created).total_seconds()
-        print(f"      - {task['id'][:8]}... | Age: {age_seconds:.0f}s | Prompt: {prompt[:40]}...")
-        if age_seconds > 60:
-            print(f"         ⚠️  This task has been processing for {age_seconds:.0f} seconds - might be stuck!")
-
-print("\n" + "=" * 60)
-print("💡 TIP: If you don't see worker output, restart it with:")
-print("   python worker.py")
-print("=" * 60)
+TABLE_NAME = "agent_task_requests"
+SUMMARY_RPC = "agent_task_status_summary"
+STATUSES = ("pending", "processing", "completed", "failed")
+STATUS_ICONS = {
+    'pending': '⏳',
+    'processing': '⚙️',
+    'completed': '✅',
+    'failed': '❌'
+}
+
+# Only what the listings print; prompt/answer are pulled out of the JSON payloads by PostgREST
+LIST_COLUMNS = "id,status,created_at,updated_at,prompt:request_payload->>prompt,answer:response_payload->>answer"
+OPEN_COLUMNS = "id,status,created_at,updated_at,claimed_by,lease_expires_at,attempts,prompt:request_payload->>prompt"
+LEGACY_OPEN_COLUMNS = "id,status,created_at,updated_at,prompt:request_payload->>prompt"
+WATCH_COLUMNS = "id,status,created_at,updated_at"
+
+# Rows committed just behind the watermark (clock skew, long transactions) are re-read
+WATERMARK_OVERLAP_SECONDS = 2.0
+
+
+def parse_ts(value):
+    """Parse a PostgREST timestamp (any fractional-second precision, Z or offset)"""
+    if value is None:
+        return None
+    value = value.replace('Z', '+00:00')
+    if '.' in value:
+        head, rest = value.split('.', 1)
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        value = f"{head}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def fmt_seconds(value):
+    if value is None:
+        return "-"
+    if value >= 3600:
+        return f"{value / 3600:.1f}h"
+    if value >= 60:
+        return f"{value / 60:.1f}m"
+    return f"{value:.1f}s"
+
+
+def _is_missing(e):
+    text = str(e)
+    return "PGRST202" in text or "Could not find the function" in text or "42703" in text
+
+
+def fetch_summary(supabase, window_seconds, exact):
+    """Per-status rows from the summary RPC, or exact per-status head counts when it is not deployed"""
+    try:
+        return supabase.rpc(SUMMARY_RPC, {
+            "p_window_seconds": window_seconds,
+            "p_exact_totals": exact,
+        }).execute().data or []
+    except Exception as e:
+        if not _is_missing(e):
+            raise
+    # Fallback: count=exact with head=True returns only the count, never rows
+    rows = []
+    for status in STATUSES:
+        result = supabase.table(TABLE_NAME).select("id", count="exact", head=True).eq("status", status).execute()
+        rows.append({"status": status, "task_count": result.count or 0, "count_is_estimate": False})
+    return rows
+
+
+def print_summary(rows, window_seconds):
+    print(f"\n📊 Task Summary (end-to-end times, created to finished, over the last {fmt_seconds(window_seconds)}):")
+    print(f"   {'status':<12} {'count':>10}  {'age p50':>8} {'age p95':>8} {'age max':>8}  "
+          f"{'recent':>7} {'e2e p50':>8} {'e2e p95':>8} {'e2e p99':>8}")
+    for row in sorted(rows, key=lambda r: STATUSES.index(r["status"]) if r["status"] in STATUSES else 99):
+        count = f"{'~' if row.get('count_is_estimate') else ''}{row.get('task_count', 0)}"
+        print(f"   {STATUS_ICONS.get(row['status'], '❓')} {row['status']:<10} {count:>10}  "
+              f"{fmt_seconds(row.get('age_p50_seconds')):>8} {fmt_seconds(row.get('age_p95_seconds')):>8} "
+              f"{fmt_seconds(row.get('age_max_seconds')):>8}  "
+              f"{row.get('recent_count', '-'):>7} "
+              f"{fmt_seconds(row.get('end_to_end_p50_seconds')):>8} {fmt_seconds(row.get('end_to_end_p95_seconds')):>8} "
+              f"{fmt_seconds(row.get('end_to_end_p99_seconds')):>8}")
+    expired = sum(row.get('expired_leases') or 0 for row in rows)
+    if expired:
+        print(f"   ⚠️  {expired} processing task(s) have an expired lease - a worker's reaper will requeue them")
+
+
+def fetch_open(supabase, status, limit):
+    """Oldest `limit` tasks in an open status, narrow columns (lease columns when they exist)"""
+    query = lambda columns: supabase.table(TABLE_NAME).select(columns).eq("status", status) \
+        .order("created_at").limit(limit).execute().data
+    try:
+        return query(OPEN_COLUMNS)
+    except Exception as e:
+        if not _is_missing(e):
+            raise
+        return query(LEGACY_OPEN_COLUMNS)
+
+
+def print_details(supabase, summary, limit):
+    counts = {row["status"]: row.get("task_count", 0) for row in summary}
+    now = datetime.now(timezone.utc)
+
+    # Check recent tasks
+    print(f"\n📋 Recent Tasks (last {min(limit, 10)}):")
+    recent_tasks = supabase.table(TABLE_NAME).select(LIST_COLUMNS).order("created_at", desc=True) \
+        .limit(min(limit, 10)).execute()
+
+    if not recent_tasks.data:
+        print("   No tasks found in database")
+    else:
+        for task in recent_tasks.data:
+            created = parse_ts(task['created_at'])
+            updated = parse_ts(task['updated_at'])
+            duration = (updated - created).total_seconds()
+            print(f"\n   {STATUS_ICONS.get(task['status'], '❓')} Task: {task['id'][:8]}...")
+            print(f"      Status: {task['status']}")
+            print(f"      Prompt: {(task.get('prompt') or 'N/A')[:50]}...")
+            print(f"      Created: {created.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"      Updated: {updated.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"      Duration: {duration:.2f}s")
+            if task.get('answer'):
+                print(f"      Response: {task['answer'][:50]}...")
+
+    # Check pending tasks
+    print("\n\n⏳ Pending Tasks:")
+    pending = fetch_open(supabase, "pending", limit) if counts.get("pending") else []
+    if not pending:
+        print("   ✅ No pending tasks - worker is caught up!")
+    else:
+        shown = f" (oldest {len(pending)} shown)" if counts["pending"] > len(pending) else ""
+        print(f"   ⚠️  Found {counts['pending']} pending task(s){shown}:")
+        for task in pending:
+            age_seconds = (now - parse_ts(task['created_at'])).total_seconds()
+            print(f"      - {task['id'][:8]}... | Age: {age_seconds:.0f}s | Prompt: {(task.get('prompt') or 'N/A')[:40]}...")
+
+    # Check for stuck processing tasks
+    print("\n\n⚙️  Processing Tasks (might be stuck):")
+    processing = fetch_open(supabase, "processing", limit) if counts.get("processing") else []
+    if not processing:
+        print("   ✅ No stuck processing tasks")
+    else:
+        shown = f" (oldest {len(processing)} shown)" if counts["processing"] > len(processing) else ""
+        print(f"   ⚠️  Found {counts['processing']} task(s) in 'processing' state{shown}:")
+        for task in processing:
+            age_seconds = (now - parse_ts(task['created_at'])).total_seconds()
+            print(f"      - {task['id'][:8]}... | Age: {age_seconds:.0f}s | Prompt: {(task.get('prompt') or 'N/A')[:40]}...")
+            if task.get('lease_expires_at'):
+                # Leased task: the owning worker heartbeats, and a reaper requeues it once the lease lapses
+                remaining = (parse_ts(task['lease_expires_at']) - now).total_seconds()
+                print(f"         Worker: {task.get('claimed_by')} | Attempt: {task.get('attempts')} | Lease: {remaining:.0f}s left")
+                if remaining < 0:
+                    print(f"         ⚠️  Lease expired {-remaining:.0f}s ago - a worker's reaper will requeue it")
+            elif age_seconds > 60:
+                print(f"         ⚠️  This task has been processing for {age_seconds:.0f} seconds - might be stuck!")
+
+
+class StatusWatcher:
+    """
+    Incremental dashboard state. Starts from one summary and the (small) set of
+    open tasks, then applies only rows whose updated_at is past the watermark:
+    pending/processing counts and ages come from the open set, completed/failed
+    totals from the baseline plus observed transitions. Every `resync_every`
+    refreshes the summary is re-read to correct drift (e.g. rows edited by hand).
+    """
+
+    def __init__(self, supabase, window_seconds, exact, page_size=1000, resync_every=60):
+        self.supabase = supabase
+        self.window_seconds = window_seconds
+        self.exact = exact
+        self.page_size = page_size
+        self.resync_every = resync_every
+        self.refreshes = 0
+        self.rows_fetched = 0
+        self.watermark = None
+        self.seen = {}       # id -> updated_at of rows read in the overlap window
+        self.open = {}       # id -> {status, created_at}
+        self.totals = {}
+        self.estimated = set()
+        self.recent = []     # (finished_at, status, end-to-end seconds) of transitions seen while watching
+        self.changes = []    # newest changes first, for the activity feed
+
+    def resync(self):
+        summary = fetch_summary(self.supabase, self.window_seconds, self.exact)
+        self.totals = {row["status"]: row.get("task_count", 0) for row in summary}
+        self.estimated = {row["status"] for row in summary if row.get("count_is_estimate")}
+        self.open = {}
+        watermark = None
+        for status in ("pending", "processing"):
+            offset = 0
+            while True:
+                rows = self.supabase.table(TABLE_NAME).select(WATCH_COLUMNS).eq("status", status) \
+                    .order("created_at").range(offset, offset + self.page_size - 1).execute().data or []
+                self.rows_fetched += len(rows)
+                for row in rows:
+                    self.open[row["id"]] = {"status": row["status"], "created_at": parse_ts(row["created_at"])}
+                    updated = parse_ts(row["updated_at"])
+                    watermark = updated if watermark is None or updated > watermark else watermark
+                if len(rows) < self.page_size:
+                    break
+                offset += self.page_size
+        latest = self.supabase.table(TABLE_NAME).select("updated_at").order("updated_at", desc=True) \
+            .limit(1).execute().data
+        if latest:
+            updated = parse_ts(latest[0]["updated_at"])
+            watermark = updated if watermark is None or updated > watermark else watermark
+        self.watermark = watermark or datetime.now(timezone.utc)
+        # Rows in the overlap window are already reflected in the summary and open set
+        since = datetime.fromtimestamp(self.watermark.timestamp() - WATERMARK_OVERLAP_SECONDS, timezone.utc)
+        self.seen = {}
+        for rows in self._pages_since(since.isoformat(), "id,updated_at"):
+            self.seen.update((row["id"], row["updated_at"]) for row in rows)
+
+    def _pages_since(self, since_iso, columns):
+        """
+        Pages of rows with updated_at >= since_iso in (updated_at, id) order. Each page
+        continues after the last row's (updated_at, id), so a burst of rows sharing one
+        timestamp still makes progress, and paging stops only at a short page.
+        """
+        after = None
+        while True:
+            query = self.supabase.table(TABLE_NAME).select(columns)
+            if after is None:
+                query = query.gte("updated_at", since_iso)
+            else:
+                updated, task_id = after
+                query = query.or_(f'updated_at.gt."{updated}",and(updated_at.eq."{updated}",id.gt.{task_id})')
+            rows = query.order("updated_at").order("id").limit(self.page_size).execute().data or []
+            self.rows_fetched += len(rows)
+            if rows:
+                yield rows
+            if len(rows) < self.page_size:
+                return
+            after = (rows[-1]["updated_at"], rows[-1]["id"])
+
+    def poll(self):
+        """Apply rows changed since the watermark; returns how many changed"""
+        since = self.watermark.timestamp() - WATERMARK_OVERLAP_SECONDS
+        changed = 0
+        for rows in self._pages_since(datetime.fromtimestamp(since, timezone.utc).isoformat(), WATCH_COLUMNS):
+            fresh = [row for row in rows if self.seen.get(row["id"]) != row["updated_at"]]
+            for row in fresh:
+                self.apply(row)
+                self.seen[row["id"]] = row["updated_at"]
+            changed += len(fresh)
+            self.watermark = max(self.watermark, parse_ts(rows[-1]["updated_at"]))
+        # Forget rows that fell out of the overlap window
+        horizon = self.watermark.timestamp() - WATERMARK_OVERLAP_SECONDS
+        self.seen = {task_id: ts for task_id, ts in self.seen.items() if parse_ts(ts).timestamp() >= horizon}
+        return changed
+
+    def apply(self, row):
+        previous = self.open.pop(row["id"], None)
+        created = parse_ts(row["created_at"])
+        if previous is not None and previous["status"] == row["status"]:
+            # Same status (e.g. a lease heartbeat bumped updated_at): nothing to count
+            self.open[row["id"]] = previous
+            return
+        self.changes.insert(0, (row, previous["status"] if previous else None))
+        del self.changes[20:]
+        if previous is not None:
+            self.totals[previous["status"]] = max(self.totals.get(previous["status"], 0) - 1, 0)
+        elif row["status"] in ("completed", "failed") and created < self.watermark:
+            # Already-finished row touched again, or one finished before it was ever seen open:
+            # unknown previous status, so leave totals to the next resync
+            return
+        if row["status"] in ("pending", "processing"):
+            self.open[row["id"]] = {"status": row["status"], "created_at": created}
+        else:
+            updated = parse_ts(row["updated_at"])
+            self.recent.append((updated, row["status"], (updated - created).total_seconds()))
+        self.totals[row["status"]] = self.totals.get(row["status"], 0) + 1
+
+    def render(self):
+        now = datetime.now(timezone.utc)
+        cutoff = now.timestamp() - self.window_seconds
+        self.recent = [entry for entry in self.recent if entry[0].timestamp() >= cutoff]
+
+        print("\033[2J\033[H", end="")
+        print("=" * 60)
+        print(f"🔍 AGENT WORKER STATUS - {now.astimezone().strftime('%H:%M:%S')} "
+              f"(refresh #{self.refreshes}, {self.rows_fetched} rows read)")
+        print("=" * 60)
+        print(f"\n   {'status':<12} {'count':>10}  {'age p50':>8} {'age p95':>8} {'age max':>8}  "
+              f"{'finished':>8} {'e2e p50':>8} {'e2e p95':>8}")
+        for status in STATUSES:
+            count = f"{'~' if status in self.estimated else ''}{self.totals.get(status, 0)}"
+            ages = [(now - task["created_at"]).total_seconds() for task in self.open.values() if task["status"] == status]
+            end_to_end = [seconds for _, s, seconds in self.recent if s == status]
+            print(f"   {STATUS_ICONS[status]} {status:<10} {count:>10}  "
+                  f"{fmt_seconds(percentile(ages, 50)):>8} {fmt_seconds(percentile(ages, 95)):>8} "
+                  f"{fmt_seconds(max(ages) if ages else None):>8}  "
+                  f"{(len(end_to_end) if status in ('completed', 'failed') else '-'):>8} "
+                  f"{fmt_seconds(percentile(end_to_end, 50)):>8} {fmt_seconds(percentile(end_to_end, 95)):>8}")
+        print(f"\n   finished / end-to-end (created to finished, queue wait included): since watching started, "
+              f"last {fmt_seconds(self.window_seconds)}")
+
+        print("\n📋 Latest changes:")
+        if not self.changes:
+            print("   (none yet)")
+        for row, previous in self.changes[:10]:
+            transition = f"{previous} → {row['status']}" if previous else row['status']
+            print(f"   {STATUS_ICONS.get(row['status'], '❓')} {row['id'][:8]}... {transition:<24} "
+                  f"{parse_ts(row['updated_at']).astimezone().strftime('%H:%M:%S')}")
+
+    def run(self, interval):
+        self.resync()
+        while True:
+            self.refreshes += 1
+            if self.refreshes % self.resync_every == 0:
+                self.resync()
+            else:
+                self.poll()
+            self.render()
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summary", action="store_true", help="counts and percentiles only, no task lists")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="refresh a live dashboard every SECONDS")
+    parser.add_argument("--window", type=int, default=3600, help="seconds of finished tasks for end-to-end percentiles")
+    parser.add_argument("--exact", action="store_true", help="exact completed/failed totals (full count)")
+    parser.add_argument("--limit", type=int, default=20, help="max pending/processing tasks listed")
+    args = parser.parse_args()
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+
+    if not url or not key:
+        print("❌ Error: Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
+        exit(1)
+
+    supabase = create_client(url, key)
+
+    if args.watch:
+        try:
+            StatusWatcher(supabase, args.window, args.exact).run(args.watch)
+        except KeyboardInterrupt:
+            print()
+        return
+
+    print("=" * 60)
+    print("🔍 AGENT WORKER STATUS CHECK")
+    print("=" * 60)
+
+    summary = fetch_summary(supabase, args.window, args.exact)
+    print_summary(summary, args.window)
+    if not args.summary:
+        print_details(supabase, summary, args.limit)
+
+    print("\n" + "=" * 60)
+    print("💡 TIP: If you don't see worker output, restart it with:")
+    print("   python worker.py")
+    print("=" * 60)
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Coalesced result writes for the agent worker.
+
+Storing each task's result as it finishes costs one round trip per task. The
+StatusWriter buffers final statuses and response payloads instead and stores
+them with one TaskQueue.finish_many() call per batch of up to max_batch. A
+flush happens when:
+
+- max_batch results are buffered
+- the oldest buffered result has waited max_delay seconds
+- flush() or close() is called (close() drains everything before returning)
+
+Ordering: a single flusher applies batches in submission order, and a second
+write for a task already in the buffer first flushes the buffer, so writes for
+one task are never reordered or merged. With max_batch=1 every result is
+written as soon as it is submitted.
+
+A failed flush keeps its results at the front of the buffer and is retried on
+the next flush; results still unwritten after close()'s retries are reported.
+"""
+
+import threading
+import time
+
+
+class StatusWriter:
+    """Buffers (task_id, status, response_payload) results and stores them in batches"""
+
+    def __init__(self, queue, worker_id, max_batch=100, max_delay=0.2, close_retries=3):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.max_batch = max(int(max_batch), 1)
+        self.max_delay = max(float(max_delay), 0.0)
+        self.close_retries = close_retries
+        self.flushes = 0
+        self.written = 0
+        self._buffer = {}  # task_id -> (status, payload, on_stored); dicts keep insertion order
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flusher at a time keeps batches in order
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+        self._thread.start()
+
+    def complete(self, task_id, response_payload, on_stored=None):
+        self._submit(task_id, "completed", response_payload, on_stored)
+
+    def fail(self, task_id, error, on_stored=None):
+        self._submit(task_id, "failed", {"error": error}, on_stored)
+
+    def _submit(self, task_id, status, payload, on_stored):
+        """`on_stored(stored)` is called after the flush; stored is False when the lease was lost"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("StatusWriter is closed")
+            conflict = task_id in self._buffer
+        if conflict:
+            self.flush()
+        with self._cond:
+            self._buffer[task_id] = (status, payload, on_stored)
+            if self._oldest is None:
+                # First result of a batch: start the flusher's max_delay clock
+                self._oldest = time.monotonic()
+                self._cond.notify_all()
+            elif len(self._buffer) >= self.max_batch:
+                self._cond.notify_all()
+        if self.max_batch == 1:
+            self.flush()
+
+    def _take(self, limit=None):
+        with self._cond:
+            batch = list(self._buffer.items())[:limit]
+            for task_id, _ in batch:
+                del self._buffer[task_id]
+            if not self._buffer:
+                self._oldest = None
+            return batch
+
+    def _put_back(self, batch):
+        with self._cond:
+            newer = list(self._buffer.items())
+            self._buffer = dict(batch)
+            self._buffer.update(newer)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self):
+        """Store everything buffered now, max_batch results per call; returns the number written"""
+        written = 0
+        while True:
+            count = self._flush_batch()
+            if not count:
+                return written
+            written += count
+
+    def _flush_batch(self):
+        with self._flush_lock:
+            batch = self._take(self.max_batch)
+            if not batch:
+                return 0
+            try:
+                stored = self.queue.finish_many(
+                    [(task_id, status, payload) for task_id, (status, payload, _) in batch], self.worker_id
+                )
+            except Exception:
+                self._put_back(batch)
+                raise
+            self.flushes += 1
+            self.written += len(batch)
+        for task_id, (_, _, on_stored) in batch:
+            if on_stored is not None:
+                try:
+                    on_stored(task_id in stored)
+                except Exception as e:
+                    print(f"Status writer callback error for task {task_id}: {e}")
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._buffer) >= self.max_batch:
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Status writer flush failed ({e}); retrying in {max(self.max_delay, 1.0):g}s")
+                with self._cond:
+                    self._cond.wait(max(self.max_delay, 1.0))
+
+    def pending_ids(self):
+        """Task ids whose results are buffered (their leases still need heartbeats)"""
+        with self._cond:
+            return list(self._buffer)
+
+    def close(self):
+        """Stop the background flusher and drain the buffer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        for attempt in range(self.close_retries):
+            try:
+                self.flush()
+                return
+            except Exception as e:
+                print(f"Status writer final flush failed ({e}); attempt {attempt + 1}/{self.close_retries}")
+                time.sleep(min(2 ** attempt, 5))
+        lost = self._take()
+        if lost:
+            print(f"Status writer: {len(lost)} result(s) could not be stored: {[task_id for task_id, _ in lost]}")
@@ -0,0 +1,154 @@
+"""
+Task notifications for the agent worker.
+
+Instead of polling agent_task_requests every few seconds, the worker blocks
+in TaskNotifier.wait() until something worth a claim attempt happens:
+
+- a task was inserted (pushed by Supabase Realtime, or notify() in tests)
+- one of the worker's own tasks finished and freed a slot (wake())
+- the timeout expired
+
+Notifiers:
+- InMemoryNotifier: process-local stand-in for tests and local runs
+- SupabaseRealtimeNotifier: subscribes to INSERTs on the table over Realtime;
+  while the subscription is down it reports healthy = False and the worker
+  falls back to polling with adaptive backoff
+
+PollBackoff is that fallback: the interval doubles after each empty poll up to
+a ceiling and snaps back to the floor as soon as a poll finds work.
+"""
+
+import asyncio
+import threading
+
+
+class TaskNotifier:
+    """Base notifier: an event that insert notifications and local wake-ups both set"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.healthy = False
+
+    def start(self):
+        """Begin delivering notifications"""
+
+    def wake(self):
+        """Wake the waiting worker loop (thread-safe)"""
+        self._event.set()
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds; True if woken rather than timed out"""
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+    def close(self):
+        """Stop delivering notifications"""
+        self.healthy = False
+        self.wake()
+
+
+class InMemoryNotifier(TaskNotifier):
+    """Process-local notifier; whoever inserts a task calls notify()"""
+
+    def start(self):
+        self.healthy = True
+
+    def notify(self, task=None):
+        self.wake()
+
+
+class SupabaseRealtimeNotifier(TaskNotifier):
+    """
+    Wakes the worker on Realtime INSERT events for `table`. The subscription
+    runs on its own thread and event loop (the worker's client is synchronous)
+    and is re-established after errors. Every (re)subscribe also wakes the
+    worker once, so tasks inserted while disconnected are still claimed.
+    """
+
+    def __init__(self, url, key, table, schema="public", reconnect_delay=5.0):
+        super().__init__()
+        self.url = url
+        self.key = key
+        self.table = table
+        self.schema = schema
+        self.reconnect_delay = reconnect_delay
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="task-notifier", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        super().close()
+
+    def _run(self):
+        asyncio.run(self._listen_forever())
+
+    async def _listen_forever(self):
+        from supabase import acreate_client
+
+        while not self._closed.is_set():
+            lost = asyncio.Event()
+            loop = asyncio.get_running_loop()
+
+            def on_insert(payload):
+                self.wake()
+
+            def on_status(status, error):
+                status = getattr(status, "value", status)
+                if status == "SUBSCRIBED":
+                    if not self.healthy:
+                        print(f"Realtime: subscribed to inserts on '{self.table}'")
+                    self.healthy = True
+                    self.wake()
+                else:
+                    if self.healthy:
+                        print(f"Realtime: subscription {status.lower()}{f' ({error})' if error else ''}; polling until it recovers")
+                    self.healthy = False
+                    self.wake()
+                    loop.call_soon_threadsafe(lost.set)
+
+            client = None
+            try:
+                client = await acreate_client(self.url, self.key)
+                channel = client.channel(f"worker-{self.table}-inserts")
+                channel.on_postgres_changes("INSERT", callback=on_insert, table=self.table, schema=self.schema)
+                await channel.subscribe(on_status)
+                while not (lost.is_set() or self._closed.is_set()):
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+            except Exception as e:
+                if self.healthy:
+                    print(f"Realtime: connection error ({e}); polling until it recovers")
+                self.healthy = False
+                self.wake()
+            finally:
+                if client is not None:
+                    try:
+                        await client.remove_all_channels()
+                    except Exception:
+                        pass
+
+            if not self._closed.is_set():
+                await asyncio.sleep(self.reconnect_delay)
+
+
+class PollBackoff:
+    """Adaptive polling interval: doubles on empty polls, resets when work is found"""
+
+    def __init__(self, minimum=0.5, maximum=30.0):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.current = minimum
+
+    def found_work(self):
+        self.current = self.minimum
+
+    def idle(self):
+        self.current = min(self.current * 2, self.maximum)
+        return self.current
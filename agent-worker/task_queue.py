@@ -0,0 +1,561 @@
+"""
+Queue backends for the agent worker.
+
+The worker loop only talks to a TaskQueue:
+
+  claim(limit, worker_id, lease_seconds)   lease up to `limit` oldest pending tasks
+  complete(task_id, worker_id, payload)     store a result while holding the lease
+  fail(task_id, worker_id, error)           store an error while holding the lease
+  finish_many(results, worker_id)           store many (task_id, status, payload) results at once
+  heartbeat(task_ids, worker_id, secs)      extend leases; returns the ids that were lost
+  reap(max_attempts)                        requeue expired leases, dead-letter exhausted tasks
+  depth()                                   {'pending': n, 'processing': n} across all workers
+  notifier()                                a TaskNotifier woken when tasks are enqueued
+
+Backends:
+- SupabaseTaskQueue: the agent_task_requests table via the claim/lease RPCs
+  (falls back to unleased conditional updates when they are not deployed)
+- SQLiteTaskQueue: the same schema and semantics in a local SQLite file (WAL),
+  safe across processes; for load tests and running without a Supabase project
+- InMemoryTaskQueue: process-local, for tests and the benchmark harness
+
+Task rows are dicts shaped like the Supabase rows: id, status, request_payload,
+response_payload, attempts, claimed_by, lease_expires_at, created_at.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from task_notifier import InMemoryNotifier, SupabaseRealtimeNotifier, TaskNotifier
+
+TABLE_NAME = "agent_task_requests"
+
+
+class TaskQueue:
+    """Interface of a worker queue backend"""
+
+    def claim(self, limit, worker_id, lease_seconds):
+        raise NotImplementedError
+
+    def complete(self, task_id, worker_id, response_payload):
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error):
+        raise NotImplementedError
+
+    def finish_many(self, results, worker_id):
+        """
+        Store [(task_id, 'completed'|'failed', response_payload), ...] in as few
+        round trips as the backend allows; returns the ids actually stored.
+        """
+        return {task_id for task_id, status, payload in results
+                if self._finish(task_id, worker_id, status, payload)}
+
+    def _finish(self, task_id, worker_id, status, response_payload):
+        """Store one final status and payload while `worker_id` holds the lease"""
+        raise NotImplementedError
+
+    def heartbeat(self, task_ids, worker_id, lease_seconds):
+        raise NotImplementedError
+
+    def reap(self, max_attempts):
+        raise NotImplementedError
+
+    def supports_leases(self):
+        """Whether heartbeat() and reap() do anything; a backend may find out only once it has tried"""
+        return True
+
+    def depth(self):
+        raise NotImplementedError
+
+    def notifier(self):
+        """A fresh notifier for one worker loop"""
+        return TaskNotifier()
+
+    def close(self):
+        pass
+
+
+class _LocalNotifyMixin:
+    """Wakes every notifier handed out by this queue when a task is enqueued in-process"""
+
+    def _init_notifiers(self):
+        self._notifiers = []
+
+    def notifier(self):
+        notifier = InMemoryNotifier()
+        notifier.start()
+        self._notifiers.append(notifier)
+        return notifier
+
+    def notify(self):
+        for notifier in list(self._notifiers):
+            notifier.notify()
+
+
+# -- Supabase ------------------------------------------------------------------
+
+def _is_missing_function(e):
+    return "PGRST202" in str(e) or "Could not find the function" in str(e)
+
+
+class SupabaseTaskQueue(TaskQueue):
+    """agent_task_requests in Supabase, claimed through the lease RPCs"""
+
+    CLAIM_RPC = "claim_agent_task_requests"
+    FINISH_RPC = "complete_agent_task_requests"
+    HEARTBEAT_RPC = "extend_agent_task_leases"
+    REAP_RPC = "reap_expired_agent_task_requests"
+
+    def __init__(self, url, key, table=TABLE_NAME, realtime=True):
+        from supabase import create_client
+
+        self.url = url
+        self.key = key
+        self.table = table
+        self.realtime = realtime
+        self.client = create_client(url, key)
+        # Cleared once the claim RPC turns out not to be deployed (migrations
+        # 20260110000000/20260110020000); without it there are no lease columns either
+        self.leases = True
+        # Cleared once the bulk completion RPC (migration 20260110030000) turns out not to be deployed
+        self.bulk_finish = True
+        # Cleared once the heartbeat/reap RPCs (migration 20260110020000) turn out not to be deployed
+        self.lease_rpcs = True
+
+    def enqueue(self, request_payload):
+        return self.client.table(self.table).insert({"request_payload": request_payload}).execute().data[0]["id"]
+
+    def claim(self, limit, worker_id, lease_seconds):
+        if limit <= 0:
+            return []
+
+        if self.leases:
+            try:
+                return self.client.rpc(self.CLAIM_RPC, {
+                    "p_limit": limit,
+                    "p_worker_id": worker_id,
+                    "p_lease_seconds": lease_seconds,
+                }).execute().data or []
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                self.leases = False
+                print(f"Claim RPC '{self.CLAIM_RPC}' not found; falling back to conditional updates without leases")
+
+        # Fallback: conditional update. Postgres re-checks status = 'pending' on each
+        # row it updates, so a row another worker claimed first is simply not returned.
+        candidates = self.client.table(self.table).select("id").eq("status", "pending") \
+            .order("created_at").limit(limit).execute().data
+        if not candidates:
+            return []
+        return self.client.table(self.table).update({"status": "processing"}) \
+            .in_("id", [row["id"] for row in candidates]).eq("status", "pending").execute().data or []
+
+    def _finish(self, task_id, worker_id, status, response_payload):
+        # updated_at is handled by the table trigger
+        fields = {"status": status, "response_payload": response_payload}
+        query = self.client.table(self.table)
+        if not self.leases:
+            return bool(query.update(fields).eq("id", task_id).execute().data)
+        updated = query.update({**fields, "lease_expires_at": None}).eq("id", task_id) \
+            .eq("status", "processing").eq("claimed_by", worker_id).execute().data
+        return bool(updated)
+
+    def complete(self, task_id, worker_id, response_payload):
+        return self._finish(task_id, worker_id, "completed", response_payload)
+
+    def fail(self, task_id, worker_id, error):
+        return self._finish(task_id, worker_id, "failed", {"error": error})
+
+    def finish_many(self, results, worker_id):
+        if not results:
+            return set()
+        rows = [{"id": task_id, "status": status, "response_payload": payload} for task_id, status, payload in results]
+
+        if self.leases and self.bulk_finish:
+            try:
+                stored = self.client.rpc(self.FINISH_RPC, {
+                    "p_worker_id": worker_id,
+                    "p_results": rows,
+                }).execute().data or []
+                return {row if isinstance(row, str) else row.get(self.FINISH_RPC) for row in stored}
+            except Exception as e:
+                if not _is_missing_function(e):
+                    raise
+                self.bulk_finish = False
+                print(f"Bulk completion RPC '{self.FINISH_RPC}' not found; storing results one row at a time")
+
+        if self.leases:
+            # Lease columns but no bulk RPC: each write must stay conditional on the lease
+            return super().finish_many(results, worker_id)
+
+        # No leases: plain UPDATEs (an upsert would need INSERT and could recreate a deleted
+        # task), one per distinct status and payload, e.g. tasks that failed the same way
+        groups = {}
+        for task_id, status, payload in results:
+            key = (status, json.dumps(payload, sort_keys=True, default=str))
+            groups.setdefault(key, (status, payload, []))[2].append(task_id)
+        stored = set()
+        for status, payload, task_ids in groups.values():
+            updated = self.client.table(self.table).update({"status": status, "response_payload": payload}) \
+                .in_("id", task_ids).execute().data or []
+            stored.update(row["id"] for row in updated)
+        return stored
+
+    def heartbeat(self, task_ids, worker_id, lease_seconds):
+        if not self.supports_leases() or not task_ids:
+            return set()
+        kept = self._lease_rpc(self.HEARTBEAT_RPC, {
+            "p_task_ids": list(task_ids),
+            "p_worker_id": worker_id,
+            "p_lease_seconds": lease_seconds,
+        })
+        if kept is None:
+            return set()
+        return set(task_ids) - {row if isinstance(row, str) else row.get(self.HEARTBEAT_RPC) for row in kept}
+
+    def reap(self, max_attempts):
+        if not self.supports_leases():
+            return []
+        return self._lease_rpc(self.REAP_RPC, {"p_max_attempts": max_attempts}) or []
+
+    def supports_leases(self):
+        return self.leases and self.lease_rpcs
+
+    def _lease_rpc(self, name, params):
+        """Call a heartbeat/reap RPC; None (and leases off from now on) when it is not deployed"""
+        try:
+            return self.client.rpc(name, params).execute().data or []
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            self.lease_rpcs = False
+            print(f"Lease RPCs not found ({e}); apply migration 20260110020000 to enable leases")
+            return None
+
+    def depth(self):
+        # head=True: the count comes back in a header, no rows are transferred
+        return {
+            status: self.client.table(self.table).select("id", count="exact", head=True)
+            .eq("status", status).execute().count or 0
+            for status in ("pending", "processing")
+        }
+
+    def notifier(self):
+        if self.realtime:
+            return SupabaseRealtimeNotifier(self.url, self.key, self.table)
+        # Nothing pushes inserts (never healthy), only finished tasks wake the loop early
+        return TaskNotifier()
+
+
+# -- SQLite --------------------------------------------------------------------
+
+_SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    request_payload TEXT NOT NULL DEFAULT '{{}}',
+    response_payload TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    claimed_by TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dead_lettered_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_status_created ON {TABLE_NAME}(status, created_at);
+"""
+
+_SQLITE_COLUMNS = ("id", "status", "request_payload", "response_payload", "created_at",
+                   "claimed_by", "lease_expires_at", "attempts")
+
+
+class SQLiteTaskQueue(_LocalNotifyMixin, TaskQueue):
+    """agent_task_requests in a local SQLite file; claims are serialised with BEGIN IMMEDIATE"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_notifiers()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _row(self, values):
+        row = dict(zip(_SQLITE_COLUMNS, values))
+        row["request_payload"] = json.loads(row["request_payload"])
+        if row["response_payload"] is not None:
+            row["response_payload"] = json.loads(row["response_payload"])
+        return row
+
+    def enqueue(self, request_payload):
+        task_id = str(uuid.uuid4())
+        now = time.time()
+        self._conn().execute(
+            f"INSERT INTO {TABLE_NAME} (id, request_payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (task_id, json.dumps(request_payload), now, now),
+        )
+        self.notify()
+        return task_id
+
+    def claim(self, limit, worker_id, lease_seconds):
+        if limit <= 0:
+            return []
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(_SQLITE_COLUMNS)} FROM {TABLE_NAME} "
+                f"WHERE status = 'pending' ORDER BY created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+            conn.executemany(
+                f"UPDATE {TABLE_NAME} SET status = 'processing', claimed_by = ?, lease_expires_at = ?, "
+                f"attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(worker_id, now + lease_seconds, now, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        claimed = []
+        for values in rows:
+            row = self._row(values)
+            row.update(status="processing", claimed_by=worker_id, lease_expires_at=now + lease_seconds,
+                       attempts=row["attempts"] + 1)
+            claimed.append(row)
+        return claimed
+
+    def _finish(self, task_id, worker_id, status, payload):
+        return self._conn().execute(
+            f"UPDATE {TABLE_NAME} SET status = ?, response_payload = ?, lease_expires_at = NULL, updated_at = ? "
+            f"WHERE id = ? AND status = 'processing' AND claimed_by = ?",
+            (status, json.dumps(payload), time.time(), task_id, worker_id),
+        ).rowcount > 0
+
+    def complete(self, task_id, worker_id, response_payload):
+        return self._finish(task_id, worker_id, "completed", response_payload)
+
+    def fail(self, task_id, worker_id, error):
+        return self._finish(task_id, worker_id, "failed", {"error": error})
+
+    def finish_many(self, results, worker_id):
+        conn = self._conn()
+        now = time.time()
+        stored = set()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for task_id, status, payload in results:
+                if conn.execute(
+                    f"UPDATE {TABLE_NAME} SET status = ?, response_payload = ?, lease_expires_at = NULL, "
+                    f"updated_at = ? WHERE id = ? AND status = 'processing' AND claimed_by = ?",
+                    (status, json.dumps(payload), now, task_id, worker_id),
+                ).rowcount > 0:
+                    stored.add(task_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def heartbeat(self, task_ids, worker_id, lease_seconds):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return set()
+        placeholders = ", ".join("?" * len(task_ids))
+        conn = self._conn()
+        conn.execute(
+            f"UPDATE {TABLE_NAME} SET lease_expires_at = ?, updated_at = ? "
+            f"WHERE id IN ({placeholders}) AND status = 'processing' AND claimed_by = ?",
+            (time.time() + lease_seconds, time.time(), *task_ids, worker_id),
+        )
+        kept = conn.execute(
+            f"SELECT id FROM {TABLE_NAME} WHERE id IN ({placeholders}) AND status = 'processing' AND claimed_by = ?",
+            (*task_ids, worker_id),
+        ).fetchall()
+        return set(task_ids) - {row[0] for row in kept}
+
+    def reap(self, max_attempts):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT id, attempts, claimed_by FROM {TABLE_NAME} "
+                f"WHERE status = 'processing' AND lease_expires_at < ?",
+                (now,),
+            ).fetchall()
+            reaped = []
+            for task_id, attempts, claimed_by in rows:
+                if attempts >= max_attempts:
+                    error = {
+                        "error": f"Task lease expired after {attempts} attempt(s); moved to dead letter",
+                        "dead_letter": True,
+                        "last_worker": claimed_by,
+                    }
+                    conn.execute(
+                        f"UPDATE {TABLE_NAME} SET status = 'failed', response_payload = ?, dead_lettered_at = ?, "
+                        f"claimed_by = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                        (json.dumps(error), now, now, task_id),
+                    )
+                    reaped.append({"id": task_id, "status": "failed", "attempts": attempts})
+                else:
+                    conn.execute(
+                        f"UPDATE {TABLE_NAME} SET status = 'pending', claimed_by = NULL, lease_expires_at = NULL, "
+                        f"updated_at = ? WHERE id = ?",
+                        (now, task_id),
+                    )
+                    reaped.append({"id": task_id, "status": "pending", "attempts": attempts})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if any(row["status"] == "pending" for row in reaped):
+            self.notify()
+        return reaped
+
+    def depth(self):
+        counts = dict(self._conn().execute(
+            f"SELECT status, COUNT(*) FROM {TABLE_NAME} WHERE status IN ('pending', 'processing') GROUP BY status"
+        ).fetchall())
+        return {status: counts.get(status, 0) for status in ("pending", "processing")}
+
+    def get(self, task_id):
+        values = self._conn().execute(
+            f"SELECT {', '.join(_SQLITE_COLUMNS)} FROM {TABLE_NAME} WHERE id = ?", (task_id,)
+        ).fetchone()
+        return self._row(values) if values else None
+
+
+# -- In-memory -----------------------------------------------------------------
+
+class InMemoryTaskQueue(_LocalNotifyMixin, TaskQueue):
+    """Process-local queue with the same lease semantics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._pending = deque()
+        self._processing = set()
+        self._init_notifiers()
+
+    def enqueue(self, request_payload):
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            self._tasks[task_id] = {
+                "id": task_id, "status": "pending", "request_payload": request_payload,
+                "response_payload": None, "created_at": time.time(), "claimed_by": None,
+                "lease_expires_at": None, "attempts": 0,
+            }
+            self._pending.append(task_id)
+        self.notify()
+        return task_id
+
+    def claim(self, limit, worker_id, lease_seconds):
+        claimed = []
+        with self._lock:
+            expires = time.time() + lease_seconds
+            while self._pending and len(claimed) < limit:
+                task = self._tasks[self._pending.popleft()]
+                task.update(status="processing", claimed_by=worker_id, lease_expires_at=expires,
+                            attempts=task["attempts"] + 1)
+                self._processing.add(task["id"])
+                claimed.append(dict(task))
+        return claimed
+
+    def _finish(self, task_id, worker_id, status, payload):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task["status"] != "processing" or task["claimed_by"] != worker_id:
+                return False
+            task.update(status=status, response_payload=payload, lease_expires_at=None)
+            self._processing.discard(task_id)
+            return True
+
+    def complete(self, task_id, worker_id, response_payload):
+        return self._finish(task_id, worker_id, "completed", response_payload)
+
+    def fail(self, task_id, worker_id, error):
+        return self._finish(task_id, worker_id, "failed", {"error": error})
+
+    def heartbeat(self, task_ids, worker_id, lease_seconds):
+        lost = set()
+        with self._lock:
+            expires = time.time() + lease_seconds
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is not None and task["status"] == "processing" and task["claimed_by"] == worker_id:
+                    task["lease_expires_at"] = expires
+                else:
+                    lost.add(task_id)
+        return lost
+
+    def reap(self, max_attempts):
+        reaped = []
+        with self._lock:
+            now = time.time()
+            for task_id in list(self._processing):
+                task = self._tasks[task_id]
+                if task["lease_expires_at"] is None or task["lease_expires_at"] >= now:
+                    continue
+                self._processing.discard(task_id)
+                if task["attempts"] >= max_attempts:
+                    task.update(status="failed", claimed_by=None, lease_expires_at=None, response_payload={
+                        "error": f"Task lease expired after {task['attempts']} attempt(s); moved to dead letter",
+                        "dead_letter": True,
+                    })
+                else:
+                    task.update(status="pending", claimed_by=None, lease_expires_at=None)
+                    self._pending.appendleft(task_id)
+                reaped.append({"id": task_id, "status": task["status"], "attempts": task["attempts"]})
+        if any(row["status"] == "pending" for row in reaped):
+            self.notify()
+        return reaped
+
+    def depth(self):
+        with self._lock:
+            return {"pending": len(self._pending), "processing": len(self._processing)}
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task else None
+
+
+def create_queue_from_env():
+    """
+    Backend chosen by WORKER_QUEUE:
+      supabase (default)  SUPABASE_URL / SUPABASE_SERVICE_KEY; WORKER_NOTIFY=realtime|poll
+      sqlite              WORKER_SQLITE_PATH (default agent_tasks.sqlite3)
+      memory              process-local, empty at start
+    """
+    backend = os.getenv("WORKER_QUEUE", "supabase").strip().lower()
+    if backend == "sqlite":
+        return SQLiteTaskQueue(os.getenv("WORKER_SQLITE_PATH", "agent_tasks.sqlite3"))
+    if backend == "memory":
+        return InMemoryTaskQueue()
+    if backend != "supabase":
+        raise ValueError(f"Unknown WORKER_QUEUE '{backend}' (expected supabase, sqlite or memory)")
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+    if not url or not key:
+        print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
+        print("Make sure you copied the 'service_role' key, not the anon key!")
+        exit(1)
+    realtime = os.getenv("WORKER_NOTIFY", "realtime").strip().lower() == "realtime"
+    return SupabaseTaskQueue(url, key, realtime=realtime)
@@ -1,94 +1,235 @@
 import time
 import os
 import json
+import signal
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
-# 1. Load the secrets
+from task_notifier import PollBackoff, TaskNotifier
+from status_writer import StatusWriter
+from task_queue import TABLE_NAME, create_queue_from_env
+from worker_metrics import METRICS, start_metrics_server, task_age
+
+# 1. Load the secrets. The queue backend (WORKER_QUEUE=supabase|sqlite|memory) is
+# created in main(), so importing this module does not connect to anything.
 load_dotenv()
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_KEY")
+# Tasks run concurrently on a bounded pool; each poll claims at most BATCH_SIZE of them
+CONCURRENCY = max(int(os.getenv("WORKER_CONCURRENCY", "4")), 1)
+BATCH_SIZE = max(int(os.getenv("WORKER_BATCH_SIZE", str(CONCURRENCY))), 1)
+
+# New tasks are pushed over Supabase Realtime (WORKER_NOTIFY=realtime). Polling backs off
+# from WORKER_POLL_INTERVAL to WORKER_POLL_MAX_INTERVAL while idle, and is only the
+# fallback: with a healthy subscription the worker polls once per WORKER_SAFETY_POLL_INTERVAL.
+NOTIFY_MODE = os.getenv("WORKER_NOTIFY", "realtime").strip().lower()
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.getenv("WORKER_POLL_MAX_INTERVAL", "30"))
+SAFETY_POLL_INTERVAL = float(os.getenv("WORKER_SAFETY_POLL_INTERVAL", "60"))
+
+# Leased ownership: claims record this worker and a lease expiry, heartbeats extend the
+# leases of running tasks, and any worker's reaper requeues tasks whose lease lapsed
+# (dead-lettering them as 'failed' after WORKER_MAX_ATTEMPTS claims).
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+LEASE_SECONDS = max(int(os.getenv("WORKER_LEASE_SECONDS", "60")), 5)
+HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", str(LEASE_SECONDS / 3)))
+MAX_ATTEMPTS = max(int(os.getenv("WORKER_MAX_ATTEMPTS", "5")), 1)
+REAP_INTERVAL = float(os.getenv("WORKER_REAP_INTERVAL", "30"))
+
+# Results are buffered and stored in bulk: a flush every WORKER_WRITE_BATCH_SIZE results or
+# after WORKER_WRITE_FLUSH_INTERVAL seconds, whichever comes first (batch size 1 = write immediately)
+WRITE_BATCH_SIZE = max(int(os.getenv("WORKER_WRITE_BATCH_SIZE", "100")), 1)
+WRITE_FLUSH_INTERVAL = float(os.getenv("WORKER_WRITE_FLUSH_INTERVAL", "0.2"))
+
+# Prometheus-text metrics at http://0.0.0.0:WORKER_METRICS_PORT/metrics (0 disables); queue depth
+# is counted in the queue at most once per WORKER_QUEUE_DEPTH_TTL seconds, and only when scraped
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9464"))
+QUEUE_DEPTH_TTL = float(os.getenv("WORKER_QUEUE_DEPTH_TTL", "5"))
 
-if not url or not key:
-    print("Error: Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
-    print("Make sure you copied the 'service_role' key, not the anon key!")
-    exit(1)
 
-# 2. Connect to Supabase
-supabase: Client = create_client(url, key)
-TABLE_NAME = "agent_task_requests"
+def lease_keeper(queue, running, stop, worker_id=WORKER_ID, writer=None, metrics=METRICS):
+    """
+    Background loop: heartbeat running tasks ({future: task id}) and those whose
+    results are still buffered in `writer`, and periodically reap expired leases
+    """
+    last_reap = 0.0
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            task_ids = set(list(running.values())) | set(writer.pending_ids() if writer else ())
+            lost = queue.heartbeat(task_ids, worker_id, LEASE_SECONDS)
+            for task_id in lost:
+                print(f"Lease lost for task {task_id}; its result will not be written by this worker")
+            if time.monotonic() - last_reap >= REAP_INTERVAL:
+                last_reap = time.monotonic()
+                for row in queue.reap(MAX_ATTEMPTS):
+                    if row.get("status") == "failed":
+                        metrics.reaped.inc(result="dead_lettered")
+                        print(f"Dead-lettered task {row['id']} after {row.get('attempts')} attempt(s)")
+                    else:
+                        metrics.reaped.inc(result="requeued")
+                        print(f"Requeued task {row['id']} after an expired lease (attempt {row.get('attempts')})")
+        except Exception as e:
+            print(f"Lease keeper error: {e}")
+        if not queue.supports_leases():
+            return  # the backend has no lease RPCs (it logged why); nothing to keep
 
-def process_task(task):
-    print(f"\nFound Task {task['id']}!")
-    print(f"   User asking: {task['request_payload'].get('prompt')}")
+def agent_brain(task):
+    """Do the work for one task and return its response_payload"""
+    # --- THIS IS THE AGENT BRAIN ---
+    # (This is where you will eventually put LangChain/Phidata code)
+    
+    # Simulating heavy "thinking" work
+    time.sleep(3) 
     
-    # A. Mark as 'processing'
-    supabase.table(TABLE_NAME).update({
-        "status": "processing"
-    }).eq("id", task['id']).execute()
+    result_text = f"Agent Report: I successfully analyzed '{task['request_payload'].get('prompt')}'."
+    # ----------------------------------
+    return {
+        "answer": result_text,
+        "steps": ["Task Received", "Thinking", "Done"]
+    }
+
+def process_task(writer, task, handler=agent_brain, verbose=True, metrics=METRICS):
+    if verbose:
+        print(f"\nFound Task {task['id']}!")
+        print(f"   User asking: {task['request_payload'].get('prompt')}")
+
+    def recorder(outcome):
+        def on_stored(stored):
+            if not stored:
+                metrics.tasks.inc(outcome="lease_lost")
+                print(f"Task {task['id']} finished after its lease expired; result discarded")
+                return
+            metrics.tasks.inc(outcome=outcome)
+            age = task_age(task)
+            if age is not None:
+                metrics.end_to_end.observe(age)
+            if verbose and outcome == "completed":
+                print(f"Task {task['id']} Completed successfully.")
+        return on_stored
     
+    # A. Already 'processing': the queue's claim() flipped it when this worker won the task
+    started = time.perf_counter()
     try:
-        # --- THIS IS THE AGENT BRAIN ---
-        # (This is where you will eventually put LangChain/Phidata code)
-        
-        # Simulating heavy "thinking" work
-        time.sleep(3) 
-        
-        result_text = f"Agent Report: I successfully analyzed '{task['request_payload'].get('prompt')}'."
-        # ----------------------------------
-
-        # B. Mark as 'completed' & save result
-        supabase.table(TABLE_NAME).update({
-            "status": "completed",
-            "response_payload": {
-                "answer": result_text,
-                "steps": ["Task Received", "Thinking", "Done"]
-            },
-            # updated_at is handled by the trigger we created!
-        }).eq("id", task['id']).execute()
-        
-        print(f"Task {task['id']} Completed successfully.")
-        
+        response_payload = handler(task)
     except Exception as e:
+        metrics.processing.observe(time.perf_counter() - started)
         print(f"Error: {e}")
-        supabase.table(TABLE_NAME).update({
-            "status": "failed",
-            "response_payload": {"error": str(e)}
-        }).eq("id", task['id']).execute()
+        writer.fail(task['id'], str(e), recorder("failed"))
+        return
+    metrics.processing.observe(time.perf_counter() - started)
+
+    # B. Mark as 'completed' & save result; the writer stores it with the next batch,
+    # only while this worker still holds the lease
+    writer.complete(task['id'], response_payload, recorder("completed"))
+
+def run_worker(queue, handler=agent_brain, stop=None, concurrency=CONCURRENCY, batch_size=BATCH_SIZE,
+               worker_id=WORKER_ID, verbose=True, write_batch_size=WRITE_BATCH_SIZE,
+               write_flush_interval=WRITE_FLUSH_INTERVAL, metrics=METRICS):
+    """
+    Claim and run tasks from `queue` until `stop` is set (forever if None). Waits
+    on the queue's notifier between claims; set `stop` and wake it to shut down.
+    """
+    import datetime
+    stop = stop or threading.Event()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agent-task")
+    writer = StatusWriter(queue, worker_id, write_batch_size, write_flush_interval)
+    # WORKER_NOTIFY=poll: nothing pushes inserts (never healthy), only finished tasks wake the loop early
+    notifier = queue.notifier() if NOTIFY_MODE != "poll" else TaskNotifier()
+    notifier.start()
+    metrics.concurrency.set(concurrency)
+    metrics.bind(queue=queue, writer=writer, notifier=notifier, depth_ttl=QUEUE_DEPTH_TTL)
+    backoff = PollBackoff(POLL_INTERVAL, POLL_MAX_INTERVAL)
+    running = {}  # future -> task id
+    last_heartbeat = time.monotonic()
+    keeper_stop = threading.Event()
+    threading.Thread(target=lease_keeper, args=(queue, running, keeper_stop, worker_id, writer, metrics),
+                     name="lease-keeper", daemon=True).start()
+
+    def finished(future):
+        running.pop(future, None)
+        metrics.in_flight.dec()
+        notifier.wake()  # a slot is free: claim the next task right away
+
+    try:
+        while not stop.is_set():
+            try:
+                # Only claim what there are free slots for, so claimed tasks never wait behind a slow one
+                limit = min(batch_size, concurrency - len(running))
+                tasks = queue.claim(limit, worker_id, LEASE_SECONDS)
+                if limit > 0:
+                    metrics.claims.inc(result="tasks" if tasks else "empty")
+                    metrics.claimed.inc(len(tasks))
+                    claimed_at = time.time()
+                    for task in tasks:
+                        wait = task_age(task, claimed_at)
+                        if wait is not None:
+                            metrics.queue_wait.observe(wait)
+                
+                if tasks:
+                    if verbose:
+                        print(f"\nClaimed {len(tasks)} pending task(s) at {datetime.datetime.now().strftime('%H:%M:%S')}")
+                    backoff.found_work()
+                elif limit > 0:
+                    backoff.idle()
+                
+                for task in tasks:
+                    metrics.in_flight.inc()
+                    future = executor.submit(process_task, writer, task, handler, verbose, metrics)
+                    running[future] = task['id']
+                    future.add_done_callback(finished)
+                
+                if verbose and time.monotonic() - last_heartbeat >= 30:
+                    last_heartbeat = time.monotonic()
+                    print(f"Worker heartbeat: {datetime.datetime.now().strftime('%H:%M:%S')} - "
+                          f"{len(running)} task(s) running, realtime {'up' if notifier.healthy else 'down'}, "
+                          f"{metrics.tasks.value(outcome='completed')} completed / "
+                          f"{metrics.tasks.value(outcome='failed')} failed so far, still watching for tasks...")
+                
+                # A full batch may mean more are waiting; otherwise sleep until an insert,
+                # a finished task or the (safety or backoff) poll interval
+                if tasks and len(tasks) == limit and len(running) < concurrency:
+                    continue
+                notifier.wait(SAFETY_POLL_INTERVAL if notifier.healthy else backoff.current)
+                
+            except Exception as e:
+                metrics.loop_errors.inc()
+                print(f"Connection Error at {datetime.datetime.now().strftime('%H:%M:%S')}: {e}")
+                import traceback
+                traceback.print_exc()
+                stop.wait(5)
+    finally:
+        keeper_stop.set()
+        notifier.close()
+        executor.shutdown(wait=True)
+        writer.close()  # store every buffered result before returning
 
 def main():
     import datetime
+    queue = create_queue_from_env()
     print(f"Agent Worker is ONLINE.")
-    print(f"Watching table '{TABLE_NAME}' for 'pending' tasks...")
+    print(f"Watching table '{TABLE_NAME}' for 'pending' tasks ({type(queue).__name__})...")
+    print(f"Concurrency: {CONCURRENCY} task(s), claiming up to {BATCH_SIZE} per poll")
+    print(f"Notifications: {NOTIFY_MODE} (fallback polling {POLL_INTERVAL}s-{POLL_MAX_INTERVAL}s)")
+    print(f"Worker ID: {WORKER_ID} (lease {LEASE_SECONDS}s, heartbeat every {HEARTBEAT_INTERVAL:g}s, "
+          f"dead letter after {MAX_ATTEMPTS} attempts)")
+    print(f"Result writes: batches of up to {WRITE_BATCH_SIZE}, flushed every {WRITE_FLUSH_INTERVAL:g}s")
+    if METRICS_PORT:
+        try:
+            start_metrics_server(METRICS.registry, METRICS_PORT)
+            print(f"Metrics: http://0.0.0.0:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Metrics endpoint disabled: cannot listen on port {METRICS_PORT} ({e})")
     print(f"Started at: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("-" * 60)
     
-    poll_count = 0
-    while True:
-        try:
-            # Poll for tasks
-            response = supabase.table(TABLE_NAME).select("*").eq("status", "pending").execute()
-            tasks = response.data
-            
-            if tasks:
-                print(f"\nFound {len(tasks)} pending task(s) at {datetime.datetime.now().strftime('%H:%M:%S')}")
-            
-            for task in tasks:
-                process_task(task)
-            
-            # Sleep to prevent spamming the database
-            poll_count += 1
-            if poll_count % 15 == 0:  # Print heartbeat every 30 seconds (15 polls * 2 seconds)
-                print(f"Worker heartbeat: {datetime.datetime.now().strftime('%H:%M:%S')} - Still watching for tasks...")
-            
-            time.sleep(2)
-            
-        except Exception as e:
-            print(f"Connection Error at {datetime.datetime.now().strftime('%H:%M:%S')}: {e}")
-            import traceback
-            traceback.print_exc()
-            time.sleep(5)
+    # SIGTERM (container stop) unwinds like Ctrl+C: running tasks finish and buffered results are stored
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        run_worker(queue)
+    except KeyboardInterrupt:
+        print("Worker stopped.")
 
 if __name__ == "__main__":
     main()
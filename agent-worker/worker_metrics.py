@@ -0,0 +1,283 @@
+"""
+Instrumentation for the agent worker, exposed in the Prometheus text format.
+
+Dependency-free metric types (Counter, Gauge, Histogram) in a Registry, and
+start_metrics_server() to serve it at /metrics from a daemon thread.
+Callback gauges (Gauge(..., fn=...)) are evaluated at scrape time, so values
+such as queue depth cost nothing unless something scrapes them.
+
+The worker's metrics (WorkerMetrics):
+
+  agent_worker_queue_wait_seconds       histogram  task created -> claimed by this worker
+  agent_worker_processing_seconds       histogram  handler run time
+  agent_worker_end_to_end_seconds       histogram  task created -> result stored
+  agent_worker_tasks_total{outcome}     counter    completed | failed | lease_lost
+  agent_worker_claims_total{result}     counter    claim calls that returned tasks | were empty
+  agent_worker_claimed_tasks_total      counter
+  agent_worker_reaped_tasks_total{result} counter  requeued | dead_lettered (by this worker's reaper)
+  agent_worker_loop_errors_total        counter
+  agent_worker_in_flight                gauge      tasks running in this worker
+  agent_worker_buffered_results         gauge      results waiting for the next bulk write
+  agent_worker_concurrency              gauge      configured slots
+  agent_worker_queue_depth{status}      gauge      pending | processing tasks in the queue (all workers)
+  agent_worker_realtime_up              gauge      1 while the insert subscription is healthy
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Queue waits and run times range from milliseconds to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A set/inc/dec gauge, or with `fn` a callback returning a value (or {label tuple: value})"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), fn=None):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []  # a failing callback drops the sample rather than the scrape
+            if value is None:
+                return []
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+            if not items and not self.labelnames:
+                items = [((), 0)]
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels):
+        """(cumulative bucket counts, sum, count)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return [0] * len(self.buckets), 0.0, 0
+            counts, total, count = list(state[0]), state[1], state[2]
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def _samples(self):
+        with self._lock:
+            keys = sorted(self._values)
+        if not keys and not self.labelnames:
+            keys = [()]
+        lines = []
+        for key in keys:
+            labels = dict(zip(self.labelnames, key))
+            cumulative, total, count = self.snapshot(**labels)
+            for bound, value in zip(self.buckets, cumulative):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {value}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry, port, addr="0.0.0.0"):
+    """Serve `registry` at http://addr:port/metrics from a daemon thread; returns the server"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes would drown out the worker's own output
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def task_age(task, now=None):
+    """Seconds since the task row was created (epoch floats or ISO timestamps), never negative"""
+    created = task.get("created_at")
+    if created is None:
+        return None
+    if isinstance(created, str):
+        created = created.replace("Z", "+00:00")
+        if "." in created:
+            # fromisoformat before 3.11 needs exactly 3 or 6 fractional digits
+            head, rest = created.split(".", 1)
+            digits = len(rest) - len(rest.lstrip("0123456789"))
+            created = f"{head}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+        created = datetime.fromisoformat(created).timestamp()
+    return max((now if now is not None else time.time()) - created, 0.0)
+
+
+class WorkerMetrics:
+    """The worker's metric set; gauges backed by live state are attached with bind()"""
+
+    def __init__(self):
+        self.registry = Registry()
+        r = self.registry.register
+        self.queue_wait = r(Histogram("agent_worker_queue_wait_seconds",
+                                      "Time from task creation until this worker claimed it"))
+        self.processing = r(Histogram("agent_worker_processing_seconds", "Handler run time per task"))
+        self.end_to_end = r(Histogram("agent_worker_end_to_end_seconds",
+                                      "Time from task creation until its result was stored"))
+        self.tasks = r(Counter("agent_worker_tasks_total", "Tasks finished by outcome", ["outcome"]))
+        self.claims = r(Counter("agent_worker_claims_total", "Claim calls by whether they returned tasks", ["result"]))
+        self.claimed = r(Counter("agent_worker_claimed_tasks_total", "Tasks claimed by this worker"))
+        self.reaped = r(Counter("agent_worker_reaped_tasks_total", "Expired leases handled by this worker's reaper",
+                                ["result"]))
+        self.loop_errors = r(Counter("agent_worker_loop_errors_total", "Errors in the claim loop"))
+        self.in_flight = r(Gauge("agent_worker_in_flight", "Tasks currently running in this worker"))
+        self.buffered = r(Gauge("agent_worker_buffered_results", "Results waiting for the next bulk write"))
+        self.concurrency = r(Gauge("agent_worker_concurrency", "Configured task slots"))
+        self.queue_depth = r(Gauge("agent_worker_queue_depth", "Tasks in the queue by status (all workers)",
+                                   ["status"]))
+        self.realtime_up = r(Gauge("agent_worker_realtime_up", "1 while the insert subscription is healthy"))
+
+    def bind(self, queue=None, writer=None, notifier=None, depth_ttl=5.0):
+        """Attach scrape-time gauges to live worker state; queue depth is cached for depth_ttl seconds"""
+        if writer is not None:
+            self.buffered.fn = lambda: len(writer.pending_ids())
+        if notifier is not None:
+            self.realtime_up.fn = lambda: 1 if notifier.healthy else 0
+        if queue is not None:
+            cache = {"at": -math.inf, "value": None}
+            lock = threading.Lock()
+
+            def depth():
+                with lock:
+                    if time.monotonic() - cache["at"] >= depth_ttl:
+                        cache["value"] = {(status,): count for status, count in queue.depth().items()}
+                        cache["at"] = time.monotonic()
+                    return cache["value"]
+
+            self.queue_depth.fn = depth
+
+
+# Process-wide instance used by worker.py
+METRICS = WorkerMetrics()
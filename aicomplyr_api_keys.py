@@ -0,0 +1,186 @@
+"""
+API key registry with hashed lookup and per-key rate limits for aicomplyr_server.
+
+Keys are held only as SHA-256 hashes. A presented key is hashed once, looked
+up in a dict and confirmed with a constant-time compare, so authentication
+costs one hash per request instead of re-parsing the environment.
+
+Keys come from two places:
+
+  AICOMPLYR_API_KEYS_FILE   JSON Lines written by scripts/aicomplyr_keygen.py,
+                            one key per line:
+                              {"id": "...", "sha256": "...", "label": "ci",
+                               "rate": 5.0, "burst": 20}
+                            The file is re-read when its mtime changes
+                            (checked at most once per reload interval).
+  AICOMPLYR_API_KEYS        comma-separated plaintext allowlist (hashed on
+                            load) using the default quota
+
+With neither set, the dev key DEV_MODE_TEST_KEY_001 is accepted.
+
+Each key gets a token bucket: `rate` requests per second sustained with
+bursts of up to `burst`. A rate of 0 means unlimited.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEV_KEY = "DEV_MODE_TEST_KEY_001"
+DEFAULT_RATE = 50.0
+DEFAULT_BURST = 100
+DEFAULT_RELOAD_INTERVAL = 1.0
+
+
+def hash_api_key(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """Classic token bucket; `take()` returns 0 when allowed, else seconds until a token is available"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ApiKey:
+    __slots__ = ("id", "digest", "label", "bucket")
+
+    def __init__(self, key_id: str, digest: str, label: Optional[str], rate: float, burst: float):
+        self.id = key_id
+        self.digest = digest
+        self.label = label
+        self.bucket = TokenBucket(rate, burst)
+
+
+class RateLimited(Exception):
+    def __init__(self, key: ApiKey, retry_after: float):
+        super().__init__(f"Rate limit exceeded for API key {key.id}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class ApiKeyRegistry:
+    """Hashed key lookup, hot-reloaded from a keys file, with a token bucket per key"""
+
+    def __init__(self, keys_file: Optional[str] = None, plaintext_keys: Iterable[str] = (),
+                 default_rate: float = DEFAULT_RATE, default_burst: float = DEFAULT_BURST,
+                 reload_interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.keys_file = keys_file
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.reload_interval = reload_interval
+        self._static = [
+            ApiKey(f"env-{i}", hash_api_key(k), None, default_rate, default_burst)
+            for i, k in enumerate(plaintext_keys)
+        ]
+        self._keys: Dict[str, ApiKey] = {}
+        self._file_mtime: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._load()
+
+    def _read_file(self) -> Iterable[ApiKey]:
+        with open(self.keys_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                record = json.loads(line)
+                yield ApiKey(
+                    record["id"], record["sha256"].lower(), record.get("label"),
+                    float(record.get("rate", self.default_rate)), float(record.get("burst", self.default_burst)),
+                )
+
+    def _load(self):
+        keys = {k.digest: k for k in self._static}
+        if self.keys_file:
+            try:
+                stat = os.stat(self.keys_file)
+                self._file_mtime = (stat.st_mtime_ns, stat.st_size)
+                for key in self._read_file():
+                    keys[key.digest] = key
+            except FileNotFoundError:
+                self._file_mtime = None
+        # Keep bucket state for keys that survive a reload with an unchanged quota
+        for digest, key in keys.items():
+            old = self._keys.get(digest)
+            if old is not None and (old.bucket.rate, old.bucket.burst) == (key.bucket.rate, key.bucket.burst):
+                key.bucket = old.bucket
+        self._keys = keys
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if not self.keys_file or now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            stat = os.stat(self.keys_file)
+            current = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            current = None
+        if current != self._file_mtime:
+            try:
+                self._load()
+            except (ValueError, KeyError, OSError) as e:
+                # A half-written or malformed file keeps the previous registry in place
+                print(f"[WARN] Could not reload API keys from {self.keys_file}: {e}")
+
+    def lookup(self, presented: str) -> Optional[ApiKey]:
+        """The registered key matching `presented`, or None"""
+        self._maybe_reload()
+        digest = hash_api_key(presented)
+        key = self._keys.get(digest)
+        if key is None or not hmac.compare_digest(key.digest, digest):
+            return None
+        return key
+
+    def authorize(self, presented: str) -> Optional[ApiKey]:
+        """Look up a key and charge one request to its bucket; raises RateLimited when it is empty"""
+        key = self.lookup(presented)
+        if key is not None:
+            retry_after = key.bucket.take()
+            if retry_after:
+                raise RateLimited(key, retry_after)
+        return key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def api_key_registry_from_env() -> ApiKeyRegistry:
+    """
+    Registry configured by:
+      AICOMPLYR_API_KEYS_FILE   JSON Lines keys file (hot-reloaded)
+      AICOMPLYR_API_KEYS        comma-separated plaintext keys
+      AICOMPLYR_API_RATE        default requests/second per key (default 50, 0 = unlimited)
+      AICOMPLYR_API_BURST       default burst per key (default 100)
+    """
+    keys_file = os.getenv("AICOMPLYR_API_KEYS_FILE", "").strip() or None
+    plaintext = [k.strip() for k in os.getenv("AICOMPLYR_API_KEYS", "").split(",") if k.strip()]
+    if not plaintext and not keys_file:
+        plaintext = [DEV_KEY]
+    return ApiKeyRegistry(
+        keys_file=keys_file,
+        plaintext_keys=plaintext,
+        default_rate=float(os.getenv("AICOMPLYR_API_RATE", str(DEFAULT_RATE))),
+        default_burst=float(os.getenv("AICOMPLYR_API_BURST", str(DEFAULT_BURST))),
+    )
@@ -0,0 +1,278 @@
+"""
+Queryable SQLite index over stored proof bundles.
+
+Maintained at write time alongside ProofBundleStore, so GET /v1/proof-bundles
+answers searches from indexed columns instead of opening bundle files:
+
+  bundles          one row per bundle: task, status, approval, tests_passed,
+                   execution timestamp (epoch microseconds) and display fields
+  bundle_files     (file, bundle) pairs for exact "touched file X" lookups
+  bundle_tags      (tag, bundle) pairs for compliance tag filters
+  bundles_fts      FTS5 over task id, what/why, files and tags for free text
+
+Results are ordered newest first and paginated with an opaque keyset cursor,
+so deep pages cost the same as the first one.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bundles (
+    id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    status TEXT,
+    approval TEXT NOT NULL,
+    tests_passed INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    stored_at_us INTEGER NOT NULL,
+    files TEXT NOT NULL,
+    compliance_tags TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bundles_ts ON bundles(ts_us, id);
+CREATE INDEX IF NOT EXISTS idx_bundles_task ON bundles(task_id, ts_us);
+
+CREATE TABLE IF NOT EXISTS bundle_files (
+    file TEXT NOT NULL,
+    bundle_id TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    PRIMARY KEY (file, ts_us, bundle_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS bundle_tags (
+    tag TEXT NOT NULL,
+    bundle_id TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    PRIMARY KEY (tag, ts_us, bundle_id)
+) WITHOUT ROWID;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS bundles_fts USING fts5(
+    bundle_id UNINDEXED, task_id, what, why, files, tags
+);
+"""
+
+# Columns returned per listed bundle
+_SUMMARY_COLUMNS = ("id", "task_id", "status", "approval", "tests_passed", "timestamp", "files", "compliance_tags")
+
+
+class BundleQueryError(ValueError):
+    """A search parameter could not be applied (bad cursor, malformed full-text query, ...)"""
+
+
+def _epoch_us(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1_000_000)
+
+
+def parse_bundle_timestamp(value: str, fallback_us: int) -> int:
+    """Epoch microseconds of an execution_log timestamp, or `fallback_us` if it is not ISO 8601"""
+    try:
+        return _epoch_us(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except (ValueError, AttributeError):
+        return fallback_us
+
+
+def encode_cursor(ts_us: int, bundle_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{ts_us}:{bundle_id}".encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        ts_us, bundle_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(":", 1)
+        return int(ts_us), bundle_id
+    except (ValueError, UnicodeError):
+        raise BundleQueryError("Invalid cursor")
+
+
+class ProofBundleIndex:
+    """SQLite (WAL) index of proof bundles; writes are serialised on one thread, reads run in parallel"""
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bundle-index-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(readers, 1), thread_name_prefix="bundle-index-reader")
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -- writes ------------------------------------------------------------
+
+    def add_many_sync(self, bundles: Iterable[Tuple[str, dict]]):
+        """Index (id, bundle dict) pairs in one transaction; already indexed ids are skipped"""
+        conn = self._conn()
+        now_us = int(time.time() * 1_000_000)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for bundle_id, bundle in bundles:
+                log = bundle["execution_log"]
+                ts_us = parse_bundle_timestamp(log.get("timestamp"), now_us)
+                files = log.get("files") or []
+                tags = log.get("compliance_tags") or []
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO bundles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        bundle_id, bundle["task_id"], log.get("status"), log.get("approval"),
+                        int(bool(log.get("tests_passed", True))), log.get("timestamp"), ts_us, now_us,
+                        json.dumps(files), json.dumps(tags),
+                    ),
+                ).rowcount
+                if not inserted:
+                    continue
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bundle_files VALUES (?, ?, ?)",
+                    [(f, bundle_id, ts_us) for f in files],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bundle_tags VALUES (?, ?, ?)",
+                    [(t, bundle_id, ts_us) for t in tags],
+                )
+                conn.execute(
+                    "INSERT INTO bundles_fts VALUES (?, ?, ?, ?, ?, ?)",
+                    (bundle_id, bundle["task_id"], log.get("what") or "", log.get("why") or "", " ".join(files), " ".join(tags)),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def add(self, bundle_id: str, bundle: dict):
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.add_many_sync, [(bundle_id, bundle)])
+
+    async def add_many(self, bundles: List[Tuple[str, dict]]):
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.add_many_sync, bundles)
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT NOT EXISTS (SELECT 1 FROM bundles)").fetchone()[0] == 1
+
+    # -- queries -----------------------------------------------------------
+
+    def search_sync(
+        self,
+        task_id: Optional[str] = None,
+        files: Iterable[str] = (),
+        tags: Iterable[str] = (),
+        status: Optional[str] = None,
+        approval: Optional[str] = None,
+        tests_passed: Optional[bool] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        text: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """One page of matching bundles, newest first, plus the cursor for the next page"""
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        clauses: List[str] = []
+        params: list = []
+
+        for column, value in (("b.task_id", task_id), ("b.status", status), ("b.approval", approval)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if tests_passed is not None:
+            clauses.append("b.tests_passed = ?")
+            params.append(int(tests_passed))
+        bounds = []
+        if since is not None:
+            bounds.append((">=", _epoch_us(since)))
+        if until is not None:
+            bounds.append(("<=", _epoch_us(until)))
+        for op, value in bounds:
+            clauses.append(f"b.ts_us {op} ?")
+            params.append(value)
+        # The (file|tag, ts_us) primary keys turn these into narrow range scans that drive the query
+        in_range = "".join(f" AND ts_us {op} ?" for op, _ in bounds)
+        bound_values = [value for _, value in bounds]
+        for f in files:
+            clauses.append(f"b.id IN (SELECT bundle_id FROM bundle_files WHERE file = ?{in_range})")
+            params.extend((f, *bound_values))
+        for t in tags:
+            clauses.append(f"b.id IN (SELECT bundle_id FROM bundle_tags WHERE tag = ?{in_range})")
+            params.extend((t, *bound_values))
+        if text:
+            clauses.append("b.id IN (SELECT bundle_id FROM bundles_fts WHERE bundles_fts MATCH ?)")
+            params.append(text)
+        if cursor:
+            after_ts, after_id = decode_cursor(cursor)
+            clauses.append("(b.ts_us, b.id) < (?, ?)")
+            params.extend((after_ts, after_id))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            f"SELECT {', '.join('b.' + c for c in _SUMMARY_COLUMNS)}, b.ts_us FROM bundles b {where} "
+            f"ORDER BY b.ts_us DESC, b.id DESC LIMIT ?"
+        )
+        try:
+            rows = self._conn().execute(sql, (*params, limit + 1)).fetchall()
+        except sqlite3.OperationalError as e:
+            # Only the FTS MATCH expression comes from the client verbatim
+            raise BundleQueryError(f"Invalid search query: {e}")
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(_SUMMARY_COLUMNS, row))
+            item["tests_passed"] = bool(item["tests_passed"])
+            item["files"] = json.loads(item["files"])
+            item["compliance_tags"] = json.loads(item["compliance_tags"])
+            items.append(item)
+        next_cursor = encode_cursor(rows[limit - 1][-1], rows[limit - 1][0]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def search(self, **query) -> dict:
+        return await asyncio.get_running_loop().run_in_executor(self._readers, lambda: self.search_sync(**query))
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+
+def rebuild_index(index: ProofBundleIndex, store, batch_size: int = 1000) -> int:
+    """Index every bundle already in `store` (ProofBundleStore); returns how many were visited"""
+    count = 0
+    batch = []
+    for bundle_id in store.iter_ids():
+        bundle = store.read(bundle_id)
+        if bundle is None:
+            continue
+        batch.append((bundle_id, bundle))
+        if len(batch) >= batch_size:
+            index.add_many_sync(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        index.add_many_sync(batch)
+        count += len(batch)
+    return count
+
+
+def bundle_index_from_env(bundles_dir: str) -> ProofBundleIndex:
+    """Index at AICOMPLYR_BUNDLE_INDEX (default <bundles_dir>/index.sqlite3)"""
+    return ProofBundleIndex(os.getenv("AICOMPLYR_BUNDLE_INDEX", os.path.join(bundles_dir, "index.sqlite3")))
@@ -0,0 +1,287 @@
+"""
+Content-addressed proof bundle storage for aicomplyr_server.
+
+Bundles are serialised to canonical JSON (sorted keys, compact separators)
+and stored under the SHA-256 of those bytes, sharded two directory levels
+deep so no single directory grows unbounded:
+
+    proof_bundles/ab/cd/abcd...ef.json
+
+Writes go to a temp file in the shard directory, are made durable (unless
+disabled) and then renamed into place, so readers never see a partial bundle,
+and the rename is made durable before the write is acknowledged:
+
+- put() fsyncs the file, renames it and fsyncs its shard directory
+- put_many() stages the whole batch, then on Linux issues one syncfs(2) on the
+  store's filesystem, renames every file and issues a second syncfs: two
+  barriers per batch whatever its size (random digests rarely share a shard,
+  so per-directory fsyncs would cost one per bundle). Elsewhere it falls back
+  to put()'s per-file and per-directory fsyncs.
+
+Identical bundles share one file. All disk I/O runs on a dedicated thread pool, and
+concurrent puts of the same content are coalesced, so the event loop never
+blocks on the filesystem.
+"""
+
+import asyncio
+import ctypes
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+DEFAULT_WRITERS = 8
+
+BUNDLE_SUFFIX = ".json"
+
+
+def canonical_bundle_bytes(bundle: dict) -> bytes:
+    """Stable serialisation used for both hashing and storage"""
+    return json.dumps(bundle, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def bundle_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ProofBundleStore:
+    """Sharded, content-addressed bundle files with offloaded atomic writes"""
+
+    def __init__(self, root: str, writers: int = DEFAULT_WRITERS, fsync: bool = True):
+        self.root = root
+        self.fsync = fsync
+        self._executor = ThreadPoolExecutor(max_workers=max(writers, 1), thread_name_prefix="bundle-writer")
+        # Shard directories known to exist, so hot paths skip makedirs()
+        self._shards: Set[str] = set()
+        # Writes in progress by digest; a duplicate put awaits the first instead of writing again
+        self._inflight: Dict[str, asyncio.Future] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _shard_dir(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4])
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self._shard_dir(digest), digest + BUNDLE_SUFFIX)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def _stage(self, digest: str, data: bytes, dirs: Set[str], fsync: bool) -> str:
+        """
+        Write data to a temp file in the bundle's shard; returns the temp path and adds
+        the directories whose entries the write changes (or will, on rename) to `dirs`
+        """
+        shard = self._shard_dir(digest)
+        if shard not in self._shards:
+            # A new shard's own entry (and its parent's) must reach the disk as well
+            for directory in (os.path.dirname(shard), shard):
+                if not os.path.isdir(directory):
+                    dirs.add(os.path.dirname(directory))
+            os.makedirs(shard, exist_ok=True)
+            self._shards.add(shard)
+        dirs.add(shard)
+
+        fd, tmp = tempfile.mkstemp(dir=shard, prefix=".tmp-", suffix=BUNDLE_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            _unlink_quietly(tmp)
+            raise
+        return tmp
+
+    def _write(self, digest: str, data: bytes) -> bool:
+        """Blocking write; returns False when the bundle was already stored"""
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return False
+
+        dirs: Set[str] = set()
+        tmp = self._stage(digest, data, dirs, self.fsync)
+        try:
+            # Same content under the same name, so a racing writer from another process is harmless
+            os.replace(tmp, path)
+        except BaseException:
+            _unlink_quietly(tmp)
+            raise
+        if self.fsync:
+            _fsync_dirs(dirs)
+        return True
+
+    def _write_many(self, items: List[Tuple[str, bytes]]) -> List[bool]:
+        """
+        Blocking grouped write with one barrier for the data and one for the renames
+        (see module docstring); returns per-item `created` flags
+        """
+        created = []
+        staged: Dict[str, str] = {}
+        dirs: Set[str] = set()
+        grouped = self.fsync and _SYNCFS is not None
+        try:
+            for digest, data in items:
+                if digest in staged or os.path.exists(self.path_for(digest)):
+                    created.append(False)
+                    continue
+                staged[digest] = self._stage(digest, data, dirs, fsync=self.fsync and not grouped)
+                created.append(True)
+            if grouped and staged:
+                # File contents must be on disk before any rename exposes them under their id
+                _syncfs(self.root)
+            for digest in list(staged):
+                os.replace(staged[digest], self.path_for(digest))
+                del staged[digest]
+        except BaseException:
+            for tmp in staged.values():
+                _unlink_quietly(tmp)
+            raise
+        if grouped and dirs:
+            _syncfs(self.root)
+        elif self.fsync:
+            _fsync_dirs(dirs)
+        return created
+
+    async def put(self, bundle: dict) -> Tuple[str, bool]:
+        """Store a bundle; returns (sha256 id, whether it was newly written)"""
+        data = canonical_bundle_bytes(bundle)
+        digest = bundle_digest(data)
+
+        pending = self._inflight.get(digest)
+        if pending is not None:
+            await asyncio.shield(pending)
+            return digest, False
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._write, digest, data)
+        self._inflight[digest] = future
+        try:
+            created = await asyncio.shield(future)
+        finally:
+            if self._inflight.get(digest) is future:
+                del self._inflight[digest]
+        return digest, created
+
+    async def put_many(self, bundles: List[dict]) -> List[Tuple[str, bool]]:
+        """Store a batch of bundles with one grouped write; returns (sha256 id, newly written) per bundle"""
+        items = []
+        for bundle in bundles:
+            data = canonical_bundle_bytes(bundle)
+            items.append((bundle_digest(data), data))
+
+        # Bundles a concurrent put() or put_many() is already writing count as duplicates once
+        # that write lands; re-checked after every wait, since others may have started meanwhile
+        inflight: Set[str] = set()
+        while True:
+            pending = [(digest, self._inflight[digest]) for digest, _ in items
+                       if digest in self._inflight and digest not in inflight]
+            if not pending:
+                break
+            for digest, future in pending:
+                inflight.add(digest)
+                await asyncio.shield(future)
+        to_write = [(digest, data) for digest, data in items if digest not in inflight]
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._write_many, to_write)
+        # Register before yielding to the loop, so a put() of the same content waits for this batch
+        registered = {digest for digest, _ in to_write}
+        for digest in registered:
+            self._inflight[digest] = future
+        try:
+            created = iter(await asyncio.shield(future))
+        finally:
+            for digest in registered:
+                if self._inflight.get(digest) is future:
+                    del self._inflight[digest]
+        return [(digest, False if digest in inflight else next(created)) for digest, _ in items]
+
+    def iter_ids(self) -> Iterator[str]:
+        """Ids of every stored bundle, walking the shard directories"""
+        for outer in sorted(os.scandir(self.root), key=lambda e: e.name):
+            if not (outer.is_dir() and len(outer.name) == 2):
+                continue
+            for inner in sorted(os.scandir(outer.path), key=lambda e: e.name):
+                if not inner.is_dir():
+                    continue
+                for entry in os.scandir(inner.path):
+                    if entry.name.endswith(BUNDLE_SUFFIX) and not entry.name.startswith("."):
+                        yield entry.name[:-len(BUNDLE_SUFFIX)]
+
+    def read(self, digest: str) -> Optional[dict]:
+        """Blocking load of a stored bundle, or None"""
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    async def get(self, digest: str) -> Optional[dict]:
+        """Load a stored bundle by id, or None"""
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.read, digest)
+
+    def close(self):
+        """Wait for queued writes and stop the writer threads"""
+        self._executor.shutdown(wait=True)
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _load_syncfs():
+    """libc syncfs(2) on Linux, else None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError):
+        return None
+
+
+_SYNCFS = _load_syncfs()
+
+
+def _syncfs(path: str):
+    """Flush the filesystem holding `path`: file data, metadata and directory entries"""
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        if _SYNCFS(fd) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dirs(dirs: Set[str]):
+    """Make renames and new entries in these directories durable (deepest first)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows cannot open directories; NTFS journals its metadata
+    for directory in sorted(dirs, key=len, reverse=True):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def bundle_store_from_env(root: str) -> ProofBundleStore:
+    """
+    Store rooted at `root`, tuned by:
+      AICOMPLYR_BUNDLE_WRITERS  writer threads (default 8)
+      AICOMPLYR_BUNDLE_FSYNC    fsync each bundle before it is acknowledged (default true)
+    """
+    return ProofBundleStore(
+        root,
+        writers=int(os.getenv("AICOMPLYR_BUNDLE_WRITERS", str(DEFAULT_WRITERS))),
+        fsync=os.getenv("AICOMPLYR_BUNDLE_FSYNC", "true").lower() == "true",
+    )
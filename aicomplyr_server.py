@@ -6,53 +6,89 @@ Receives proof bundles from Cursor execution logs and stores them locally.
 Run with: uvicorn aicomplyr_server:app --reload
 """
 
-from fastapi import FastAPI, File, UploadFile, Header, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional
-import shutil
-import os
-import json
 from datetime import datetime
+import asyncio
+import gzip
+import json
+import math
+import os
+
+from aicomplyr_api_keys import RateLimited, api_key_registry_from_env
+from aicomplyr_bundle_store import bundle_store_from_env
+from aicomplyr_bundle_index import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    BundleQueryError,
+    bundle_index_from_env,
+    rebuild_index,
+)
+from api.ndjson import NDJSONError, is_gzip, iter_ndjson_lines
+from aicomplyr_upload_store import MultipartFileStream, UploadError, upload_store_from_env
+from api.instrumentation import instrumentation_from_env
 
 app = FastAPI(title="AICOMPLYR Engine - Local Dev")
 
+# Bundles validated before a grouped store write (one durability barrier per batch)
+BULK_BATCH_SIZE = int(os.getenv("AICOMPLYR_BULK_BATCH_SIZE", "500"))
+
 UPLOAD_DIR = "uploads"
 BUNDLES_DIR = "proof_bundles"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(BUNDLES_DIR, exist_ok=True)
 
-def _get_allowed_api_keys() -> set[str]:
-    """
-    Minimal API key management (dev-only):
-    - Reads comma-separated allowlist from AICOMPLYR_API_KEYS
-    - Falls back to DEV_MODE_TEST_KEY_001 if unset (convenient local default)
-    """
-    raw = os.getenv("AICOMPLYR_API_KEYS", "").strip()
-    if not raw:
-        return {"DEV_MODE_TEST_KEY_001"}
-    return {k.strip() for k in raw.split(",") if k.strip()}
+# Content-addressed, sharded bundle files; writes run off the event loop
+BUNDLE_STORE = bundle_store_from_env(BUNDLES_DIR)
+
+# Searchable SQLite index over stored bundles, updated as they arrive
+BUNDLE_INDEX = bundle_index_from_env(BUNDLES_DIR)
+
+# Raw evidence files: streamed to disk off the event loop, hashed in-stream, resumable
+UPLOAD_STORE = upload_store_from_env(UPLOAD_DIR)
+
+# API keys, held as SHA-256 hashes with a token bucket each; the keys file is hot-reloaded
+API_KEYS = api_key_registry_from_env()
+
+def _authorize(api_key: str) -> str:
+    try:
+        key = API_KEYS.authorize(api_key)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded for this API key",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    if key is None:
+        raise HTTPException(status_code=403, detail="Invalid AICOMPLYR API Key")
+    return api_key
 
 
 def _require_bearer_api_key(authorization: Optional[str]) -> str:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
 
-    api_key = authorization.replace("Bearer ", "", 1).strip()
-    if api_key not in _get_allowed_api_keys():
-        raise HTTPException(status_code=403, detail="Invalid AICOMPLYR API Key")
-
-    return api_key
+    return _authorize(authorization.replace("Bearer ", "", 1).strip())
 
 
 def _require_header_api_key(x_api_key: Optional[str]) -> str:
     if not x_api_key:
         raise HTTPException(status_code=401, detail="Missing x-api-key header")
 
-    api_key = x_api_key.strip()
-    if api_key not in _get_allowed_api_keys():
-        raise HTTPException(status_code=403, detail="Invalid AICOMPLYR API Key")
+    return _authorize(x_api_key.strip())
+
+
+def _require_metrics_api_key(request: Request) -> str:
+    # Scrapers can send the key as x-api-key or as a bearer token (Prometheus `authorization`)
+    if request.headers.get("authorization"):
+        return _require_bearer_api_key(request.headers["authorization"])
+    return _require_header_api_key(request.headers.get("x-api-key"))
 
-    return api_key
+
+# Per-route latency, size and in-flight metrics at GET /metrics (API key required, like every
+# other route); AICOMPLYR_SLOW_REQUEST_SECONDS turns on stack sampling for slow requests
+REQUEST_METRICS = instrumentation_from_env(app, authorize=_require_metrics_api_key)
 
 
 class ExecutionLog(BaseModel):
@@ -82,14 +118,12 @@ async def create_proof_bundle(
     # 1. Validate API key
     _require_bearer_api_key(authorization)
 
-    # 2. Store the proof bundle
-    bundle_id = f"{bundle.task_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-    bundle_path = f"{BUNDLES_DIR}/{bundle_id}.json"
-
-    with open(bundle_path, "w", encoding="utf-8") as f:
-        json.dump(bundle.model_dump(), f, indent=2)
+    # 2. Store the proof bundle under the SHA-256 of its canonical JSON (identical bundles share one file)
+    data = bundle.model_dump()
+    bundle_id, created = await BUNDLE_STORE.put(data)
+    await BUNDLE_INDEX.add(bundle_id, data)
 
-    print(f"[OK] Received proof bundle: {bundle_id}")
+    print(f"[OK] Received proof bundle: {bundle_id}{'' if created else ' (duplicate)'}")
     print(f"     Task: {bundle.task_id}")
     print(f"     Files: {bundle.execution_log.files}")
     print(f"     Status: {bundle.execution_log.status}")
@@ -97,27 +131,317 @@ async def create_proof_bundle(
     # 3. Response
     return {
         "id": bundle_id,
+        "task_id": bundle.task_id,
         "status": "stored",
+        "deduplicated": not created,
         "message": "Proof bundle received and secured."
     }
 
 
-@app.post("/upload-proof")
+def _validation_errors(e: ValidationError) -> list:
+    return [{"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]} for err in e.errors()]
+
+
+def _bulk_summary(results: list) -> dict:
+    rejected = sum(1 for r in results if r["status"] == "rejected")
+    return {
+        "status": "success" if not rejected else "partial",
+        "stored": sum(1 for r in results if r["status"] == "stored"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "rejected": rejected,
+        "results": results,
+    }
+
+
+async def _store_bulk(pending: list):
+    """Write a batch of (result, bundle dict) pairs and fill in each result's id and status"""
+    if not pending:
+        return
+    stored = await BUNDLE_STORE.put_many([data for _, data in pending])
+    await BUNDLE_INDEX.add_many([(bundle_id, data) for (bundle_id, _), (_, data) in zip(stored, pending)])
+    for (bundle_id, created), (result, _) in zip(stored, pending):
+        result.update(id=bundle_id, status="stored" if created else "duplicate")
+
+
+@app.post("/v1/proof-bundles/bulk")
+async def create_proof_bundles_bulk(
+    request: Request,
+    authorization: str = Header(None)
+):
+    """
+    Receive many proof bundles in one request: a JSON array, or NDJSON
+    (Content-Type: application/x-ndjson), either optionally with
+    Content-Encoding: gzip. NDJSON is validated line by line as it arrives.
+    Returns an id or validation errors per bundle.
+    """
+    _require_bearer_api_key(authorization)
+
+    gzipped = is_gzip(request.headers.get("content-encoding"))
+    results = []
+    pending = []
+
+    if "ndjson" not in request.headers.get("content-type", "").lower():
+        try:
+            body = await request.body()
+            records = json.loads(gzip.decompress(body) if gzipped else body)
+        except (ValueError, OSError, EOFError):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of proof bundles")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of proof bundles")
+
+        for index, record in enumerate(records):
+            try:
+                bundle = ProofBundle.model_validate(record)
+            except ValidationError as e:
+                results.append({"index": index, "status": "rejected", "errors": _validation_errors(e)})
+                continue
+            result = {"index": index, "task_id": bundle.task_id}
+            results.append(result)
+            pending.append((result, bundle.model_dump()))
+            if len(pending) >= BULK_BATCH_SIZE:
+                await _store_bulk(pending)
+                pending = []
+        await _store_bulk(pending)
+        print(f"[OK] Received {len(results)} proof bundles in bulk")
+        return _bulk_summary(results)
+
+    try:
+        async for line_no, line in iter_ndjson_lines(request.stream(), gzipped=gzipped):
+            try:
+                bundle = ProofBundle.model_validate_json(line)
+            except ValidationError as e:
+                results.append({"line": line_no, "status": "rejected", "errors": _validation_errors(e)})
+                continue
+            result = {"line": line_no, "task_id": bundle.task_id}
+            results.append(result)
+            pending.append((result, bundle.model_dump()))
+            if len(pending) >= BULK_BATCH_SIZE:
+                await _store_bulk(pending)
+                pending = []
+        await _store_bulk(pending)
+    except NDJSONError as e:
+        # Bundles before the bad chunk are kept; report them alongside the error
+        await _store_bulk(pending)
+        summary = _bulk_summary(results)
+        summary.update(status="error", detail=str(e))
+        return JSONResponse(status_code=400, content=summary)
+
+    print(f"[OK] Received {len(results)} proof bundles in bulk")
+    return _bulk_summary(results)
+
+
+@app.get("/v1/proof-bundles")
+async def search_proof_bundles(
+    task_id: Optional[str] = None,
+    file: List[str] = Query([]),
+    tag: List[str] = Query([]),
+    status: Optional[str] = None,
+    approval: Optional[str] = None,
+    tests_passed: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    authorization: str = Header(None)
+):
+    """
+    List stored proof bundles, newest first, from the bundle index.
+
+    Repeated file/tag parameters must all match; q is an FTS5 full-text
+    query over task id, what/why, files and tags. Pass next_cursor back
+    as cursor for the following page.
+    """
+    _require_bearer_api_key(authorization)
+
+    try:
+        return await BUNDLE_INDEX.search(
+            task_id=task_id,
+            files=file,
+            tags=tag,
+            status=status,
+            approval=approval,
+            tests_passed=tests_passed,
+            since=since,
+            until=until,
+            text=q,
+            limit=limit,
+            cursor=cursor,
+        )
+    except BundleQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/v1/proof-bundles/{bundle_id}")
+async def get_proof_bundle(
+    bundle_id: str,
+    authorization: str = Header(None)
+):
+    """
+    Fetch a stored proof bundle by its content hash.
+    """
+    _require_bearer_api_key(authorization)
+
+    bundle = await BUNDLE_STORE.get(bundle_id)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Proof bundle not found")
+    return bundle
+
+
+def _check_content_length(request: Request):
+    # Reject oversized bodies up front; the limit is enforced again while streaming
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > UPLOAD_STORE.max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {UPLOAD_STORE.max_bytes} byte limit")
+
+
+async def _stored_upload(operation):
+    try:
+        return await operation
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+# The form is parsed from the request stream rather than declared as a File() parameter, which
+# would make Starlette spool the whole upload to a temp file before this handler runs
+_MULTIPART_FILE_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    },
+}
+
+
+@app.post("/upload-proof", openapi_extra=_MULTIPART_FILE_BODY)
 async def upload_proof_file(
-    file: UploadFile = File(...),
+    request: Request,
+    x_api_key: str = Header(None)
+):
+    """
+    Alternative endpoint for raw file uploads (multipart form, `file` field).
+    """
+    _require_header_api_key(x_api_key)
+    _check_content_length(request)
+
+    async def store():
+        file = MultipartFileStream(request.headers.get("content-type"), request.stream())
+        return await UPLOAD_STORE.save_stream(await file.open(), file)
+
+    stored = await _stored_upload(store())
+
+    print(f"[OK] Received file upload: {stored['filename']} ({stored['size']} bytes, sha256 {stored['sha256']})")
+    return {"status": "success", "filename": stored["filename"], "sha256": stored["sha256"], "size": stored["size"]}
+
+
+@app.put("/upload-proof/{filename}")
+async def stream_proof_file(
+    filename: str,
+    request: Request,
+    x_api_key: str = Header(None)
+):
+    """
+    Raw-body upload: the request body is streamed straight to disk without multipart spooling.
+    """
+    _require_header_api_key(x_api_key)
+    _check_content_length(request)
+
+    stored = await _stored_upload(UPLOAD_STORE.save_stream(filename, request.stream()))
+
+    print(f"[OK] Received file upload: {stored['filename']} ({stored['size']} bytes, sha256 {stored['sha256']})")
+    return {"status": "success", "filename": stored["filename"], "sha256": stored["sha256"], "size": stored["size"]}
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+
+@app.post("/v1/uploads", status_code=201)
+async def create_upload(
+    body: UploadSessionRequest,
     x_api_key: str = Header(None)
 ):
     """
-    Alternative endpoint for raw file uploads.
+    Start a resumable upload. Send parts with PUT /v1/uploads/{upload_id}?offset=N,
+    check progress with GET, then POST /v1/uploads/{upload_id}/complete.
     """
     _require_header_api_key(x_api_key)
+    return await _stored_upload(UPLOAD_STORE.create(body.filename, body.size, body.sha256))
+
+
+@app.get("/v1/uploads/{upload_id}")
+async def get_upload(
+    upload_id: str,
+    x_api_key: str = Header(None)
+):
+    """
+    Current offset of a resumable upload; resume by sending the next part from there.
+    """
+    _require_header_api_key(x_api_key)
+    return await _stored_upload(UPLOAD_STORE.status(upload_id))
+
+
+@app.put("/v1/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_api_key: str = Header(None)
+):
+    """
+    Append the raw request body to a resumable upload at `offset`.
+    """
+    _require_header_api_key(x_api_key)
+    _check_content_length(request)
+    return await _stored_upload(UPLOAD_STORE.append(upload_id, offset, request.stream()))
+
+
+@app.post("/v1/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    x_api_key: str = Header(None)
+):
+    """
+    Finish a resumable upload, verifying its declared size and SHA-256.
+    """
+    _require_header_api_key(x_api_key)
+    stored = await _stored_upload(UPLOAD_STORE.complete(upload_id))
+
+    print(f"[OK] Completed upload: {stored['filename']} ({stored['size']} bytes, sha256 {stored['sha256']})")
+    return {"status": "success", "filename": stored["filename"], "sha256": stored["sha256"], "size": stored["size"]}
+
+
+@app.delete("/v1/uploads/{upload_id}", status_code=204)
+async def abort_upload(
+    upload_id: str,
+    x_api_key: str = Header(None)
+):
+    """
+    Abandon a resumable upload and discard the bytes received so far.
+    """
+    _require_header_api_key(x_api_key)
+    await _stored_upload(UPLOAD_STORE.abort(upload_id))
+
+
+@app.on_event("startup")
+async def startup():
+    # First run with an index (or after deleting it): index bundles already on disk
+    if BUNDLE_INDEX.is_empty():
+        indexed = await asyncio.to_thread(rebuild_index, BUNDLE_INDEX, BUNDLE_STORE)
+        if indexed:
+            print(f"[OK] Indexed {indexed} existing proof bundles")
 
-    file_location = f"{UPLOAD_DIR}/{file.filename}"
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
-    print(f"[OK] Received file upload: {file.filename}")
-    return {"status": "success", "filename": file.filename}
+@app.on_event("shutdown")
+async def shutdown():
+    BUNDLE_STORE.close()
+    BUNDLE_INDEX.close()
+    UPLOAD_STORE.close()
 
 
 @app.get("/health")
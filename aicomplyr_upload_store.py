@@ -0,0 +1,403 @@
+"""
+Streaming, hashed and resumable file uploads for aicomplyr_server.
+
+Upload bodies are consumed chunk by chunk: each chunk is hashed (SHA-256)
+and appended to a part file on a dedicated thread pool, so the event loop
+never blocks on disk and the data is never read back to compute its hash.
+A size cap is enforced while streaming, before the limit is exceeded on disk.
+Multipart form uploads are parsed from the request stream as well
+(MultipartFileStream), rather than spooled to a temp file and read back.
+
+Resumable uploads are sessions identified by an upload id:
+
+    uploads/.partial/<upload_id>.part   bytes received so far
+    uploads/.partial/<upload_id>.json   filename, declared size/sha256
+
+A client appends at the current offset (re-sent bytes are rejected rather
+than silently duplicated), can ask for the offset after a failure, and
+completes the session once all bytes are in. Completed files are stored as
+
+    uploads/<sha256>/<filename>
+
+The running hash of each session is kept in memory; only after a server
+restart is the partial file re-hashed once to restore it.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+DEFAULT_WRITERS = 4
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+PARTIAL_DIR = ".partial"
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    """An upload request could not be applied; `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def safe_filename(name: Optional[str]) -> str:
+    """Client-supplied name reduced to a single path component"""
+    name = os.path.basename((name or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        return "upload.bin"
+    return name
+
+
+class _Session:
+    __slots__ = ("upload_id", "filename", "size", "sha256", "offset", "hasher", "lock")
+
+    def __init__(self, upload_id: str, filename: str, size: Optional[int], sha256: Optional[str]):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.lock = asyncio.Lock()
+
+    def describe(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "offset": self.offset,
+            "size": self.size,
+        }
+
+
+class UploadStore:
+    """Chunked upload writer with in-stream hashing, size limits and resumable sessions"""
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, writers: int = DEFAULT_WRITERS,
+                 fsync: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._partial = os.path.join(root, PARTIAL_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=max(writers, 1), thread_name_prefix="upload-writer")
+        self._sessions: Dict[str, _Session] = {}
+        os.makedirs(self._partial, exist_ok=True)
+
+    # -- blocking helpers (run on the writer pool) ---------------------------
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self._partial, upload_id + ".part")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self._partial, upload_id + ".json")
+
+    @staticmethod
+    def _append(fd: int, hasher, chunk: bytes):
+        hasher.update(chunk)
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(fd, view):]
+
+    def _finish_file(self, fd: int):
+        if self.fsync:
+            os.fsync(fd)
+        os.close(fd)
+
+    def _place(self, src: str, digest: str, filename: str) -> str:
+        """Move a fully written file to uploads/<sha256>/<filename>"""
+        target_dir = os.path.join(self.root, digest)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, filename)
+        os.replace(src, target)
+        return target
+
+    def _load_session(self, upload_id: str) -> Optional[_Session]:
+        """Restore a session from disk, re-hashing what was received before a restart"""
+        try:
+            with open(self._meta_path(upload_id), "rb") as f:
+                meta = json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        session = _Session(upload_id, meta["filename"], meta.get("size"), meta.get("sha256"))
+        try:
+            with open(self._part_path(upload_id), "rb") as f:
+                for chunk in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), b""):
+                    session.hasher.update(chunk)
+                    session.offset += len(chunk)
+        except FileNotFoundError:
+            # Completed or aborted between moving the part and removing its metadata; nothing to resume
+            _unlink_quietly(self._meta_path(upload_id))
+            return None
+        return session
+
+    # -- streaming -----------------------------------------------------------
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _check_size(self, total: int, declared: Optional[int]):
+        if total > self.max_bytes:
+            raise UploadError(413, f"Upload exceeds the {self.max_bytes} byte limit")
+        if declared is not None and total > declared:
+            raise UploadError(400, f"Upload exceeds its declared size of {declared} bytes")
+
+    async def _stream_into(self, fd: int, hasher, chunks: AsyncIterator[bytes], start: int,
+                           declared: Optional[int]) -> int:
+        """Append chunks to fd, hashing as they pass; returns the new total length"""
+        total = start
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            total += len(chunk)
+            self._check_size(total, declared)
+            await self._run(self._append, fd, hasher, chunk)
+        return total
+
+    async def save_stream(self, filename: Optional[str], chunks: AsyncIterator[bytes]) -> dict:
+        """Store a one-shot upload; returns its sha256, size and stored path"""
+        filename = safe_filename(filename)
+        tmp = os.path.join(self._partial, f"{secrets.token_hex(16)}.oneshot")
+        fd = await self._run(os.open, tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        hasher = hashlib.sha256()
+        try:
+            try:
+                size = await self._stream_into(fd, hasher, chunks, 0, None)
+            finally:
+                await self._run(self._finish_file, fd)
+            digest = hasher.hexdigest()
+            path = await self._run(self._place, tmp, digest, filename)
+        except BaseException:
+            await self._run(_unlink_quietly, tmp)
+            raise
+        return {"filename": filename, "sha256": digest, "size": size, "path": path}
+
+    # -- resumable sessions --------------------------------------------------
+
+    async def create(self, filename: Optional[str], size: Optional[int] = None,
+                     sha256: Optional[str] = None) -> dict:
+        """Open a resumable upload; `size` and `sha256`, if given, are verified on completion"""
+        if size is not None:
+            if size < 0:
+                raise UploadError(400, "Declared size must not be negative")
+            self._check_size(size, None)
+        if sha256 is not None:
+            sha256 = sha256.lower()
+            if not _SHA256.match(sha256):
+                raise UploadError(400, "Declared sha256 must be 64 hex characters")
+
+        session = _Session(secrets.token_hex(16), safe_filename(filename), size, sha256)
+        meta = json.dumps({
+            "filename": session.filename, "size": size, "sha256": sha256, "created_at": time.time(),
+        }).encode("utf-8")
+        await self._run(self._create_files, session.upload_id, meta)
+        self._sessions[session.upload_id] = session
+        return session.describe()
+
+    def _create_files(self, upload_id: str, meta: bytes):
+        open(self._part_path(upload_id), "xb").close()
+        with open(self._meta_path(upload_id), "wb") as f:
+            f.write(meta)
+
+    async def _session(self, upload_id: str) -> _Session:
+        session = self._sessions.get(upload_id)
+        if session is None:
+            if not _UPLOAD_ID.match(upload_id):
+                raise UploadError(404, "Upload not found")
+            session = await self._run(self._load_session, upload_id)
+            if session is None:
+                raise UploadError(404, "Upload not found")
+            session = self._sessions.setdefault(upload_id, session)
+        return session
+
+    async def status(self, upload_id: str) -> dict:
+        return (await self._session(upload_id)).describe()
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+        """Append a part at `offset`, which must equal the bytes received so far"""
+        session = await self._session(upload_id)
+        if session.lock.locked():
+            raise UploadError(409, "Another part is already being written to this upload")
+        async with session.lock:
+            if offset != session.offset:
+                raise UploadError(409, f"Upload is at offset {session.offset}, not {offset}")
+            try:
+                fd = await self._run(os.open, self._part_path(upload_id), os.O_WRONLY | os.O_APPEND)
+            except FileNotFoundError:
+                self._sessions.pop(upload_id, None)
+                raise UploadError(404, "Upload not found")
+            # Work on a copy so a failed part leaves the session hash at the last good offset
+            hasher = session.hasher.copy()
+            try:
+                total = await self._stream_into(fd, hasher, chunks, session.offset, session.size)
+            except BaseException:
+                await self._run(_truncate_and_close, fd, session.offset)
+                raise
+            await self._run(self._finish_file, fd)
+            session.offset = total
+            session.hasher = hasher
+            return session.describe()
+
+    async def complete(self, upload_id: str) -> dict:
+        """Verify a finished upload and move it into place"""
+        session = await self._session(upload_id)
+        async with session.lock:
+            if session.size is not None and session.offset != session.size:
+                raise UploadError(409, f"Upload has {session.offset} of {session.size} bytes")
+            digest = session.hasher.hexdigest()
+            if session.sha256 is not None and digest != session.sha256:
+                raise UploadError(422, f"SHA-256 mismatch: received {digest}")
+            try:
+                path = await self._run(self._place, self._part_path(upload_id), digest, session.filename)
+            except FileNotFoundError:
+                self._sessions.pop(upload_id, None)
+                raise UploadError(404, "Upload not found")
+            await self._run(_unlink_quietly, self._meta_path(upload_id))
+            self._sessions.pop(upload_id, None)
+            return {"filename": session.filename, "sha256": digest, "size": session.offset, "path": path}
+
+    async def abort(self, upload_id: str):
+        session = await self._session(upload_id)
+        async with session.lock:
+            await self._run(_unlink_quietly, self._part_path(upload_id))
+            await self._run(_unlink_quietly, self._meta_path(upload_id))
+            self._sessions.pop(upload_id, None)
+
+    def close(self):
+        """Wait for queued writes and stop the writer threads"""
+        self._executor.shutdown(wait=True)
+
+
+class MultipartFileStream:
+    """
+    One file field of a multipart/form-data body, parsed as the body arrives so the
+    file streams into save_stream() instead of being spooled to a temp file first.
+    Call open() to read up to the field's headers (and learn its filename), then
+    iterate the field's bytes. Fields after it are left unread.
+    """
+
+    def __init__(self, content_type: Optional[str], body: AsyncIterator[bytes], field: str = "file"):
+        media_type, params = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+            raise UploadError(400, "Expected a multipart/form-data body")
+        self.filename: Optional[str] = None
+        self._field = field.encode("utf-8")
+        self._body = body.__aiter__()
+        self._parsed: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._found = self._in_field = self._field_done = False
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # -- parser callbacks ------------------------------------------------------
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        if not self._found and options.get(b"name") == self._field:
+            self._found = self._in_field = True
+            self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_field:
+            self._parsed.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_field:
+            self._in_field = False
+            self._field_done = True
+
+    # -- reading ---------------------------------------------------------------
+
+    async def _feed(self) -> bool:
+        """Parse the next body chunk; False once the body is exhausted"""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(400, f"Malformed multipart body: {e}")
+        return True
+
+    async def open(self) -> Optional[str]:
+        """Read up to the start of the file field; returns the client's filename"""
+        while not self._found:
+            if not await self._feed():
+                raise UploadError(422, f"Multipart body has no '{self._field.decode()}' field")
+        return self.filename
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        await self.open()
+        while True:
+            if self._parsed:
+                chunk, self._parsed = b"".join(self._parsed), []
+                yield chunk
+            if self._field_done:
+                return
+            if not await self._feed():
+                raise UploadError(400, "Multipart body ended inside the file field")
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _truncate_and_close(fd: int, length: int):
+    try:
+        os.ftruncate(fd, length)
+    finally:
+        os.close(fd)
+
+
+def upload_store_from_env(root: str) -> UploadStore:
+    """
+    Store rooted at `root`, tuned by:
+      AICOMPLYR_UPLOAD_MAX_BYTES  largest accepted file (default 5 GiB)
+      AICOMPLYR_UPLOAD_WRITERS    writer threads (default 4)
+      AICOMPLYR_UPLOAD_FSYNC      fsync each file before it is acknowledged (default true)
+    """
+    return UploadStore(
+        root,
+        max_bytes=int(os.getenv("AICOMPLYR_UPLOAD_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+        writers=int(os.getenv("AICOMPLYR_UPLOAD_WRITERS", str(DEFAULT_WRITERS))),
+        fsync=os.getenv("AICOMPLYR_UPLOAD_FSYNC", "true").lower() == "true",
+    )
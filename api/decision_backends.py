@@ -0,0 +1,586 @@
+"""
+Pluggable storage backends behind the /api decision router.
+
+  memory  columnar store + running aggregates + rollups in this process,
+          optionally made durable by the append-only decision log. Fastest,
+          but each uvicorn/gunicorn worker sees only its own decisions.
+  sqlite  one embedded SQLite database in WAL mode shared by every worker
+          process on the host. Aggregates and rollups are updated in the
+          same transaction as the insert, so every worker reads identical,
+          constant-time metrics without an external service.
+
+Select with AICOMPLYR_DECISION_STORE (memory | sqlite, default memory); the
+SQLite file lives at AICOMPLYR_DECISION_DB (default decisions.db).
+"""
+
+import os
+import sqlite3
+import threading
+import uuid
+from bisect import bisect_right
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from api.decision_index import from_epoch_us, to_epoch_us
+from api.decision_log import DecisionLog, decision_log_from_env
+from api.decision_store import CATEGORICAL_FIELDS, ColumnarDecisionStore
+from api.latency_sketch import LATENCY_DIMENSIONS, DDSketch, LatencyTracker, latency_summary
+from api.metrics_aggregator import COMPLIANCE_THRESHOLD, MetricsAggregator
+from api.rollups import GRANULARITIES, ROLLUP_DIMENSIONS, DecisionRollups, rollup_row
+from models.governance_decision import GovernanceDecision
+
+_DAY_US = 86400 * 1_000_000
+
+
+class DecisionStoreBackend:
+    """Everything the router needs from a decision store"""
+
+    # False when contents vanish with the process (the router then seeds demo data)
+    persistent = False
+
+    def startup(self):
+        """Load or connect (called once per worker at app startup)"""
+
+    def shutdown(self):
+        """Flush and release resources (called at app shutdown)"""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """Opaque token that changes whenever a decision is stored (keys response caches and ETags)"""
+        raise NotImplementedError
+
+    def append(self, decision: GovernanceDecision):
+        raise NotImplementedError
+
+    def append_many(self, decisions: Iterable[GovernanceDecision]):
+        for decision in decisions:
+            self.append(decision)
+
+    def live_metrics(self, today: Optional[date] = None) -> dict:
+        """MetricsAggregator.snapshot() counters plus the overall latency_summary()"""
+        raise NotImplementedError
+
+    def latency_breakdown(self, field: str) -> Dict[str, dict]:
+        """Per-value latency_summary() for one of LATENCY_DIMENSIONS"""
+        raise NotImplementedError
+
+    def recent(self, limit: int) -> List[GovernanceDecision]:
+        raise NotImplementedError
+
+    def between(self, start: Optional[datetime], end: Optional[datetime], limit: Optional[int] = None) -> List[GovernanceDecision]:
+        raise NotImplementedError
+
+    def breakdown(self, field: str) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    def metrics_range(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        filters: Dict[str, str],
+        group_by: List[str],
+    ) -> List[dict]:
+        raise NotImplementedError
+
+
+class InProcessBackend(DecisionStoreBackend):
+    """Columnar store, aggregates and rollups in process memory, optionally logged to disk"""
+
+    def __init__(self, log: Optional[DecisionLog] = None, snapshot_every: int = 100_000):
+        self.store = ColumnarDecisionStore()
+        self.metrics = MetricsAggregator()
+        self.rollups = DecisionRollups()
+        self.latency = LatencyTracker()
+        self.log = log
+        self.snapshot_every = snapshot_every
+        self._logged_since_snapshot = 0
+        # Other workers hold different decisions under the same counts, so versions are per instance
+        self._instance = uuid.uuid4().hex[:12]
+
+    @property
+    def persistent(self) -> bool:
+        return self.log is not None
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def version(self) -> str:
+        # The store is append-only, so its length doubles as a generation counter
+        return f"{self._instance}:{len(self.store)}"
+
+    def append(self, decision: GovernanceDecision):
+        if self.log is not None:
+            self.log.append(decision)
+            self._logged_since_snapshot += 1
+        self.store.append(decision)
+        self.metrics.add_decision(decision)
+        self.rollups.add_decision(decision)
+        self.latency.add_decision(decision)
+
+        if self._logged_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Persist the running aggregates together with the log position they cover"""
+        if self.log is None:
+            return
+        position = self.log.sync()
+        state = {"metrics": self.metrics.to_state(), "rollups": self.rollups.to_state(), "latency": self.latency.to_state()}
+        self.log.write_snapshot(state, position)
+        self._logged_since_snapshot = 0
+
+    def startup(self):
+        """Replay the decision log into the store, running metrics, rollups and latency sketches"""
+        if self.log is None:
+            return
+
+        snapshot = self.log.read_snapshot()
+        if snapshot and not (self.log.contains(snapshot[1]) and {"metrics", "rollups", "latency"} <= snapshot[0].keys()):
+            # The log lost records the snapshot counted, or the snapshot predates some aggregate; re-aggregate everything
+            snapshot = None
+        if snapshot:
+            state, covered = snapshot
+            self.metrics = MetricsAggregator.from_state(state["metrics"])
+            self.rollups = DecisionRollups.from_state(state["rollups"])
+            self.latency = LatencyTracker.from_state(state["latency"])
+        else:
+            covered = None
+
+        for batch, positions in self.log.replay():
+            self.store.extend_columns(batch)
+            # Only records past the snapshot still need aggregating
+            first = bisect_right(positions, covered) if covered is not None else 0
+            for i in range(first, len(positions)):
+                self.metrics.add(
+                    from_epoch_us(batch["timestamp_us"][i]),
+                    batch["compliance_score"][i],
+                    batch["human_override"][i],
+                    batch["regulatory_citation"][i],
+                )
+            self.rollups.add_columns(batch, first)
+            self.latency.add_columns(batch, first)
+
+    def shutdown(self):
+        if self.log is None:
+            return
+        self.snapshot()
+        self.log.close()
+
+    def live_metrics(self, today: Optional[date] = None) -> dict:
+        return {**self.metrics.snapshot(today), **self.latency.summary()}
+
+    def latency_breakdown(self, field: str) -> Dict[str, dict]:
+        return self.latency.breakdown(field)
+
+    def recent(self, limit: int) -> List[GovernanceDecision]:
+        return self.store.recent(limit)
+
+    def between(self, start, end, limit=None) -> List[GovernanceDecision]:
+        return self.store.between(start, end, limit=limit)
+
+    def breakdown(self, field: str) -> Dict[str, dict]:
+        return self.store.breakdown(field)
+
+    def metrics_range(self, granularity, start, end, filters, group_by) -> List[dict]:
+        return self.rollups.query(granularity, start, end, filters, group_by)
+
+
+_DECISION_COLUMNS = (
+    "id",
+    "ts_us",
+    "decision_type",
+    "ai_tool_used",
+    "regulatory_citation",
+    "human_override",
+    "compliance_score",
+    "anonymized_context",
+    "regulatory_framework",
+    "pharma_context",
+    "agency_relationship",
+    "public_facing_impact",
+    "decision_time",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    decision_type TEXT NOT NULL,
+    ai_tool_used TEXT NOT NULL,
+    regulatory_citation TEXT NOT NULL,
+    human_override INTEGER NOT NULL,
+    compliance_score REAL NOT NULL,
+    anonymized_context TEXT NOT NULL,
+    regulatory_framework TEXT NOT NULL,
+    pharma_context INTEGER NOT NULL,
+    agency_relationship TEXT NOT NULL,
+    public_facing_impact INTEGER NOT NULL,
+    decision_time REAL
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_ts ON decisions(ts_us, seq);
+
+CREATE TABLE IF NOT EXISTS metrics_totals (
+    singleton INTEGER PRIMARY KEY CHECK (singleton = 1),
+    total_decisions INTEGER NOT NULL,
+    compliant_decisions INTEGER NOT NULL,
+    human_overrides INTEGER NOT NULL,
+    last_ts_us INTEGER
+);
+INSERT OR IGNORE INTO metrics_totals VALUES (1, 0, 0, 0, NULL);
+
+CREATE TABLE IF NOT EXISTS metrics_daily (
+    day INTEGER PRIMARY KEY,
+    decisions INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS citations (
+    citation TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- Per-value totals for every categorical field, so breakdowns never scan decisions
+CREATE TABLE IF NOT EXISTS field_counts (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    decisions INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    overrides INTEGER NOT NULL,
+    PRIMARY KEY (field, value)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    regulatory_framework TEXT NOT NULL,
+    ai_tool_used TEXT NOT NULL,
+    decision_type TEXT NOT NULL,
+    agency_relationship TEXT NOT NULL,
+    decisions INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    overrides INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    PRIMARY KEY (granularity, bucket, regulatory_framework, ai_tool_used, decision_type, agency_relationship)
+) WITHOUT ROWID;
+
+-- DDSketch bucket counts; dimension '' holds the overall sketch
+CREATE TABLE IF NOT EXISTS latency_buckets (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS latency_totals (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    zero_count INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    min_time REAL NOT NULL,
+    max_time REAL NOT NULL,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID;
+"""
+
+_INSERT_DECISION = f"INSERT INTO decisions ({', '.join(_DECISION_COLUMNS)}) VALUES ({', '.join('?' * len(_DECISION_COLUMNS))})"
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT (granularity, bucket, regulatory_framework, ai_tool_used, decision_type, agency_relationship) DO UPDATE SET
+    decisions = decisions + 1,
+    compliant = compliant + excluded.compliant,
+    overrides = overrides + excluded.overrides,
+    score_sum = score_sum + excluded.score_sum
+"""
+
+_UPSERT_FIELD_COUNTS = """
+INSERT INTO field_counts VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (field, value) DO UPDATE SET
+    decisions = decisions + excluded.decisions,
+    compliant = compliant + excluded.compliant,
+    overrides = overrides + excluded.overrides
+"""
+
+_UPSERT_LATENCY_BUCKET = """
+INSERT INTO latency_buckets VALUES (?, ?, ?, ?)
+ON CONFLICT (dimension, value, bucket) DO UPDATE SET count = count + excluded.count
+"""
+
+_UPSERT_LATENCY_TOTALS = """
+INSERT INTO latency_totals VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dimension, value) DO UPDATE SET
+    count = count + excluded.count,
+    zero_count = zero_count + excluded.zero_count,
+    total_time = total_time + excluded.total_time,
+    min_time = MIN(min_time, excluded.min_time),
+    max_time = MAX(max_time, excluded.max_time)
+"""
+
+
+class SQLiteBackend(DecisionStoreBackend):
+    """Decisions and their aggregates in one WAL-mode SQLite file shared across worker processes"""
+
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.startup()
+        return self._conn
+
+    def startup(self):
+        if self._conn is not None:
+            return
+        # Connect per process (after any fork), never share a connection across workers
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Every worker runs this at boot; IF NOT EXISTS keeps it idempotent
+        conn.executescript(f"BEGIN IMMEDIATE;{_SCHEMA}COMMIT;")
+        self._conn = conn
+
+    def shutdown(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT total_decisions FROM metrics_totals").fetchone()[0]
+
+    def version(self) -> str:
+        # Every worker appends through metrics_totals, so the shared count is the generation
+        return str(len(self))
+
+    def append(self, decision: GovernanceDecision):
+        self.append_many([decision])
+
+    def append_many(self, decisions: Iterable[GovernanceDecision]):
+        """Insert decisions and update every aggregate in a single write transaction"""
+        decisions = list(decisions)
+        if not decisions:
+            return
+        rows = []
+        rollups = []
+        days: Dict[int, int] = {}
+        # (field, value) -> [decisions, compliant, overrides] for this batch
+        field_counts: Dict[tuple, List[int]] = {}
+        compliant = overrides = 0
+        last_ts = None
+        # Sketch just this batch; its bucket counts are added onto the stored ones
+        latency = LatencyTracker()
+        for d in decisions:
+            ts_us = to_epoch_us(d.timestamp)
+            is_compliant = int(d.compliance_score >= COMPLIANCE_THRESHOLD)
+            rows.append((
+                d.id, ts_us, d.decision_type, d.ai_tool_used, d.regulatory_citation,
+                int(d.human_override), d.compliance_score, d.anonymized_context,
+                d.regulatory_framework, int(d.pharma_context), d.agency_relationship,
+                int(d.public_facing_impact), d.decision_time,
+            ))
+            latency.add_decision(d)
+            dims = tuple(getattr(d, name) for name in ROLLUP_DIMENSIONS)
+            for granularity, width in GRANULARITIES.items():
+                rollups.append((granularity, ts_us - ts_us % width, *dims, is_compliant, int(d.human_override), d.compliance_score))
+            for name in CATEGORICAL_FIELDS:
+                counts = field_counts.setdefault((name, getattr(d, name)), [0, 0, 0])
+                counts[0] += 1
+                counts[1] += is_compliant
+                counts[2] += int(d.human_override)
+            day = ts_us // _DAY_US
+            days[day] = days.get(day, 0) + 1
+            compliant += is_compliant
+            overrides += int(d.human_override)
+            last_ts = ts_us if last_ts is None else max(last_ts, ts_us)
+
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_INSERT_DECISION, rows)
+                conn.execute(
+                    """UPDATE metrics_totals SET
+                        total_decisions = total_decisions + ?,
+                        compliant_decisions = compliant_decisions + ?,
+                        human_overrides = human_overrides + ?,
+                        last_ts_us = MAX(COALESCE(last_ts_us, ?), ?)""",
+                    (len(rows), compliant, overrides, last_ts, last_ts),
+                )
+                conn.executemany(
+                    "INSERT INTO metrics_daily VALUES (?, ?) ON CONFLICT (day) DO UPDATE SET decisions = decisions + excluded.decisions",
+                    list(days.items()),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO citations VALUES (?)",
+                    [(d.regulatory_citation,) for d in decisions],
+                )
+                conn.executemany(_UPSERT_FIELD_COUNTS, [(*key, *counts) for key, counts in field_counts.items()])
+                conn.executemany(_UPSERT_ROLLUP, rollups)
+                for dimension, value, sketch in _latency_sketches(latency):
+                    conn.executemany(_UPSERT_LATENCY_BUCKET, [(dimension, value, *bucket) for bucket in sketch.buckets.items()])
+                    conn.execute(
+                        _UPSERT_LATENCY_TOTALS,
+                        (dimension, value, sketch.count, sketch.zero_count, sketch.sum, sketch.min, sketch.max),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def live_metrics(self, today: Optional[date] = None) -> dict:
+        if today is None:
+            today = datetime.now(timezone.utc).date()
+        today_key = to_epoch_us(datetime(today.year, today.month, today.day)) // _DAY_US
+        with self._lock:
+            conn = self.conn
+            # One read transaction, so every counter comes from the same snapshot
+            conn.execute("BEGIN")
+            try:
+                total, compliant, overrides, last_ts = conn.execute(
+                    "SELECT total_decisions, compliant_decisions, human_overrides, last_ts_us FROM metrics_totals"
+                ).fetchone()
+                row = conn.execute("SELECT decisions FROM metrics_daily WHERE day = ?", (today_key,)).fetchone()
+                citations = conn.execute("SELECT COUNT(*) FROM citations").fetchone()[0]
+                overall = self._load_sketches("").get("", DDSketch())
+            finally:
+                conn.execute("COMMIT")
+        return {
+            "decisions_today": row[0] if row else 0,
+            "compliance_rate": round(compliant / total * 100, 1) if total else 100,
+            "total_decisions": total,
+            "last_decision_time": from_epoch_us(last_ts) if last_ts is not None else None,
+            "policy_conflicts_resolved": overrides,
+            "regulatory_citations": citations,
+            **latency_summary(overall),
+        }
+
+    def _load_sketches(self, dimension: str) -> Dict[str, DDSketch]:
+        """Stored sketches for one dimension ('' = overall), keyed by value; caller holds the lock"""
+        sketches: Dict[str, DDSketch] = {}
+        for value, count, zero_count, total, low, high in self.conn.execute(
+            "SELECT value, count, zero_count, total_time, min_time, max_time FROM latency_totals WHERE dimension = ?",
+            (dimension,),
+        ):
+            sketch = sketches[value] = DDSketch()
+            sketch.count, sketch.zero_count, sketch.sum, sketch.min, sketch.max = count, zero_count, total, low, high
+        for value, bucket, count in self.conn.execute(
+            "SELECT value, bucket, count FROM latency_buckets WHERE dimension = ?", (dimension,)
+        ):
+            if value in sketches:
+                sketches[value].buckets[bucket] = count
+        return sketches
+
+    def latency_breakdown(self, field: str) -> Dict[str, dict]:
+        if field not in LATENCY_DIMENSIONS:
+            raise ValueError(f"Unknown latency dimension: {field}")
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN")
+            try:
+                sketches = self._load_sketches(field)
+            finally:
+                conn.execute("COMMIT")
+        return {value: latency_summary(sketch) for value, sketch in sketches.items()}
+
+    def _select(self, where: str = "", params: tuple = (), limit: Optional[int] = None) -> List[GovernanceDecision]:
+        sql = f"SELECT {', '.join(_DECISION_COLUMNS)} FROM decisions {where} ORDER BY ts_us DESC, seq DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (*params, max(limit, 0))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        decisions = []
+        for row in rows:
+            fields = dict(zip(_DECISION_COLUMNS, row))
+            fields["timestamp"] = from_epoch_us(fields.pop("ts_us"))
+            decisions.append(GovernanceDecision(**fields))
+        return decisions
+
+    def recent(self, limit: int) -> List[GovernanceDecision]:
+        return self._select(limit=limit)
+
+    def between(self, start, end, limit=None) -> List[GovernanceDecision]:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts_us >= ?")
+            params.append(to_epoch_us(start))
+        if end is not None:
+            clauses.append("ts_us <= ?")
+            params.append(to_epoch_us(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, tuple(params), limit)
+
+    def breakdown(self, field: str) -> Dict[str, dict]:
+        if field not in CATEGORICAL_FIELDS:
+            raise ValueError(f"Unknown categorical field: {field}")
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT value, decisions, compliant, overrides FROM field_counts WHERE field = ?",
+                (field,),
+            ).fetchall()
+        return {
+            value: {
+                "decisions": total,
+                "compliance_rate": round(compliant / total * 100, 1),
+                "policy_conflicts_resolved": overrides,
+            }
+            for value, total, compliant, overrides in rows
+        }
+
+    def metrics_range(self, granularity, start, end, filters, group_by) -> List[dict]:
+        width = GRANULARITIES[granularity]
+        start_us = to_epoch_us(start)
+        clauses = ["granularity = ?", "bucket >= ?", "bucket <= ?"]
+        params = [granularity, start_us - start_us % width, to_epoch_us(end)]
+        for name, value in filters.items():
+            if name not in ROLLUP_DIMENSIONS:
+                raise ValueError(f"Unknown rollup dimension: {name}")
+            clauses.append(f"{name} = ?")
+            params.append(value)
+        for name in group_by:
+            if name not in ROLLUP_DIMENSIONS:
+                raise ValueError(f"Unknown rollup dimension: {name}")
+        keys = ", ".join(["bucket", *group_by])
+        with self._lock:
+            rows = self.conn.execute(
+                f"""SELECT {keys}, SUM(decisions), SUM(compliant), SUM(overrides), SUM(score_sum)
+                    FROM rollups WHERE {' AND '.join(clauses)}
+                    GROUP BY {keys} ORDER BY {keys}""",
+                params,
+            ).fetchall()
+        groups = len(group_by)
+        return [
+            rollup_row(row[0], zip(group_by, row[1:1 + groups]), *row[1 + groups:])
+            for row in rows
+        ]
+
+
+def _latency_sketches(tracker: LatencyTracker):
+    """(dimension, value, sketch) rows of a tracker as stored in latency_totals"""
+    if tracker.overall.count:
+        yield "", "", tracker.overall
+    for dimension, sketches in tracker.by_dimension.items():
+        for value, sketch in sketches.items():
+            yield dimension, value, sketch
+
+
+def decision_backend_from_env() -> DecisionStoreBackend:
+    """Backend selected by AICOMPLYR_DECISION_STORE (see module docstring)"""
+    kind = os.getenv("AICOMPLYR_DECISION_STORE", "memory").strip().lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("AICOMPLYR_DECISION_DB", "decisions.db"))
+    if kind != "memory":
+        raise ValueError("AICOMPLYR_DECISION_STORE must be 'memory' or 'sqlite'")
+    return InProcessBackend(
+        log=decision_log_from_env(),
+        snapshot_every=int(os.getenv("AICOMPLYR_DECISION_SNAPSHOT_EVERY", "100000")),
+    )
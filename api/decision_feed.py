@@ -0,0 +1,85 @@
+"""
+In-process fan-out of live governance events to Server-Sent Events clients.
+
+Each new decision is serialised once and the same bytes are pushed onto
+every subscriber's bounded queue. A client that falls a full buffer behind
+is dropped rather than allowed to hold memory or slow the publisher; idle
+subscribers cost one parked coroutine each.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Optional, Set
+
+# Events a single client may have queued before it is considered too slow
+DEFAULT_BUFFER_SIZE = 256
+
+# Seconds between SSE comment lines that keep idle proxies from closing the stream
+KEEPALIVE_INTERVAL = 15.0
+
+_KEEPALIVE = b": keep-alive\n\n"
+
+
+def format_sse(event: str, data) -> bytes:
+    """Encode one SSE frame"""
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class DecisionBroadcaster:
+    """Single publisher, many bounded subscriber queues"""
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.buffer_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _drop(self, queue: asyncio.Queue):
+        """Disconnect a subscriber whose buffer is full"""
+        self._subscribers.discard(queue)
+        self.dropped += 1
+        # Make room for the sentinel that ends its stream
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def publish(self, event: str, data):
+        """Queue one event for every subscriber (must run on the event loop)"""
+        if not self._subscribers:
+            return
+        frame = format_sse(event, data)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    async def stream(self, initial: Optional[bytes] = None) -> AsyncIterator[bytes]:
+        """Yield SSE frames for one client until it disconnects or is dropped"""
+        queue = self.subscribe()
+        try:
+            if initial is not None:
+                yield initial
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield _KEEPALIVE
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(queue)
@@ -0,0 +1,107 @@
+"""
+Timestamp-ordered index over governance decisions.
+
+Keeps decisions sorted by time as they arrive so the live feed can read the
+newest N, or everything inside a time window, in O(log n + k) instead of
+sorting the whole history on every request.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from heapq import merge
+from operator import itemgetter
+from typing import Generic, List, Optional, Sequence, TypeVar
+
+from api.metrics_aggregator import to_utc
+
+T = TypeVar("T")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_epoch_us(ts: datetime) -> int:
+    """Microseconds since the Unix epoch (naive values are treated as UTC)"""
+    return (to_utc(ts) - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(us: int) -> datetime:
+    """Inverse of to_epoch_us, as an aware UTC datetime"""
+    return _EPOCH + timedelta(microseconds=us)
+
+
+class DecisionTimeIndex(Generic[T]):
+    """Sorted parallel arrays of (epoch microseconds, item)"""
+
+    def __init__(self):
+        self._keys: List[int] = []
+        self._items: List[T] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def insert(self, timestamp: datetime, item: T):
+        """Add an item, keeping time order even for late arrivals"""
+        self.insert_key(to_epoch_us(timestamp), item)
+
+    def insert_key(self, key: int, item: T):
+        """Add an item under a precomputed epoch-microsecond key"""
+        if not self._keys or key >= self._keys[-1]:
+            # Common case: decisions arrive roughly in time order
+            self._keys.append(key)
+            self._items.append(item)
+            return
+        # Equal timestamps keep arrival order
+        pos = bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._items.insert(pos, item)
+
+    def extend(self, keys: Sequence[int], items: Sequence[T]):
+        """Bulk insert, merging any overlap with the existing tail in one pass"""
+        if not keys:
+            return
+        if any(a > b for a, b in zip(keys, keys[1:])):
+            # Stable sort keeps arrival order for equal timestamps
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys = [keys[i] for i in order]
+            items = [items[i] for i in order]
+
+        cut = bisect_right(self._keys, keys[0])
+        if cut == len(self._keys):
+            self._keys.extend(keys)
+            self._items.extend(items)
+            return
+
+        merged = list(merge(
+            zip(self._keys[cut:], self._items[cut:]),
+            zip(keys, items),
+            key=itemgetter(0),
+        ))
+        del self._keys[cut:]
+        del self._items[cut:]
+        self._keys.extend(key for key, _ in merged)
+        self._items.extend(item for _, item in merged)
+
+    def recent(self, limit: int) -> List[T]:
+        """Newest `limit` items, newest first"""
+        if limit <= 0:
+            return []
+        return self._items[:-limit - 1:-1]
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[T]:
+        """Items with start <= timestamp <= end, newest first"""
+        lo = bisect_left(self._keys, to_epoch_us(start)) if start is not None else 0
+        hi = bisect_right(self._keys, to_epoch_us(end)) if end is not None else len(self._keys)
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        if lo >= hi:
+            return []
+        return self._items[hi - 1:lo - 1 if lo else None:-1]
+
+    def since(self, start: datetime, limit: Optional[int] = None) -> List[T]:
+        """Items at or after `start`, newest first"""
+        return self.between(start=start, limit=limit)
@@ -0,0 +1,332 @@
+"""
+Durable, append-only log of governance decisions.
+
+Decisions are written as length-prefixed, CRC-checked binary records into
+numbered segment files. On startup the segments are memory-mapped and
+decoded straight into column batches for the columnar store, so a restart
+replays millions of decisions without any JSON parsing. Periodic snapshots
+of the live-metrics aggregates record the log position they cover, letting
+replay skip re-aggregating everything before it.
+
+fsync policy trades durability against ingest throughput:
+  always    fsync after every record
+  batch     fsync every `fsync_batch` records
+  interval  fsync at most every `fsync_interval` seconds (background flusher)
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from api.decision_index import to_epoch_us
+
+FSYNC_POLICIES = ("always", "batch", "interval")
+
+SEGMENT_MAGIC = b"AGDL\x01"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_FILE = "aggregates.snapshot.json"
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# (payload length, crc32 of payload)
+_RECORD_HEADER = struct.Struct("<II")
+
+# UTF-8 strings stored after the fixed fields, in this order
+STRING_FIELDS = (
+    "id",
+    "decision_type",
+    "ai_tool_used",
+    "regulatory_citation",
+    "regulatory_framework",
+    "agency_relationship",
+    "anonymized_context",
+)
+
+# Bit positions within the flag byte
+FLAG_BITS = ("human_override", "pharma_context", "public_facing_impact")
+
+# Set when a string contains NUL, so the record uses length-prefixed strings
+_LENGTH_PREFIXED = 0x80
+
+# (timestamp epoch microseconds, compliance score, decision time or NaN, flag bits)
+_FIXED = struct.Struct("<qddB")
+_STR_LEN = struct.Struct("<I")
+
+# Column order of a replay batch
+BATCH_FIELDS = ("timestamp_us", "compliance_score", "decision_time", *FLAG_BITS, *STRING_FIELDS)
+
+# Log position as (segment number, byte offset just past the last record)
+LogPosition = Tuple[int, int]
+
+
+class DecisionLogError(Exception):
+    """The decision log directory is unusable (bad magic, unreadable segment, ...)"""
+
+
+def encode_decision(decision) -> bytes:
+    """Serialise a GovernanceDecision into one framed log record"""
+    flags = 0
+    for bit, name in enumerate(FLAG_BITS):
+        if getattr(decision, name):
+            flags |= 1 << bit
+    strings = [getattr(decision, name).encode("utf-8") for name in STRING_FIELDS]
+
+    if any(b"\x00" in raw for raw in strings):
+        flags |= _LENGTH_PREFIXED
+        body = b"".join(_STR_LEN.pack(len(raw)) + raw for raw in strings)
+    else:
+        # NUL-separated strings decode with a single str() + split() on replay
+        body = b"\x00".join(strings)
+
+    decision_time = decision.decision_time if decision.decision_time is not None else math.nan
+    payload = _FIXED.pack(to_epoch_us(decision.timestamp), decision.compliance_score, decision_time, flags) + body
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _length_prefixed_strings(buf, pos: int, end: int) -> List[str]:
+    strings = []
+    for _ in STRING_FIELDS:
+        (length,) = _STR_LEN.unpack_from(buf, pos)
+        pos += _STR_LEN.size
+        strings.append(str(buf[pos:pos + length], "utf-8"))
+        pos += length
+    if pos != end:
+        raise ValueError("record length mismatch")
+    return strings
+
+
+def _decode(buf, start: int, end: int) -> tuple:
+    """Field values of the record payload buf[start:end], in BATCH_FIELDS order (NaN = no decision time)"""
+    ts_us, score, decision_time, flags = _FIXED.unpack_from(buf, start)
+    body = start + _FIXED.size
+    if flags & _LENGTH_PREFIXED:
+        strings = _length_prefixed_strings(buf, body, end)
+    else:
+        strings = str(buf[body:end], "utf-8").split("\x00")
+        if len(strings) != len(STRING_FIELDS):
+            raise ValueError("record field count mismatch")
+    return (ts_us, score, decision_time, bool(flags & 1), bool(flags & 2), bool(flags & 4), *strings)
+
+
+def _to_columns(rows: List[tuple]) -> Dict[str, list]:
+    """Transpose decoded rows into per-field lists keyed by BATCH_FIELDS"""
+    return {name: list(column) for name, column in zip(BATCH_FIELDS, zip(*rows))}
+
+
+class DecisionLog:
+    """Segmented append-only decision log with configurable fsync"""
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_policy: str = "batch",
+        fsync_batch: int = 1000,
+        fsync_interval: float = 1.0,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of: {', '.join(FSYNC_POLICIES)}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_batch = max(fsync_batch, 1)
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = 0
+        self._offset = 0
+        self._unsynced = 0
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    # -- segment files -----------------------------------------------------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def segments(self) -> List[int]:
+        """Existing segment numbers, oldest first"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _open_segment(self, number: int, truncate_to: Optional[int] = None):
+        """Open a segment for appending, creating it with a header if new"""
+        path = self._segment_path(number)
+        if truncate_to is not None and os.path.exists(path) and os.path.getsize(path) > truncate_to:
+            # Drop a torn tail left by a crash mid-write
+            os.truncate(path, truncate_to)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(SEGMENT_MAGIC)
+        self._segment = number
+        self._offset = self._file.tell()
+
+    # -- replay ------------------------------------------------------------
+
+    def replay(self, batch_size: int = 100_000) -> Iterator[Tuple[Dict[str, list], List[LogPosition]]]:
+        """
+        Yield (column batch, per-record end positions) for every durable record,
+        then leave the log positioned for appending after the last good record.
+        """
+        numbers = self.segments()
+        tail: LogPosition = (numbers[-1] if numbers else 1, 0)
+        rows: List[tuple] = []
+        positions: List[LogPosition] = []
+
+        for number in numbers:
+            path = self._segment_path(number)
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < len(SEGMENT_MAGIC):
+                    # Crashed before the header was complete
+                    tail = (number, 0)
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    if buf[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                        raise DecisionLogError(f"{path}: not a decision log segment")
+                    offset = len(SEGMENT_MAGIC)
+                    tail = (number, offset)
+                    while offset + _RECORD_HEADER.size <= size:
+                        length, crc = _RECORD_HEADER.unpack_from(buf, offset)
+                        start = offset + _RECORD_HEADER.size
+                        end = start + length
+                        if end > size or zlib.crc32(buf[start:end]) != crc:
+                            break
+                        try:
+                            values = _decode(buf, start, end)
+                        except (ValueError, struct.error, UnicodeDecodeError):
+                            break
+                        rows.append(values)
+                        offset = end
+                        tail = (number, offset)
+                        positions.append(tail)
+                        if len(rows) >= batch_size:
+                            yield _to_columns(rows), positions
+                            rows = []
+                            positions = []
+
+        if rows:
+            yield _to_columns(rows), positions
+
+        with self._lock:
+            self._open_segment(tail[0], truncate_to=tail[1])
+        self._start_flusher()
+
+    # -- append ------------------------------------------------------------
+
+    def append(self, decision) -> LogPosition:
+        """Write one decision, honouring the fsync policy; returns its end position"""
+        record = encode_decision(decision)
+        with self._lock:
+            if self._file is None:
+                numbers = self.segments()
+                self._open_segment(numbers[-1] if numbers else 1)
+                self._start_flusher()
+            if self._offset + len(record) > self.segment_bytes and self._offset > len(SEGMENT_MAGIC):
+                self._sync_locked()
+                self._file.close()
+                self._open_segment(self._segment + 1)
+            self._file.write(record)
+            self._offset += len(record)
+            self._unsynced += 1
+            if self.fsync_policy == "always" or (
+                self.fsync_policy == "batch" and self._unsynced >= self.fsync_batch
+            ):
+                self._sync_locked()
+            return self._segment, self._offset
+
+    def _sync_locked(self):
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self) -> LogPosition:
+        """Force everything written so far to disk; returns the durable position"""
+        with self._lock:
+            self._sync_locked()
+            return self._segment, self._offset
+
+    def _start_flusher(self):
+        if self.fsync_policy != "interval" or self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="decision-log-fsync", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                self._sync_locked()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # -- aggregate snapshots -----------------------------------------------
+
+    def write_snapshot(self, state: dict, position: LogPosition):
+        """Atomically persist aggregate state covering the log up to `position`"""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"position": list(position), "state": state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def contains(self, position: LogPosition) -> bool:
+        """Whether the log on disk still reaches `position` (it may have lost a torn tail)"""
+        segment, offset = position
+        path = self._segment_path(segment)
+        return os.path.exists(path) and os.path.getsize(path) >= offset
+
+    def read_snapshot(self) -> Optional[Tuple[dict, LogPosition]]:
+        """(aggregate state, covered position) from the last snapshot, if any"""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return None
+        return data["state"], tuple(data["position"])
+
+
+def decision_log_from_env() -> Optional[DecisionLog]:
+    """
+    Build the decision log from environment configuration, or None to keep
+    decisions in memory only:
+      AICOMPLYR_DECISION_LOG_DIR             segment directory (unset = no persistence)
+      AICOMPLYR_DECISION_LOG_FSYNC           always | batch | interval (default batch)
+      AICOMPLYR_DECISION_LOG_FSYNC_BATCH     records per fsync in batch mode (default 1000)
+      AICOMPLYR_DECISION_LOG_FSYNC_INTERVAL  seconds between fsyncs in interval mode (default 1.0)
+      AICOMPLYR_DECISION_LOG_SEGMENT_MB      segment roll-over size (default 64)
+    """
+    directory = os.getenv("AICOMPLYR_DECISION_LOG_DIR", "").strip()
+    if not directory:
+        return None
+    return DecisionLog(
+        directory,
+        fsync_policy=os.getenv("AICOMPLYR_DECISION_LOG_FSYNC", "batch").strip().lower(),
+        fsync_batch=int(os.getenv("AICOMPLYR_DECISION_LOG_FSYNC_BATCH", "1000")),
+        fsync_interval=float(os.getenv("AICOMPLYR_DECISION_LOG_FSYNC_INTERVAL", "1.0")),
+        segment_bytes=int(float(os.getenv("AICOMPLYR_DECISION_LOG_SEGMENT_MB", "64")) * 1024 * 1024),
+    )
@@ -0,0 +1,209 @@
+"""
+Columnar, NumPy-backed storage for governance decisions.
+
+Each GovernanceDecision field lives in its own typed array instead of a
+pydantic object per row: timestamps as int64 epoch microseconds, scores as
+float64, flags as uint8 and low-cardinality strings as dictionary-encoded
+int32 codes. Aggregations run vectorised over the columns; full
+GovernanceDecision objects are only materialised for rows the API returns.
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from api.decision_index import DecisionTimeIndex, from_epoch_us, to_epoch_us
+from api.metrics_aggregator import COMPLIANCE_THRESHOLD
+from models.governance_decision import GovernanceDecision
+
+# Low-cardinality string fields stored as dictionary codes
+CATEGORICAL_FIELDS = (
+    "decision_type",
+    "ai_tool_used",
+    "regulatory_citation",
+    "regulatory_framework",
+    "agency_relationship",
+)
+
+# Boolean fields stored as one uint8 per row
+FLAG_FIELDS = ("human_override", "pharma_context", "public_facing_impact")
+
+_INITIAL_CAPACITY = 1024
+
+
+class StringDictionary:
+    """Bidirectional value <-> int code mapping for one categorical column"""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class RowTimeIndex(DecisionTimeIndex[int]):
+    """Time index over store row numbers, packed into a machine-int array"""
+
+    def __init__(self):
+        super().__init__()
+        self._keys = array("q")
+        self._items = array("q")
+
+
+class ColumnarDecisionStore:
+    """Append-only column store of governance decisions"""
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self._size = 0
+        self._capacity = max(capacity, 1)
+        self.timestamps = np.empty(self._capacity, dtype=np.int64)
+        self.compliance_scores = np.empty(self._capacity, dtype=np.float64)
+        self.decision_times = np.empty(self._capacity, dtype=np.float64)
+        self.flags = {name: np.empty(self._capacity, dtype=np.uint8) for name in FLAG_FIELDS}
+        self.codes = {name: np.empty(self._capacity, dtype=np.int32) for name in CATEGORICAL_FIELDS}
+        self.dictionaries = {name: StringDictionary() for name in CATEGORICAL_FIELDS}
+        # Unique per row, so dictionary encoding would not save anything
+        self.ids: List[str] = []
+        self.contexts: List[str] = []
+        self.index = RowTimeIndex()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, extra: int):
+        """Grow every column (by doubling) until `extra` more rows fit"""
+        capacity = self._capacity
+        while self._size + extra > capacity:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        self._capacity = capacity
+        self.timestamps = np.resize(self.timestamps, self._capacity)
+        self.compliance_scores = np.resize(self.compliance_scores, self._capacity)
+        self.decision_times = np.resize(self.decision_times, self._capacity)
+        self.flags = {name: np.resize(col, self._capacity) for name, col in self.flags.items()}
+        self.codes = {name: np.resize(col, self._capacity) for name, col in self.codes.items()}
+
+    def append(self, decision: GovernanceDecision) -> int:
+        """Store a decision and return its row number"""
+        self._reserve(1)
+
+        row = self._size
+        self.timestamps[row] = to_epoch_us(decision.timestamp)
+        self.compliance_scores[row] = decision.compliance_score
+        self.decision_times[row] = decision.decision_time if decision.decision_time is not None else np.nan
+        for name in FLAG_FIELDS:
+            self.flags[name][row] = getattr(decision, name)
+        for name in CATEGORICAL_FIELDS:
+            self.codes[name][row] = self.dictionaries[name].encode(getattr(decision, name))
+        self.ids.append(decision.id)
+        self.contexts.append(decision.anonymized_context)
+        self._size += 1
+
+        self.index.insert(decision.timestamp, row)
+        return row
+
+    def extend_columns(self, columns: Dict[str, list]) -> range:
+        """
+        Bulk-append rows given as per-field lists (see decision_log.BATCH_FIELDS),
+        with timestamps already in epoch microseconds. Returns the new row numbers.
+        """
+        count = len(columns["timestamp_us"])
+        self._reserve(count)
+        start, stop = self._size, self._size + count
+
+        self.timestamps[start:stop] = columns["timestamp_us"]
+        self.compliance_scores[start:stop] = columns["compliance_score"]
+        self.decision_times[start:stop] = columns["decision_time"]
+        for name in FLAG_FIELDS:
+            self.flags[name][start:stop] = columns[name]
+        for name in CATEGORICAL_FIELDS:
+            encode = self.dictionaries[name].encode
+            self.codes[name][start:stop] = [encode(value) for value in columns[name]]
+        self.ids.extend(columns["id"])
+        self.contexts.extend(columns["anonymized_context"])
+        self._size = stop
+
+        rows = range(start, stop)
+        self.index.extend(columns["timestamp_us"], rows)
+        return rows
+
+    def get(self, row: int) -> GovernanceDecision:
+        """Materialise a single row back into a GovernanceDecision"""
+        fields = {
+            name: self.dictionaries[name].values[self.codes[name][row]]
+            for name in CATEGORICAL_FIELDS
+        }
+        fields.update({name: bool(self.flags[name][row]) for name in FLAG_FIELDS})
+        decision_time = float(self.decision_times[row])
+        return GovernanceDecision(
+            id=self.ids[row],
+            timestamp=from_epoch_us(int(self.timestamps[row])),
+            compliance_score=float(self.compliance_scores[row]),
+            anonymized_context=self.contexts[row],
+            decision_time=None if np.isnan(decision_time) else decision_time,
+            **fields,
+        )
+
+    def materialise(self, rows: Iterable[int]) -> List[GovernanceDecision]:
+        return [self.get(row) for row in rows]
+
+    def recent(self, limit: int) -> List[GovernanceDecision]:
+        """Newest `limit` decisions, newest first"""
+        return self.materialise(self.index.recent(limit))
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[GovernanceDecision]:
+        """Decisions with start <= timestamp <= end, newest first"""
+        return self.materialise(self.index.between(start, end, limit=limit))
+
+    def compliance_rate(self, threshold: float = COMPLIANCE_THRESHOLD) -> float:
+        """Percentage of decisions scoring at or above `threshold`"""
+        if not self._size:
+            return 100
+        scores = self.compliance_scores[:self._size]
+        return float(np.count_nonzero(scores >= threshold)) / self._size * 100
+
+    def breakdown(self, field: str = "regulatory_framework", threshold: float = COMPLIANCE_THRESHOLD) -> Dict[str, dict]:
+        """Per-value decision count, compliance rate and override count for a categorical field"""
+        if field not in CATEGORICAL_FIELDS:
+            raise ValueError(f"Unknown categorical field: {field}")
+
+        values = self.dictionaries[field].values
+        n = self._size
+        codes = self.codes[field][:n]
+        width = len(values)
+        totals = np.bincount(codes, minlength=width)
+        compliant = np.bincount(codes, weights=self.compliance_scores[:n] >= threshold, minlength=width)
+        overrides = np.bincount(codes, weights=self.flags["human_override"][:n], minlength=width)
+
+        return {
+            value: {
+                "decisions": int(totals[code]),
+                "compliance_rate": round(float(compliant[code]) / int(totals[code]) * 100, 1),
+                "policy_conflicts_resolved": int(overrides[code]),
+            }
+            for code, value in enumerate(values)
+            if totals[code]
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated for the fixed-width columns (capacity, not size)"""
+        columns = [self.timestamps, self.compliance_scores, self.decision_times, *self.flags.values(), *self.codes.values()]
+        return sum(col.nbytes for col in columns)
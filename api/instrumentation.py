@@ -0,0 +1,414 @@
+"""
+Request instrumentation for the FastAPI apps.
+
+InstrumentationMiddleware is a plain ASGI middleware (no BaseHTTPMiddleware
+task hop, streaming responses pass through untouched) that records, per
+method and route template:
+
+- latency from request start to the last response byte, as a fixed-bucket
+  histogram (aggregatable across instances) and a DDSketch for p50/p95/p99
+- request and response body bytes
+- requests by status code
+
+plus requests in flight per method (a request has no route until it has been
+routed, so the gauge is not split by route).
+
+Unmatched paths are folded into one "<unmatched>" route so scanners cannot
+blow up the series count. Everything is exposed at GET /metrics in the
+Prometheus text format, or as JSON (quantiles and recent slow requests) with
+?format=json. Metrics are per process; run one scrape target per worker.
+Pass `authorize` to keep the endpoint behind the app's own credentials: the
+JSON view carries raw request paths and stack frames.
+
+SlowRequestProfiler is the optional sampling hook: while a request has been
+in flight longer than the threshold, a background thread samples the event
+loop thread's stack (what is blocking the loop) and the request task's await
+chain (what it is waiting on). Requests that finish over the threshold keep
+their collapsed stacks, most frequent first, in a ring buffer and are passed
+to an optional callback.
+
+Configuration (instrumentation_from_env):
+  AICOMPLYR_METRICS                  "0" disables the middleware and endpoint
+  AICOMPLYR_SLOW_REQUEST_SECONDS     enables the profiler for requests slower than this
+  AICOMPLYR_PROFILE_INTERVAL_MS      sampling interval (default 5)
+  AICOMPLYR_SLOW_REQUEST_KEEP        slow request profiles kept (default 50)
+"""
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.latency_sketch import REPORTED_QUANTILES, DDSketch
+
+# Seconds; dense where API latencies live, sparse out to slow exports and uploads
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Frames kept per sampled stack (innermost last)
+MAX_STACK_DEPTH = 40
+
+
+class RouteStats:
+    """Counters for one (method, route)"""
+
+    __slots__ = ("buckets", "sketch", "count", "seconds", "request_bytes", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sketch = DDSketch()
+        self.count = 0
+        self.seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses: Dict[int, int] = {}
+
+
+class RequestMetrics:
+    """Per-route request statistics, updated by the middleware and rendered by /metrics"""
+
+    def __init__(self, prefix: str = "aicomplyr_http"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _stats(self, method: str, route: str) -> RouteStats:
+        stats = self._routes.get((method, route))
+        if stats is None:
+            stats = self._routes[(method, route)] = RouteStats()
+        return stats
+
+    def started(self, method: str):
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float,
+                 request_bytes: int, response_bytes: int):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            self._in_flight[method] -= 1
+            stats = self._stats(method, route)
+            stats.buckets[index] += 1
+            stats.sketch.add(max(seconds, 0.0))
+            stats.count += 1
+            stats.seconds += seconds
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def in_flight(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._in_flight)
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, str], RouteStats]]:
+        with self._lock:
+            snapshot = []
+            for key, stats in sorted(self._routes.items()):
+                copy = RouteStats()
+                copy.buckets = list(stats.buckets)
+                copy.sketch = stats.sketch
+                copy.count, copy.seconds = stats.count, stats.seconds
+                copy.request_bytes, copy.response_bytes = stats.request_bytes, stats.response_bytes
+                copy.statuses = dict(stats.statuses)
+                snapshot.append((key, copy))
+            return snapshot
+
+    def render_prometheus(self) -> str:
+        p = self.prefix
+        snapshot = self._snapshot()
+        lines = [
+            f"# HELP {p}_request_duration_seconds Time from request start to the last response byte",
+            f"# TYPE {p}_request_duration_seconds histogram",
+        ]
+        for (method, route), stats in snapshot:
+            if not stats.count:
+                continue
+            labels = f'method="{_escape(method)}",route="{_escape(route)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (math.inf,), stats.buckets):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{p}_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{p}_request_duration_seconds_sum{{{labels}}} {stats.seconds!r}")
+            lines.append(f"{p}_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+        lines += [f"# HELP {p}_requests_total Requests by status code", f"# TYPE {p}_requests_total counter"]
+        for (method, route), stats in snapshot:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'{p}_requests_total{{method="{_escape(method)}",route="{_escape(route)}",'
+                             f'status="{status}"}} {count}')
+
+        for name, attr, help_text in (
+            ("request_bytes_total", "request_bytes", "Request body bytes received"),
+            ("response_bytes_total", "response_bytes", "Response body bytes sent"),
+        ):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} counter"]
+            for (method, route), stats in snapshot:
+                if stats.count:
+                    lines.append(f'{p}_{name}{{method="{_escape(method)}",route="{_escape(route)}"}} '
+                                 f"{getattr(stats, attr)}")
+
+        lines += [f"# HELP {p}_requests_in_flight Requests currently being served",
+                  f"# TYPE {p}_requests_in_flight gauge"]
+        for method, count in sorted(self.in_flight().items()):
+            lines.append(f'{p}_requests_in_flight{{method="{_escape(method)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[dict]:
+        """Per-route counts, bytes and latency quantiles (seconds), for the JSON view"""
+        rows = []
+        for (method, route), stats in self._snapshot():
+            with self._lock:
+                quantiles = stats.sketch.quantiles(REPORTED_QUANTILES)
+            rows.append({
+                "method": method,
+                "route": route,
+                "count": stats.count,
+                "statuses": {str(status): count for status, count in sorted(stats.statuses.items())},
+                "request_bytes": stats.request_bytes,
+                "response_bytes": stats.response_bytes,
+                "mean_seconds": round(stats.seconds / stats.count, 6) if stats.count else None,
+                **{
+                    f"p{round(q * 100)}_seconds": round(v, 6) if v is not None else None
+                    for q, v in zip(REPORTED_QUANTILES, quantiles)
+                },
+            })
+        return rows
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _route_template(scope) -> str:
+    """The matched route's full path template, e.g. /api/metrics/range, or UNMATCHED_ROUTE"""
+    # FastAPI versions that resolve included routers lazily keep the route's own path in
+    # scope["route"] and the prefixed one in the effective route context
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    route = context if getattr(context, "path_format", None) else scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _frame_stack(frame) -> Tuple[str, ...]:
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _await_chain(task) -> Tuple[str, ...]:
+    """Where a suspended task is waiting: its coroutine chain via cr_await, outermost first"""
+    stack = []
+    coro = task.get_coro() if task is not None else None
+    while coro is not None and len(stack) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(stack)
+
+
+class _Tracked:
+    __slots__ = ("method", "path", "started", "task", "thread_id", "samples")
+
+    def __init__(self, method: str, path: str, started: float, task, thread_id: int):
+        self.method = method
+        self.path = path
+        self.started = started
+        self.task = task
+        self.thread_id = thread_id
+        self.samples: Counter = Counter()
+
+
+class SlowRequestProfiler:
+    """Samples stacks of requests in flight longer than `threshold` seconds (see module docstring)"""
+
+    def __init__(self, threshold: float, interval: float = 0.005, keep: int = 50,
+                 on_slow_request: Optional[Callable[[dict], None]] = None):
+        self.threshold = threshold
+        self.interval = interval
+        self.on_slow_request = on_slow_request
+        self.recent: Deque[dict] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._active: Dict[int, _Tracked] = {}
+        self._next_id = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, method: str, path: str) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        with self._lock:
+            self._next_id += 1
+            token = self._next_id
+            self._active[token] = _Tracked(method, path, time.perf_counter(), task, threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def end(self, token: int, route: str, status: int, seconds: float):
+        with self._lock:
+            tracked = self._active.pop(token, None)
+            samples = Counter(tracked.samples) if tracked is not None else None
+        if tracked is None or seconds < self.threshold:
+            return
+        profile = {
+            "method": tracked.method,
+            "path": tracked.path,
+            "route": route,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "finished_at": time.time(),
+            "samples": sum(samples.values()),
+            "stacks": [
+                {"count": count, "kind": kind, "stack": list(stack)}
+                for (kind, stack), count in samples.most_common(20)
+            ],
+        }
+        self.recent.append(profile)
+        if self.on_slow_request is not None:
+            try:
+                self.on_slow_request(profile)
+            except Exception as e:
+                print(f"[WARN] Slow request callback failed: {e}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wake.clear()
+                self._wake.wait()
+                continue
+            now = time.perf_counter()
+            slow = [tracked for tracked in active if now - tracked.started >= self.threshold]
+            if slow:
+                frames = sys._current_frames()
+                for tracked in slow:
+                    frame = frames.get(tracked.thread_id)
+                    stacks = [("thread", _frame_stack(frame))] if frame is not None else []
+                    chain = _await_chain(tracked.task)
+                    if chain:
+                        stacks.append(("await", chain))
+                    with self._lock:  # end() copies the samples under the same lock
+                        for stack in stacks:
+                            tracked.samples[stack] += 1
+                del frames
+                time.sleep(self.interval)
+            else:
+                oldest = min(tracked.started for tracked in active)
+                time.sleep(max(min(self.threshold - (now - oldest), 0.1), self.interval))
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware feeding RequestMetrics (and an optional SlowRequestProfiler)"""
+
+    def __init__(self, app, metrics: RequestMetrics, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.metrics = metrics
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        self.metrics.started(method)
+        token = self.profiler.begin(method, scope.get("path", "")) if self.profiler else None
+        started = time.perf_counter()
+        state = {"status": 500, "request_bytes": 0, "response_bytes": 0, "done": None}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["request_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    state["done"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            seconds = (state["done"] or time.perf_counter()) - started
+            # The router records the matched route in the scope; its template is the label
+            route = _route_template(scope)
+            self.metrics.finished(method, route, state["status"], seconds,
+                                  state["request_bytes"], state["response_bytes"])
+            if token is not None:
+                self.profiler.end(token, route, state["status"], seconds)
+
+
+def instrument_app(app: FastAPI, metrics: Optional[RequestMetrics] = None,
+                   profiler: Optional[SlowRequestProfiler] = None, path: str = "/metrics",
+                   authorize: Optional[Callable[[Request], object]] = None) -> RequestMetrics:
+    """
+    Add the middleware and the metrics endpoint to `app`; returns the RequestMetrics.
+    `authorize(request)` runs before every scrape and refuses it by raising HTTPException.
+    """
+    metrics = metrics or RequestMetrics()
+    app.add_middleware(InstrumentationMiddleware, metrics=metrics, profiler=profiler)
+
+    @app.get(path, include_in_schema=False)
+    async def metrics_endpoint(request: Request, format: str = "prometheus"):
+        if authorize is not None:
+            authorize(request)
+        if format == "json":
+            return JSONResponse({
+                "routes": metrics.summary(),
+                "in_flight": metrics.in_flight(),
+                "slow_requests": list(profiler.recent) if profiler else [],
+                "slow_request_threshold_seconds": profiler.threshold if profiler else None,
+            })
+        return PlainTextResponse(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return metrics
+
+
+def instrumentation_from_env(app: FastAPI,
+                             authorize: Optional[Callable[[Request], object]] = None) -> Optional[RequestMetrics]:
+    """instrument_app() configured from the environment (see module docstring); None when disabled"""
+    if os.getenv("AICOMPLYR_METRICS", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    profiler = None
+    threshold = os.getenv("AICOMPLYR_SLOW_REQUEST_SECONDS")
+    if threshold:
+        profiler = SlowRequestProfiler(
+            threshold=float(threshold),
+            interval=float(os.getenv("AICOMPLYR_PROFILE_INTERVAL_MS", "5")) / 1000,
+            keep=int(os.getenv("AICOMPLYR_SLOW_REQUEST_KEEP", "50")),
+            on_slow_request=lambda p: print(
+                f"[SLOW] {p['method']} {p['route']} {p['status']} took {p['seconds']:.3f}s "
+                f"({p['samples']} stack samples; GET /metrics?format=json for stacks)"
+            ),
+        )
+    return instrument_app(app, profiler=profiler, authorize=authorize)
@@ -0,0 +1,224 @@
+"""
+Streaming decision-latency percentiles.
+
+DDSketch keeps a count per logarithmically sized bucket, so any quantile
+is within `relative_accuracy` of the true value while memory stays bounded
+by the value range rather than the number of samples. Sketches merge by
+adding bucket counts, which makes them safe to combine across worker
+processes, persistence snapshots and time buckets.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Bucket cap; beyond it the lowest buckets are folded together (upper quantiles stay exact to alpha)
+DEFAULT_MAX_BUCKETS = 2048
+
+# Durations at or below this many seconds are counted as zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+# Dimensions with their own latency sketch, besides the global one
+LATENCY_DIMENSIONS = ("regulatory_framework", "ai_tool_used")
+
+REPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class DDSketch:
+    """Relative-error quantile sketch over non-negative values"""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_buckets: int = DEFAULT_MAX_BUCKETS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    def key(self, value: float) -> int:
+        """Bucket index holding `value` (value > MIN_INDEXABLE_VALUE)"""
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _bucket_value(self, key: int) -> float:
+        """Representative value of a bucket, within relative_accuracy of anything in it"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        if value < 0:
+            raise ValueError("DDSketch only tracks non-negative values")
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            key = self.key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def merge(self, other: "DDSketch"):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Estimates for several quantiles (0 <= q <= 1) with a single pass over the buckets"""
+        qs = list(qs)
+        results: List[Optional[float]] = [None] * len(qs)
+        if not self.count:
+            return results
+        keys = sorted(self.buckets)
+        pos = 0
+        seen = self.zero_count
+        value = 0.0
+        for slot in sorted(range(len(qs)), key=qs.__getitem__):
+            rank = qs[slot] * (self.count - 1)
+            if rank < self.zero_count:
+                results[slot] = 0.0
+                continue
+            while seen <= rank and pos < len(keys):
+                seen += self.buckets[keys[pos]]
+                value = self._bucket_value(keys[pos])
+                pos += 1
+            # Clamp so estimates never leave the observed range
+            results[slot] = min(max(value, self.min), self.max)
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    def to_state(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": [[key, count] for key, count in self.buckets.items()],
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "DDSketch":
+        sketch = cls(state["relative_accuracy"])
+        sketch.buckets = {int(key): count for key, count in state["buckets"]}
+        sketch.zero_count = state["zero_count"]
+        sketch.count = state["count"]
+        sketch.sum = state["sum"]
+        if sketch.count:
+            sketch.min = state["min"]
+            sketch.max = state["max"]
+        return sketch
+
+
+def latency_summary(sketch: DDSketch) -> dict:
+    """Mean and reported percentiles in seconds (None while no decision carries a duration)"""
+    p50, p95, p99 = (
+        round(v, 4) if v is not None else None for v in sketch.quantiles(REPORTED_QUANTILES)
+    )
+    mean = sketch.mean
+    return {
+        "avg_decision_time": round(mean, 4) if mean is not None else None,
+        "decision_time_p50": p50,
+        "decision_time_p95": p95,
+        "decision_time_p99": p99,
+    }
+
+
+class LatencyTracker:
+    """Decision-time sketches overall and per LATENCY_DIMENSIONS value"""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.overall = DDSketch(relative_accuracy)
+        self.by_dimension: Dict[str, Dict[str, DDSketch]] = {name: {} for name in LATENCY_DIMENSIONS}
+
+    def add(self, decision_time: Optional[float], dims: Tuple[str, ...]):
+        """Record one duration; `dims` are the decision's LATENCY_DIMENSIONS values"""
+        if decision_time is None or decision_time != decision_time:  # missing or NaN
+            return
+        self.overall.add(decision_time)
+        for name, value in zip(LATENCY_DIMENSIONS, dims):
+            sketches = self.by_dimension[name]
+            sketch = sketches.get(value)
+            if sketch is None:
+                sketch = sketches[value] = DDSketch(self.relative_accuracy)
+            sketch.add(decision_time)
+
+    def add_decision(self, decision):
+        self.add(decision.decision_time, tuple(getattr(decision, name) for name in LATENCY_DIMENSIONS))
+
+    def add_columns(self, columns: Dict[str, list], first: int = 0):
+        """Fold rows [first:] of a column batch (see decision_log.BATCH_FIELDS)"""
+        dims = zip(*(columns[name][first:] for name in LATENCY_DIMENSIONS))
+        for decision_time, dim in zip(columns["decision_time"][first:], dims):
+            self.add(decision_time, dim)
+
+    def merge(self, other: "LatencyTracker"):
+        self.overall.merge(other.overall)
+        for name, sketches in other.by_dimension.items():
+            mine = self.by_dimension[name]
+            for value, sketch in sketches.items():
+                if value in mine:
+                    mine[value].merge(sketch)
+                else:
+                    mine[value] = DDSketch.from_state(sketch.to_state())
+
+    def summary(self) -> dict:
+        return latency_summary(self.overall)
+
+    def breakdown(self, field: str) -> Dict[str, dict]:
+        """Per-value latency summary for one of LATENCY_DIMENSIONS"""
+        if field not in LATENCY_DIMENSIONS:
+            raise ValueError(f"Unknown latency dimension: {field}")
+        return {value: latency_summary(sketch) for value, sketch in self.by_dimension[field].items()}
+
+    def to_state(self) -> dict:
+        return {
+            "overall": self.overall.to_state(),
+            "by_dimension": {
+                name: {value: sketch.to_state() for value, sketch in sketches.items()}
+                for name, sketches in self.by_dimension.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "LatencyTracker":
+        tracker = cls()
+        tracker.overall = DDSketch.from_state(state["overall"])
+        tracker.relative_accuracy = tracker.overall.relative_accuracy
+        for name, sketches in state["by_dimension"].items():
+            tracker.by_dimension[name] = {value: DDSketch.from_state(s) for value, s in sketches.items()}
+        return tracker
@@ -1,18 +1,97 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
+from collections import deque
+import json
 import random
 from models.governance_decision import GovernanceDecision, LiveMetrics
+from api.decision_store import CATEGORICAL_FIELDS
+from api.decision_feed import DecisionBroadcaster, format_sse
+from api.ndjson import NDJSONError, is_gzip, iter_ndjson_lines
+from api.rollups import GRANULARITIES, ROLLUP_DIMENSIONS
+from api.latency_sketch import LATENCY_DIMENSIONS
+from api.response_cache import GenerationCache
+from api.decision_backends import decision_backend_from_env
 
 router = APIRouter()
 
-# Mock data for initial testing - replace with real data later
-MOCK_DECISIONS = []
+# Decision storage (in-process by default, SQLite for multi-worker deployments)
+STORE = decision_backend_from_env()
+
+# Bulk ingests write to the store in chunks of this many decisions
+INGEST_CHUNK = 500
+
+# Rendered /live-metrics and /recent-decisions bodies for the store's current version
+RESPONSES = GenerationCache()
+
+# Pushes new decisions and metric changes to /decision-stream subscribers
+FEED = DecisionBroadcaster()
+
+# Bulk ingests only push their newest decisions, so a burst cannot overflow every client buffer
+FEED_BURST_LIMIT = 50
+
+# Metric values last sent to the feed, so subscribers only receive what changed
+_last_published_metrics = {}
+
+def record_decision(decision: GovernanceDecision):
+    """Store a decision and fold it into the running metrics"""
+    STORE.append(decision)
+
+def startup_decision_store():
+    """Load or connect the decision store (call once per worker at startup)"""
+    STORE.startup()
+
+def shutdown_decision_store():
+    """Flush the decision store (call at shutdown)"""
+    STORE.shutdown()
+
+def _ensure_seeded():
+    """Seed mock decisions for demos when nothing is persisted"""
+    if not STORE.persistent and not len(STORE):
+        generate_mock_decisions()
+
+def _feed_item(d: GovernanceDecision) -> dict:
+    """Anonymized live-feed representation of a decision"""
+    return {
+        'id': d.id,
+        'timestamp': d.timestamp.isoformat(),
+        'type': d.decision_type,
+        'tool': d.ai_tool_used,
+        'citation': d.regulatory_citation,
+        'human_involved': d.human_override,
+        'context': d.anonymized_context[:80] + "..." if len(d.anonymized_context) > 80 else d.anonymized_context,
+        'compliance_score': round(d.compliance_score, 2),
+        'framework': d.regulatory_framework
+    }
+
+def _metrics_payload() -> dict:
+    snapshot = STORE.live_metrics()
+    if snapshot['last_decision_time'] is not None:
+        snapshot['last_decision_time'] = snapshot['last_decision_time'].isoformat()
+    return snapshot
+
+def _publish_decision(decision: GovernanceDecision):
+    """Push a new decision to live subscribers"""
+    if FEED.subscriber_count:
+        FEED.publish('decision', _feed_item(decision))
+
+def _publish_metrics_delta():
+    """Push the metric fields that changed since the last publish to live subscribers"""
+    global _last_published_metrics
+    
+    if not FEED.subscriber_count:
+        return
+    
+    metrics = _metrics_payload()
+    delta = {k: v for k, v in metrics.items() if _last_published_metrics.get(k) != v}
+    _last_published_metrics = metrics
+    if delta:
+        FEED.publish('metrics', delta)
 
 def generate_mock_decisions():
     """Generate realistic mock data for testing"""
-    global MOCK_DECISIONS
-    
     decision_types = ['approve', 'flag', 'modify', 'escalate']
     tools = ['cursor', 'claude-3.5', 'midjourney', 'chatgpt', 'custom-ai']
     citations = [
@@ -31,8 +110,8 @@ def generate_mock_decisions():
         "Policy recommendation from AI governance engine"
     ]
     
-    for i in range(100):  # Generate 100 mock decisions
-        MOCK_DECISIONS.append(GovernanceDecision(
+    STORE.append_many(
+        GovernanceDecision(
             decision_type=random.choice(decision_types),
             ai_tool_used=random.choice(tools),
             regulatory_citation=random.choice(citations),
@@ -43,73 +122,210 @@ def generate_mock_decisions():
             pharma_context=True,
             agency_relationship=random.choice(['internal', 'external_partner', 'client_work']),
             public_facing_impact=random.choice([True, False]),
+            decision_time=round(random.lognormvariate(0.7, 0.5), 3),  # seconds, ~2.3 on average
             timestamp=datetime.utcnow() - timedelta(minutes=random.randint(1, 10080))  # Last week
-        ))
+        )
+        for i in range(100)  # Generate 100 mock decisions
+    )
 
 @router.get('/live-metrics', response_model=LiveMetrics)
-async def get_live_metrics():
-    """Real-time governance metrics for homepage widget"""
+async def get_live_metrics(request: Request):
+    """Real-time governance metrics for homepage widget (ETag / If-None-Match aware)"""
     
-    if not MOCK_DECISIONS:
-        generate_mock_decisions()
+    _ensure_seeded()
     
+    # decisions_today also rolls over at midnight, so the day is part of the cache key
     today = datetime.utcnow().date()
-    today_decisions = [d for d in MOCK_DECISIONS if d.timestamp.date() == today]
-    
-    # Calculate metrics
-    total_decisions = len(MOCK_DECISIONS)
-    decisions_today = len(today_decisions)
-    compliance_rate = (len([d for d in MOCK_DECISIONS if d.compliance_score >= 0.95]) / total_decisions * 100) if total_decisions > 0 else 100
-    
-    # Policy conflicts (decisions that required human override)
-    conflicts_resolved = len([d for d in MOCK_DECISIONS if d.human_override])
-    
-    # Regulatory citations count
-    regulatory_citations = len(set(d.regulatory_citation for d in MOCK_DECISIONS))
-    
-    # Average decision time (mock)
-    avg_decision_time = 2.3  # seconds
-    
-    # Last decision
-    last_decision = max(MOCK_DECISIONS, key=lambda x: x.timestamp) if MOCK_DECISIONS else None
-    
-    return LiveMetrics(
-        decisions_today=decisions_today,
-        compliance_rate=round(compliance_rate, 1),
-        total_decisions=total_decisions,
-        last_decision_time=last_decision.timestamp if last_decision else None,
-        avg_decision_time=avg_decision_time,
-        policy_conflicts_resolved=conflicts_resolved,
-        regulatory_citations=regulatory_citations,
-        active_policies=12  # Mock number
-    )
+    
+    def render() -> bytes:
+        # Decision-time mean and percentiles come from the store's latency sketches
+        return LiveMetrics(
+            **STORE.live_metrics(today),
+            active_policies=12  # Mock number
+        ).model_dump_json().encode('utf-8')
+    
+    return RESPONSES.respond(request.headers.get('if-none-match'), STORE.version(), ('live-metrics', today), render)
 
 @router.get('/recent-decisions')
-async def get_recent_decisions(limit: int = 10):
-    """Anonymized recent decisions for live feed"""
+async def get_recent_decisions(
+    request: Request,
+    limit: int = 10,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Anonymized recent decisions for live feed, optionally within [since, until] (ETag / If-None-Match aware)"""
     
-    if not MOCK_DECISIONS:
-        generate_mock_decisions()
+    _ensure_seeded()
     
-    # Sort by timestamp, get most recent
-    recent = sorted(MOCK_DECISIONS, key=lambda x: x.timestamp, reverse=True)[:limit]
+    def render() -> bytes:
+        # Most recent first, straight off the store's time index
+        if since is None and until is None:
+            recent = STORE.recent(limit)
+        else:
+            recent = STORE.between(since, until, limit=limit)
+        return JSONResponse([_feed_item(d) for d in recent]).body
     
-    return [{
-        'id': d.id,
-        'timestamp': d.timestamp.isoformat(),
-        'type': d.decision_type,
-        'tool': d.ai_tool_used,
-        'citation': d.regulatory_citation,
-        'human_involved': d.human_override,
-        'context': d.anonymized_context[:80] + "..." if len(d.anonymized_context) > 80 else d.anonymized_context,
-        'compliance_score': round(d.compliance_score, 2),
-        'framework': d.regulatory_framework
-    } for d in recent]
+    key = ('recent-decisions', limit, since, until)
+    return RESPONSES.respond(request.headers.get('if-none-match'), STORE.version(), key, render)
+
+@router.get('/metrics/breakdown')
+async def get_metrics_breakdown(field: str = 'regulatory_framework'):
+    """Per-value decision counts, compliance rate and overrides (e.g. per framework)"""
+    
+    if field not in CATEGORICAL_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of: {', '.join(CATEGORICAL_FIELDS)}")
+    
+    _ensure_seeded()
+    
+    return STORE.breakdown(field)
+
+@router.get('/metrics/latency')
+async def get_metrics_latency(field: str = 'regulatory_framework'):
+    """Per-value decision-time mean and p50/p95/p99 (e.g. per framework or per AI tool)"""
+    
+    if field not in LATENCY_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"field must be one of: {', '.join(LATENCY_DIMENSIONS)}")
+    
+    _ensure_seeded()
+    
+    return STORE.latency_breakdown(field)
+
+@router.get('/metrics/range')
+async def get_metrics_range(
+    granularity: str = 'hour',
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    regulatory_framework: Optional[str] = None,
+    ai_tool_used: Optional[str] = None,
+    decision_type: Optional[str] = None,
+    agency_relationship: Optional[str] = None,
+    group_by: str = ''
+):
+    """Historical metrics per hour or day from pre-aggregated rollups, with optional filters and grouping"""
+    
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    group_fields = [f.strip() for f in group_by.split(',') if f.strip()]
+    unknown = [f for f in group_fields if f not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must be drawn from: {', '.join(ROLLUP_DIMENSIONS)}")
+    
+    _ensure_seeded()
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    filters = {
+        name: value for name, value in (
+            ('regulatory_framework', regulatory_framework),
+            ('ai_tool_used', ai_tool_used),
+            ('decision_type', decision_type),
+            ('agency_relationship', agency_relationship)
+        ) if value is not None
+    }
+    
+    return {
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'filters': filters,
+        'group_by': group_fields,
+        'buckets': STORE.metrics_range(granularity, start, end, filters, group_fields)
+    }
+
+@router.get('/decision-stream')
+async def stream_decisions():
+    """Server-Sent Events feed of new decisions and metric deltas for the live widget"""
+    
+    _ensure_seeded()
+    
+    # New subscribers start from the full metric set; later frames carry only changes
+    initial = format_sse('metrics', _metrics_payload())
+    return StreamingResponse(
+        FEED.stream(initial),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @router.post('/governance-decision')
 async def log_governance_decision(decision: GovernanceDecision):
     """Log a new governance decision (for when you actually use the platform)"""
     
-    global MOCK_DECISIONS
-    MOCK_DECISIONS.append(decision)
-    return {"status": "success", "decision_id": decision.id}
\ No newline at end of file
+    record_decision(decision)
+    _publish_decision(decision)
+    _publish_metrics_delta()
+    return {"status": "success", "decision_id": decision.id}
+
+def _validation_errors(e: ValidationError) -> list:
+    return [{'loc': list(err['loc']), 'msg': err['msg'], 'type': err['type']} for err in e.errors()]
+
+def _ingest_summary(results: list) -> dict:
+    accepted = sum(1 for r in results if r['status'] == 'accepted')
+    return {
+        "status": "success" if accepted == len(results) else "partial",
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
+    }
+
+@router.post('/governance-decisions/batch')
+async def log_governance_decisions_batch(request: Request):
+    """Log a JSON array of decisions in one request, with per-record acceptance or errors"""
+    
+    try:
+        records = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of governance decisions")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of governance decisions")
+    
+    results = []
+    accepted = []
+    for index, record in enumerate(records):
+        try:
+            decision = GovernanceDecision.model_validate(record)
+        except ValidationError as e:
+            results.append({'index': index, 'status': 'rejected', 'errors': _validation_errors(e)})
+            continue
+        accepted.append(decision)
+        results.append({'index': index, 'status': 'accepted', 'decision_id': decision.id})
+    STORE.append_many(accepted)
+    
+    for decision in accepted[-FEED_BURST_LIMIT:]:
+        _publish_decision(decision)
+    _publish_metrics_delta()
+    return _ingest_summary(results)
+
+@router.post('/governance-decisions/stream')
+async def log_governance_decisions_stream(request: Request):
+    """Log NDJSON decisions (optionally Content-Encoding: gzip), validating line by line as the body arrives"""
+    
+    results = []
+    pending = []
+    newest = deque(maxlen=FEED_BURST_LIMIT)
+    lines = iter_ndjson_lines(request.stream(), gzipped=is_gzip(request.headers.get('content-encoding')))
+    try:
+        async for line_no, line in lines:
+            try:
+                decision = GovernanceDecision.model_validate_json(line)
+            except ValidationError as e:
+                results.append({'line': line_no, 'status': 'rejected', 'errors': _validation_errors(e)})
+                continue
+            pending.append(decision)
+            newest.append(decision)
+            results.append({'line': line_no, 'status': 'accepted', 'decision_id': decision.id})
+            if len(pending) >= INGEST_CHUNK:
+                STORE.append_many(pending)
+                pending = []
+        STORE.append_many(pending)
+    except NDJSONError as e:
+        # Records before the bad chunk are kept; report them alongside the error
+        STORE.append_many(pending)
+        summary = _ingest_summary(results)
+        summary.update(status="error", detail=str(e))
+        return JSONResponse(status_code=400, content=summary)
+    finally:
+        for decision in newest:
+            _publish_decision(decision)
+        _publish_metrics_delta()
+    
+    return _ingest_summary(results)
\ No newline at end of file
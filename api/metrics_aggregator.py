@@ -0,0 +1,106 @@
+"""
+Running aggregates behind /api/live-metrics.
+
+Every logged decision updates a handful of counters so the homepage widget
+can be answered in constant time instead of rescanning the decision history.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Set
+
+# Decisions at or above this score count towards the compliance rate
+COMPLIANCE_THRESHOLD = 0.95
+
+
+def to_utc(ts: datetime) -> datetime:
+    """Normalise a timestamp to aware UTC (naive values are treated as UTC)"""
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+class MetricsAggregator:
+    """Incrementally maintained counters for the live metrics widget"""
+
+    def __init__(self):
+        self.total_decisions = 0
+        self.compliant_decisions = 0
+        self.human_overrides = 0
+        self.citations: Set[str] = set()
+        self.last_decision_time: Optional[datetime] = None
+        self.decisions_per_day: Dict[date, int] = {}
+
+    def add(self, timestamp: datetime, compliance_score: float, human_override: bool, citation: str):
+        """Fold a single decision into the running totals"""
+        timestamp = to_utc(timestamp)
+
+        self.total_decisions += 1
+        if compliance_score >= COMPLIANCE_THRESHOLD:
+            self.compliant_decisions += 1
+        if human_override:
+            self.human_overrides += 1
+        self.citations.add(citation)
+
+        day = timestamp.date()
+        self.decisions_per_day[day] = self.decisions_per_day.get(day, 0) + 1
+
+        if self.last_decision_time is None or timestamp > self.last_decision_time:
+            self.last_decision_time = timestamp
+
+    def add_decision(self, decision):
+        """Fold a GovernanceDecision into the running totals"""
+        self.add(
+            decision.timestamp,
+            decision.compliance_score,
+            decision.human_override,
+            decision.regulatory_citation,
+        )
+
+    def to_state(self) -> dict:
+        """JSON-serialisable copy of the counters, for persistence snapshots"""
+        return {
+            "total_decisions": self.total_decisions,
+            "compliant_decisions": self.compliant_decisions,
+            "human_overrides": self.human_overrides,
+            "citations": sorted(self.citations),
+            "last_decision_time": self.last_decision_time.isoformat() if self.last_decision_time else None,
+            "decisions_per_day": {day.isoformat(): count for day, count in self.decisions_per_day.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "MetricsAggregator":
+        """Rebuild an aggregator from to_state() output"""
+        aggregator = cls()
+        aggregator.total_decisions = state["total_decisions"]
+        aggregator.compliant_decisions = state["compliant_decisions"]
+        aggregator.human_overrides = state["human_overrides"]
+        aggregator.citations = set(state["citations"])
+        if state["last_decision_time"]:
+            aggregator.last_decision_time = datetime.fromisoformat(state["last_decision_time"])
+        aggregator.decisions_per_day = {
+            date.fromisoformat(day): count for day, count in state["decisions_per_day"].items()
+        }
+        return aggregator
+
+    def decisions_on(self, day: date) -> int:
+        return self.decisions_per_day.get(day, 0)
+
+    @property
+    def compliance_rate(self) -> float:
+        """Percentage of decisions at or above COMPLIANCE_THRESHOLD"""
+        if not self.total_decisions:
+            return 100
+        return self.compliant_decisions / self.total_decisions * 100
+
+    def snapshot(self, today: Optional[date] = None) -> dict:
+        """Current metric values, ready to feed into LiveMetrics"""
+        if today is None:
+            today = datetime.now(timezone.utc).date()
+        return {
+            "decisions_today": self.decisions_on(today),
+            "compliance_rate": round(self.compliance_rate, 1),
+            "total_decisions": self.total_decisions,
+            "last_decision_time": self.last_decision_time,
+            "policy_conflicts_resolved": self.human_overrides,
+            "regulatory_citations": len(self.citations),
+        }
@@ -0,0 +1,91 @@
+"""
+Incremental NDJSON decoding for streamed request bodies.
+
+Lines are yielded as soon as their terminating newline arrives, so a large
+upload is validated and stored record by record instead of being buffered
+whole. Gzip-compressed bodies are inflated chunk by chunk on the way in,
+including bodies of several concatenated gzip members (as `cat a.gz b.gz`
+or a client compressing each flush produces); bytes after the last member
+that are not another member are rejected.
+"""
+
+import zlib
+from typing import AsyncIterable, AsyncIterator, Tuple
+
+# Longest single record accepted before the stream is rejected
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class NDJSONError(ValueError):
+    """The body cannot be decoded as (optionally gzipped) NDJSON"""
+
+
+def is_gzip(content_encoding: str) -> bool:
+    return "gzip" in (content_encoding or "").lower()
+
+
+def _gzip_inflater():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+class _GzipMembers:
+    """Inflates a gzip stream member by member; a new member must follow each one that ends"""
+
+    def __init__(self):
+        self.inflater = _gzip_inflater()
+        self.members = 1
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            if self.inflater.eof:
+                self.inflater = _gzip_inflater()
+                self.members += 1
+            try:
+                out.append(self.inflater.decompress(data))
+            except zlib.error as e:
+                if self.members > 1:
+                    raise NDJSONError(f"trailing data after gzip member {self.members - 1} is not gzip") from e
+                raise NDJSONError(f"invalid gzip body: {e}") from e
+            data = self.inflater.unused_data if self.inflater.eof else b""
+        return b"".join(out)
+
+    def finish(self) -> bytes:
+        if not self.inflater.eof:
+            raise NDJSONError("truncated gzip body")
+        return self.inflater.flush()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes],
+    gzipped: bool = False,
+    max_line_bytes: int = MAX_LINE_BYTES,
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield (line_number, line) for each non-blank line, 1-based"""
+    inflater = _GzipMembers() if gzipped else None
+    pending = b""
+    line_no = 0
+
+    def split(data: bytes):
+        nonlocal pending, line_no
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > max_line_bytes:
+            raise NDJSONError(f"line {line_no + len(lines) + 1} exceeds {max_line_bytes} bytes")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+
+    async for chunk in chunks:
+        if inflater is not None:
+            chunk = inflater.decompress(chunk)
+        for item in split(chunk):
+            yield item
+
+    if inflater is not None:
+        for item in split(inflater.finish()):
+            yield item
+
+    if pending.strip():
+        yield line_no + 1, pending
@@ -0,0 +1,79 @@
+"""
+Generation-keyed caching of serialised API responses.
+
+The decision store exposes a version token that changes on every ingest.
+Read endpoints key their pre-rendered JSON bytes on that token (plus the
+request parameters that shape the body), so repeated polls between ingests
+cost a dictionary lookup, and clients that send the ETag back in
+If-None-Match get an empty 304 instead of the body.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from fastapi import Response
+
+# Rendered bodies kept per generation (one per distinct parameter set)
+DEFAULT_MAX_ENTRIES = 64
+
+# Clients may reuse a cached body only after revalidating it
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(version: str, key: Hashable) -> str:
+    """Strong ETag for the response identified by `key` at store `version`"""
+    digest = hashlib.blake2b(repr((version, key)).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag` (weak comparison, per RFC 9110)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class GenerationCache:
+    """Rendered response bodies for the current store version, dropped wholesale when it changes"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, version: str, key: Hashable, render: Callable[[], bytes]) -> Tuple[str, bytes]:
+        """(ETag, body) for `key`, calling `render` only on a miss"""
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = (make_etag(version, key), render())
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, if_none_match: Optional[str], version: str, key: Hashable, render: Callable[[], bytes]) -> Response:
+        """200 with the cached JSON body, or 304 (without rendering) when the client already holds it"""
+        etag = make_etag(version, key)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        _, body = self.get(version, key, render)
+        return Response(content=body, media_type="application/json", headers=headers)
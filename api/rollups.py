@@ -0,0 +1,160 @@
+"""
+Pre-aggregated hourly and daily rollups of governance decisions.
+
+Every logged decision bumps one counter cell per granularity, keyed by time
+bucket plus regulatory_framework, ai_tool_used, decision_type and
+agency_relationship. Historical range queries then read a few hundred
+cells instead of rescanning millions of decisions.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api.decision_index import from_epoch_us, to_epoch_us
+from api.metrics_aggregator import COMPLIANCE_THRESHOLD
+
+ROLLUP_DIMENSIONS = ("regulatory_framework", "ai_tool_used", "decision_type", "agency_relationship")
+
+# Bucket width in microseconds
+GRANULARITIES = {
+    "hour": 3600 * 1_000_000,
+    "day": 86400 * 1_000_000,
+}
+
+# Counter slots within a cell
+_DECISIONS, _COMPLIANT, _OVERRIDES, _SCORE_SUM = range(4)
+
+Dimensions = Tuple[str, str, str, str]
+
+
+def rollup_row(bucket_us: int, groups: Iterable[Tuple[str, str]], decisions: int, compliant: int, overrides: int, score_sum: float) -> dict:
+    """One /metrics/range result row from summed counters"""
+    row = {"bucket_start": from_epoch_us(bucket_us).isoformat()}
+    row.update(groups)
+    row.update({
+        "decisions": decisions,
+        "compliance_rate": round(compliant / decisions * 100, 1),
+        "avg_compliance_score": round(score_sum / decisions, 4),
+        "policy_conflicts_resolved": overrides,
+    })
+    return row
+
+
+class RollupTable:
+    """Counter cells for one granularity: bucket start -> dimensions -> counters"""
+
+    def __init__(self, bucket_us: int):
+        self.bucket_us = bucket_us
+        self.buckets: Dict[int, Dict[Dimensions, list]] = {}
+        # Sorted bucket starts, for range lookups
+        self._starts: List[int] = []
+
+    def __len__(self) -> int:
+        """Number of populated cells"""
+        return sum(len(cells) for cells in self.buckets.values())
+
+    def add(self, ts_us: int, dims: Dimensions, compliance_score: float, human_override: bool):
+        start = ts_us - ts_us % self.bucket_us
+        cells = self.buckets.get(start)
+        if cells is None:
+            cells = self.buckets[start] = {}
+            if not self._starts or start > self._starts[-1]:
+                self._starts.append(start)
+            else:
+                insort(self._starts, start)
+        cell = cells.get(dims)
+        if cell is None:
+            cell = cells[dims] = [0, 0, 0, 0.0]
+        cell[_DECISIONS] += 1
+        if compliance_score >= COMPLIANCE_THRESHOLD:
+            cell[_COMPLIANT] += 1
+        if human_override:
+            cell[_OVERRIDES] += 1
+        cell[_SCORE_SUM] += compliance_score
+
+    def cells_between(self, start_us: int, end_us: int) -> Iterable[Tuple[int, Dimensions, list]]:
+        """(bucket start, dimensions, counters) for buckets starting within [start_us, end_us]"""
+        lo = bisect_left(self._starts, start_us - start_us % self.bucket_us)
+        hi = bisect_right(self._starts, end_us)
+        for bucket in self._starts[lo:hi]:
+            for dims, cell in self.buckets[bucket].items():
+                yield bucket, dims, cell
+
+    def to_state(self) -> list:
+        return [[bucket, list(dims), cell] for bucket, cells in self.buckets.items() for dims, cell in cells.items()]
+
+    def load_state(self, state: list):
+        for bucket, dims, cell in state:
+            cells = self.buckets.setdefault(bucket, {})
+            cells[tuple(dims)] = cell
+        self._starts = sorted(self.buckets)
+
+
+class DecisionRollups:
+    """Hourly and daily rollup tables maintained together at ingest"""
+
+    def __init__(self):
+        self.tables = {name: RollupTable(width) for name, width in GRANULARITIES.items()}
+
+    def add(self, ts_us: int, dims: Dimensions, compliance_score: float, human_override: bool):
+        for table in self.tables.values():
+            table.add(ts_us, dims, compliance_score, human_override)
+
+    def add_decision(self, decision):
+        self.add(
+            to_epoch_us(decision.timestamp),
+            tuple(getattr(decision, name) for name in ROLLUP_DIMENSIONS),
+            decision.compliance_score,
+            decision.human_override,
+        )
+
+    def add_columns(self, columns: Dict[str, list], first: int = 0):
+        """Fold rows [first:] of a column batch (see decision_log.BATCH_FIELDS)"""
+        dims = zip(*(columns[name][first:] for name in ROLLUP_DIMENSIONS))
+        for ts_us, dim, score, override in zip(
+            columns["timestamp_us"][first:],
+            dims,
+            columns["compliance_score"][first:],
+            columns["human_override"][first:],
+        ):
+            self.add(ts_us, dim, score, override)
+
+    def query(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        filters: Optional[Dict[str, str]] = None,
+        group_by: Iterable[str] = (),
+    ) -> List[dict]:
+        """
+        Per-bucket totals between start and end, restricted to cells matching
+        `filters` and split by the `group_by` dimensions.
+        """
+        table = self.tables[granularity]
+        match = [(ROLLUP_DIMENSIONS.index(name), value) for name, value in (filters or {}).items()]
+        group_positions = [ROLLUP_DIMENSIONS.index(name) for name in group_by]
+
+        totals: Dict[tuple, list] = {}
+        for bucket, dims, cell in table.cells_between(to_epoch_us(start), to_epoch_us(end)):
+            if any(dims[pos] != value for pos, value in match):
+                continue
+            key = (bucket, *(dims[pos] for pos in group_positions))
+            acc = totals.get(key)
+            if acc is None:
+                acc = totals[key] = [0, 0, 0, 0.0]
+            for slot in range(4):
+                acc[slot] += cell[slot]
+
+        return [rollup_row(key[0], zip(group_by, key[1:]), *totals[key]) for key in sorted(totals)]
+
+    def to_state(self) -> dict:
+        return {name: table.to_state() for name, table in self.tables.items()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "DecisionRollups":
+        rollups = cls()
+        for name, table_state in state.items():
+            rollups.tables[name].load_state(table_state)
+        return rollups
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
-from api.live_metrics import router as metrics_router
+from api.live_metrics import router as metrics_router, startup_decision_store, shutdown_decision_store
 from fastapi.middleware.cors import CORSMiddleware
+from api.instrumentation import instrumentation_from_env
 
 app = FastAPI(title="aicomplyr.io API", description="Live Governance Proof API")
 
@@ -11,11 +12,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Include the metrics router
 app.include_router(metrics_router, prefix="/api", tags=["metrics"])
 
+# Per-route latency, size and in-flight metrics at GET /metrics; AICOMPLYR_SLOW_REQUEST_SECONDS
+# turns on stack sampling for slow requests
+REQUEST_METRICS = instrumentation_from_env(app)
+
+@app.on_event("startup")
+async def startup():
+    # Replay the decision log or connect to the shared SQLite store, depending on configuration
+    startup_decision_store()
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_decision_store()
+
 @app.get("/")
 async def root():
     return {"message": "aicomplyr.io API - Live Governance Proof", "status": "running"}
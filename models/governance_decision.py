@@ -1,11 +1,11 @@
 from datetime import datetime, timezone
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 import uuid
 
 class GovernanceDecision(BaseModel):
-    id: str = str(uuid.uuid4())
-    timestamp: datetime = datetime.now(timezone.utc)
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     decision_type: str  # "approve", "flag", "modify", "escalate"
     ai_tool_used: str   # "cursor", "claude-3.5", "midjourney", etc.
     regulatory_citation: str  # "FDA 21 CFR 11.10(a)", "EMA GCP 5.1.3"
@@ -16,6 +16,7 @@ class GovernanceDecision(BaseModel):
     pharma_context: bool = True
     agency_relationship: str  # "internal", "external_partner", "client_work"
     public_facing_impact: bool = False
+    decision_time: Optional[float] = Field(default=None, ge=0)  # seconds taken to reach the decision, if measured
     
     class Config:
         json_encoders = {
@@ -27,8 +28,11 @@ class LiveMetrics(BaseModel):
     compliance_rate: float
     total_decisions: int
     last_decision_time: Optional[datetime]
-    avg_decision_time: float  # seconds
+    avg_decision_time: Optional[float]  # seconds, None until decisions report decision_time
+    decision_time_p50: Optional[float] = None
+    decision_time_p95: Optional[float] = None
+    decision_time_p99: Optional[float] = None
     policy_conflicts_resolved: int
     regulatory_citations: int
     active_policies: int
-    last_updated: datetime = datetime.now(timezone.utc)
\ No newline at end of file
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
@@ -5,29 +5,60 @@ Generate API keys for AICOMPLYR (dev-only).
 Examples:
   python scripts/aicomplyr_keygen.py
   python scripts/aicomplyr_keygen.py 3
+  python scripts/aicomplyr_keygen.py --keys-file aicomplyr_keys.jsonl --label ci --rate 5 --burst 20
+
+With --keys-file, each key is registered by appending its SHA-256 hash and
+quota to the JSON Lines file the server reads from AICOMPLYR_API_KEYS_FILE
+(picked up without a restart). The plaintext key is printed once and never
+stored.
 """
 
+import argparse
+import hashlib
+import json
+import os
 import secrets
 import sys
 
 
 def main() -> None:
-    count = 1
-    if len(sys.argv) > 1:
-        try:
-            count = int(sys.argv[1])
-        except ValueError:
-            print("Usage: python scripts/aicomplyr_keygen.py [count]", file=sys.stderr)
-            sys.exit(2)
-        if count < 1 or count > 50:
-            print("count must be between 1 and 50", file=sys.stderr)
-            sys.exit(2)
+    parser = argparse.ArgumentParser(description="Generate AICOMPLYR API keys")
+    parser.add_argument("count", nargs="?", type=int, default=1, help="number of keys (1-50)")
+    parser.add_argument("--keys-file", help="append hashed keys to this JSON Lines registry")
+    parser.add_argument("--label", help="label stored with the keys (e.g. the CI pipeline)")
+    parser.add_argument("--rate", type=float, help="requests/second per key (0 = unlimited; server default if unset)")
+    parser.add_argument("--burst", type=int, help="burst size per key (server default if unset)")
+    args = parser.parse_args()
 
-    for _ in range(count):
-        print(secrets.token_urlsafe(32))
+    if args.count < 1 or args.count > 50:
+        print("count must be between 1 and 50", file=sys.stderr)
+        sys.exit(2)
+    if (args.label or args.rate is not None or args.burst is not None) and not args.keys_file:
+        print("--label/--rate/--burst require --keys-file", file=sys.stderr)
+        sys.exit(2)
 
+    keys = [secrets.token_urlsafe(32) for _ in range(args.count)]
 
-if __name__ == "__main__":
-    main()
+    if args.keys_file:
+        records = []
+        for key in keys:
+            record = {"id": secrets.token_hex(4), "sha256": hashlib.sha256(key.encode("utf-8")).hexdigest()}
+            if args.label:
+                record["label"] = args.label
+            if args.rate is not None:
+                record["rate"] = args.rate
+            if args.burst is not None:
+                record["burst"] = args.burst
+            records.append(json.dumps(record))
+        # One append of whole lines, so a server reloading mid-write never sees a partial record
+        with open(args.keys_file, "a", encoding="utf-8") as f:
+            f.write("".join(r + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
 
+    for key in keys:
+        print(key)
 
+
+if __name__ == "__main__":
+    main()
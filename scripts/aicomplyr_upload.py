@@ -9,14 +9,39 @@ Usage:
     $env:AICOMPLYR_API_KEY="DEV_MODE_TEST_KEY_001"
     $env:TASK_ID="TEST-001"
     python scripts/aicomplyr_upload.py
+
+Multi-file mode (files, directories and globs; each log's task id is
+TASK_ID if set, else the log's file name without extension):
+    python scripts/aicomplyr_upload.py "logs/**/*.log" more_logs/ --concurrency 16
+
+Logs are parsed in a process pool and uploaded over one keep-alive session
+with bounded concurrency. Bundles are uploaded as they are parsed, through
+bounded queues, so memory stays flat however many sections the logs hold.
+Connection errors, 429s and 5xx responses are
+retried with exponential backoff; bundles that still fail are spooled to
+AICOMPLYR_SPOOL_DIR (default .aicomplyr_spool/) and sent first on the next run.
 """
 
+import argparse
+import datetime
+import glob
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
+import random
 import sys
-import re
-import json
-import datetime
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Empty
+from typing import Iterable, Iterator, List, Optional, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
 
 # Toggle between local dev and production
 DEV_MODE = os.getenv("AICOMPLYR_DEV_MODE", "true").lower() == "true"
@@ -24,6 +49,14 @@ API_URL = os.getenv(
     "AICOMPLYR_API_URL",
     "http://127.0.0.1:8000/v1/proof-bundles" if DEV_MODE else "https://api.aicomplyr.io/v1/proof-bundles"
 )
+SPOOL_DIR = os.getenv("AICOMPLYR_SPOOL_DIR", ".aicomplyr_spool")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Parser processes hand bundles over in batches of PARSE_BATCH_SIZE, blocking while
+# PARSE_QUEUE_SIZE batches are already waiting for upload
+PARSE_BATCH_SIZE = 64
+PARSE_QUEUE_SIZE = 32
 
 
 def fail(msg):
@@ -34,24 +67,108 @@ def warn(msg: str) -> None:
     print(f"WARNING: {msg}", file=sys.stderr)
 
 
-def parse_cursor_output(text: str) -> dict:
-    """Extract structured fields from Cursor execution log."""
-    def g(rx):
-        m = re.search(rx, text, re.IGNORECASE | re.MULTILINE)
-        return m.group(1).strip() if m else None
+# Field markers, matched case-insensitively as "<marker>[:] <value to end of line>" at the start
+# of a line (after optional indentation). A Task ID line starts the next task section; a field
+# seen again within a section replaces the earlier value.
+FIELD_MARKERS = (
+    (b"task id", "task_id"),
+    (b"what was changed", "what"),
+    (b"why it was changed", "why"),
+    (b"files touched", "files"),
+    (b"status", "status"),
+)
+# Logs are scanned in line-aligned windows of this size, so memory stays flat on multi-GB files
+SCAN_CHUNK_BYTES = 1024 * 1024
 
-    files = g(r"Files touched:? (.+)")
+
+def _section_record(fields: dict) -> dict:
+    files = fields.get("files")
     return {
-        "what": g(r"What was changed:? (.+)"),
-        "why": g(r"Why it was changed:? (.+)"),
+        "task_id": fields.get("task_id"),
+        "what": fields.get("what"),
+        "why": fields.get("why"),
         "files": [f.strip() for f in files.split(",")] if files else [],
-        "status": g(r"Status:? (.+)"),
+        "status": fields.get("status"),
     }
 
 
-def build_proof_bundle(log_text: str) -> dict:
+def _iter_fields(chunk: bytes) -> Iterator[Tuple[str, bytes]]:
+    """(field, raw value) for every marker line in a chunk of whole lines, in order"""
+    lowered = chunk.lower()
+    hits = []
+    for marker, key in FIELD_MARKERS:
+        i = lowered.find(marker)
+        while i >= 0:
+            j = i + len(marker)
+            line_start = lowered.rfind(b"\n", 0, i) + 1
+            # Only "<marker>:" or "<marker> " opening a line counts; mentions inside other text do not
+            if chunk[j:j + 1] in (b":", b" ", b"\t") and not lowered[line_start:i].strip(b" \t"):
+                hits.append((i, j + (chunk[j:j + 1] == b":"), key))
+            i = lowered.find(marker, j)
+    hits.sort()
+
+    for _, j, key in hits:
+        line_end = chunk.find(b"\n", j)
+        value = chunk[j:line_end if line_end >= 0 else len(chunk)].strip()
+        if value:
+            yield key, value
+
+
+def _iter_chunks(buf) -> Iterator[bytes]:
+    """Consecutive windows of a bytes-like buffer, each ending on a line boundary"""
+    pos, size = 0, len(buf)
+    while pos < size:
+        end = min(pos + SCAN_CHUNK_BYTES, size)
+        if end < size:
+            newline = buf.rfind(b"\n", pos, end)
+            end = newline + 1 if newline >= 0 else (buf.find(b"\n", end) + 1 or size)
+        yield buf[pos:end]
+        pos = end
+
+
+def iter_cursor_sections(buf) -> Iterator[dict]:
+    """
+    Yield one record per task section of a log held in a bytes-like buffer
+    (bytes or mmap), reading it once in line-aligned chunks.
+    """
+    fields: dict = {}
+    for chunk in _iter_chunks(buf):
+        for key, value in _iter_fields(chunk):
+            if key == "task_id" and fields:
+                yield _section_record(fields)
+                fields = {}
+            fields[key] = value.decode("utf-8", errors="replace")
+    if fields:
+        yield _section_record(fields)
+
+
+def iter_log_sections(path: str) -> Iterator[dict]:
+    """Task sections of a log file, memory-mapped so multi-GB logs are never loaded whole"""
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        with buf:
+            yield from iter_cursor_sections(buf)
+
+
+def parse_cursor_output(text: str) -> dict:
+    """Extract structured fields from Cursor execution log (first task section)."""
+    record = next(iter_cursor_sections(text.encode("utf-8")), None) or _section_record({})
+    record.pop("task_id")
+    return record
+
+
+def build_proof_bundle(log_text: str, task_id: Optional[str] = None) -> dict:
     """Build AICOMPLYR proof bundle payload from log text."""
-    task_id = os.getenv("TASK_ID", "UNSET")
+    return bundle_from_section(parse_cursor_output(log_text), task_id)
+
+
+def bundle_from_section(section: dict, task_id: Optional[str] = None) -> dict:
+    """Proof bundle payload for one parsed task section; the section's own Task ID wins."""
+    section = dict(section)
+    task_id = section.pop("task_id", None) or task_id or os.getenv("TASK_ID", "UNSET")
     approval = os.getenv("APPROVER", "dev@localhost")
     tags = os.getenv("COMPLIANCE_TAGS", "dev-mode").split(",")
     tests_passed = os.getenv("TESTS_PASSED", "true").lower() == "true"
@@ -59,7 +176,7 @@ def build_proof_bundle(log_text: str) -> dict:
     return {
         "task_id": task_id,
         "execution_log": {
-            **parse_cursor_output(log_text),
+            **section,
             "compliance_tags": [t.strip() for t in tags if t.strip()],
             "tests_passed": tests_passed,
             "timestamp": datetime.datetime.now(datetime.UTC).isoformat().replace("+00:00", "Z"),
@@ -68,41 +185,340 @@ def build_proof_bundle(log_text: str) -> dict:
     }
 
 
+def bundles_from_file(path: str, task_id: Optional[str] = None) -> Iterator[dict]:
+    """One proof bundle per task section of the log at `path`, yielded as the log is read."""
+    for section in iter_log_sections(path):
+        yield bundle_from_section(section, task_id)
+
+
+# -- multi-file discovery and parsing ----------------------------------------
+
+def expand_log_paths(patterns: List[str]) -> List[str]:
+    """Files named by paths, directories (walked for *.log) and globs, de-duplicated in order"""
+    seen = set()
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "**", "*.log"), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen and (os.path.isfile(path) or not os.path.exists(path)):
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def parse_logs(paths: List[str], workers: int, errors: List[Tuple[str, str]]) -> Iterator[Tuple[str, dict]]:
+    """
+    (source, bundle) for every task section of the logs, as they are parsed (in a
+    process pool when there are several logs); unreadable logs are appended to `errors`
+    """
+    if len(paths) > 1 and workers > 1:
+        events = _pool_events(paths, workers)
+    else:
+        events = (event for path in paths for event in _parse_events(path, _default_task_id(path)))
+    return _number_events(events, errors)
+
+
+def _default_task_id(path: str) -> str:
+    return os.getenv("TASK_ID") or os.path.splitext(os.path.basename(path))[0]
+
+
+def _parse_events(path: str, task_id: Optional[str] = None):
+    """(path, bundle, None) per section, then (path, None, error or None) once the log is done"""
+    try:
+        for bundle in bundles_from_file(path, task_id):
+            yield path, bundle, None
+    except OSError as e:
+        yield path, None, str(e)
+        return
+    yield path, None, None
+
+
+_RESULTS = None  # the parent's bounded result queue, in each parser process
+
+
+def _init_parser(results) -> None:
+    global _RESULTS
+    _RESULTS = results
+
+
+def _parse_into_queue(path: str) -> None:
+    batch = []
+    for event in _parse_events(path, _default_task_id(path)):
+        batch.append(event)
+        if len(batch) >= PARSE_BATCH_SIZE:
+            _RESULTS.put(batch)
+            batch = []
+    if batch:
+        _RESULTS.put(batch)
+
+
+def _pool_events(paths: List[str], workers: int):
+    """_parse_events() of every log, from parser processes feeding one bounded queue"""
+    results = multiprocessing.Queue(maxsize=PARSE_QUEUE_SIZE)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_parser, initargs=(results,))
+    remaining = set(paths)
+    try:
+        futures = {pool.submit(_parse_into_queue, path): path for path in paths}
+        while remaining:
+            try:
+                batch = results.get(timeout=1)
+            except Empty:
+                # A parser that died (not an OSError) never reports its log as done
+                for future, path in futures.items():
+                    if path in remaining and future.done() and future.exception() is not None:
+                        remaining.discard(path)
+                        yield path, None, f"parser failed: {future.exception()!r}"
+                continue
+            for event in batch:
+                if event[1] is None:
+                    remaining.discard(event[0])
+                yield event
+    finally:
+        if remaining:
+            # Closed early: parsers may be blocked on the full queue forever, so stop them
+            # instead of waiting (ProcessPoolExecutor has no public way to kill its workers)
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=True, cancel_futures=True)
+        results.close()
+
+
+def _number_events(events, errors: List[Tuple[str, str]]) -> Iterator[Tuple[str, dict]]:
+    """(source, bundle) pairs; the source is the path, or path#n when a log has several sections"""
+    held = {}  # path -> (bundles seen, first bundle while it may be the only one)
+    for path, bundle, error in events:
+        count, first = held.get(path, (0, None))
+        if bundle is not None:
+            count += 1
+            if count == 1:
+                first = bundle
+            else:
+                if count == 2:
+                    yield f"{path}#1", first
+                    first = None
+                yield f"{path}#{count}", bundle
+            held[path] = (count, first)
+            continue
+        held.pop(path, None)
+        if count == 1:
+            yield path, first
+        if error:
+            warn(f"Could not read {path}: {error}")
+            errors.append((path, error))
+
+
+# -- spool of bundles that could not be delivered ----------------------------
+
+def spool_bundle(bundle: dict, spool_dir: str = SPOOL_DIR) -> str:
+    """Persist a bundle for the next run; the name is its content hash, so re-spooling is idempotent"""
+    data = json.dumps(bundle, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, hashlib.sha256(data).hexdigest() + ".json")
+    fd, tmp = tempfile.mkstemp(dir=spool_dir, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def load_spool(spool_dir: str = SPOOL_DIR) -> Iterator[Tuple[str, dict]]:
+    """(spool file, bundle) for every bundle left by earlier runs, read one at a time"""
+    if not os.path.isdir(spool_dir):
+        return
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith(".json") or name.startswith("."):
+            continue
+        path = os.path.join(spool_dir, name)
+        try:
+            with open(path, "rb") as f:
+                bundle = json.loads(f.read())
+        except (OSError, ValueError) as e:
+            warn(f"Skipping unreadable spool entry {path}: {e}")
+            continue
+        yield path, bundle
+
+
+def spool_items(spool_dir: str = SPOOL_DIR) -> Iterator[Tuple[str, dict, Optional[str]]]:
+    """load_spool() as upload_all() items"""
+    for path, bundle in load_spool(spool_dir):
+        yield f"spool:{os.path.basename(path)}", bundle, path
+
+
+# -- pooled upload with retries ----------------------------------------------
+
+def make_session(api_key: str, pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+    return session
+
+
+def _backoff(attempt: int, base: float, retry_after: Optional[str] = None) -> float:
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return base * (2 ** attempt) * (0.5 + random.random())
+
+
+def upload_bundle(session: requests.Session, bundle: dict, retries: int = 5, backoff: float = 0.5,
+                  timeout: float = 10) -> Tuple[str, str]:
+    """
+    POST one bundle, retrying transient failures.
+    Returns ("ok", bundle id), ("rejected", reason) for errors a retry cannot fix,
+    or ("retryable", reason) when retries ran out.
+    """
+    reason = ""
+    for attempt in range(retries + 1):
+        retry_after = None
+        try:
+            resp = session.post(API_URL, json=bundle, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            reason = f"{type(e).__name__}: {e}"
+        else:
+            if resp.status_code in (200, 201):
+                return "ok", resp.json().get("id", "")
+            reason = f"API error {resp.status_code}: {resp.text}"
+            if resp.status_code not in RETRYABLE_STATUS:
+                return "rejected", reason
+            retry_after = resp.headers.get("Retry-After")
+        if attempt < retries:
+            time.sleep(_backoff(attempt, backoff, retry_after))
+    return "retryable", reason
+
+
+def upload_all(api_key: str, items: Iterable[Tuple[str, dict, Optional[str]]], concurrency: int, retries: int,
+               backoff: float) -> dict:
+    """
+    Upload (source, bundle, spool file) items over one pooled session, consuming
+    `items` lazily (at most 2 x concurrency are held at once).
+    Delivered spool files are removed; undeliverable new bundles are spooled.
+    """
+    counts = {"ok": 0, "rejected": 0, "spooled": 0}
+    concurrency = max(concurrency, 1)
+    session = make_session(api_key, concurrency)
+
+    def one(item):
+        source, bundle, spool_path = item
+        status, detail = upload_bundle(session, bundle, retries=retries, backoff=backoff)
+        return source, bundle, spool_path, status, detail
+
+    def results(pool):
+        in_flight = deque()
+        for item in items:
+            in_flight.append(pool.submit(one, item))
+            if len(in_flight) >= 2 * concurrency:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    with session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for source, bundle, spool_path, status, detail in results(pool):
+            if status == "ok":
+                counts["ok"] += 1
+                print(f"OK {source} -> {detail}")
+                if spool_path:
+                    try:
+                        os.unlink(spool_path)
+                    except FileNotFoundError:
+                        pass  # drained by a concurrent run
+            elif status == "rejected":
+                counts["rejected"] += 1
+                warn(f"{source}: {detail}")
+            else:
+                counts["spooled"] += 1
+                path = spool_path or spool_bundle(bundle)
+                warn(f"{source}: {detail} (spooled to {path})")
+    return counts
+
+
+def main_multi(args, api_key: str, strict_upload: bool):
+    paths = expand_log_paths(args.logs)
+    parse_errors: List[Tuple[str, str]] = []
+    # Spooled bundles first, then each log's bundles as the parsers produce them
+    new_items = ((source, bundle, None) for source, bundle in parse_logs(paths, args.workers, parse_errors))
+    items = itertools.chain(spool_items(), new_items)
+
+    print(f">> Uploading {len(paths)} logs and any spooled bundles to {API_URL} "
+          f"(DEV_MODE={DEV_MODE}, concurrency={args.concurrency})")
+    started = time.perf_counter()
+    counts = upload_all(api_key, items, args.concurrency, args.retries, args.backoff)
+    elapsed = time.perf_counter() - started
+    if not any(counts.values()) and not parse_errors:
+        if strict_upload:
+            fail("No logs or spooled bundles to upload")
+        warn("No logs or spooled bundles to upload")
+        return
+    print(f">> Uploaded {counts['ok']}, rejected {counts['rejected']}, spooled {counts['spooled']}, "
+          f"unreadable {len(parse_errors)} in {elapsed:.2f}s")
+
+    if strict_upload and (counts["rejected"] or counts["spooled"]):
+        fail("Some proof bundles were not delivered")
+    if strict_upload and parse_errors:
+        fail(f"Could not read {len(parse_errors)} of {len(paths)} logs")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Upload Cursor execution logs to AICOMPLYR as proof bundles")
+    parser.add_argument("logs", nargs="*", help="log files, directories or globs (default: CURSOR_LOG_PATH)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel uploads over the pooled session")
+    parser.add_argument("--retries", type=int, default=5, help="retries per bundle for transient failures")
+    parser.add_argument("--backoff", type=float, default=0.5, help="base backoff in seconds (doubles per retry)")
+    args = parser.parse_args()
+
     strict_upload = os.getenv("AICOMPLYR_STRICT_UPLOAD", "false").lower() == "true"
     api_key = os.getenv("AICOMPLYR_API_KEY")
     if not api_key:
         fail("AICOMPLYR_API_KEY env var is required")
 
+    if args.logs:
+        main_multi(args, api_key, strict_upload)
+        return
+
     log_path = os.getenv("CURSOR_LOG_PATH", "cursor_output.log")
     if not os.path.exists(log_path):
         fail(f"Log file not found: {log_path}")
 
-    with open(log_path, "r", encoding="utf-8") as f:
-        log_text = f.read()
+    print(f">> Uploading to {API_URL} (DEV_MODE={DEV_MODE})")
 
-    payload = build_proof_bundle(log_text)
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    def payloads():
+        # One bundle per task section; a log without recognised fields still yields one (empty) bundle
+        parse_errors: List[Tuple[str, str]] = []
+        sent = 0
+        for source, payload in _number_events(_parse_events(log_path), parse_errors):
+            sent += 1
+            print(f">> Payload: {json.dumps(payload, indent=2)}")
+            yield source, payload, None
+        if parse_errors:
+            fail(f"Could not read {log_path}: {parse_errors[0][1]}")
+        if not sent:
+            payload = build_proof_bundle("")
+            print(f">> Payload: {json.dumps(payload, indent=2)}")
+            yield log_path, payload, None
 
-    print(f">> Uploading to {API_URL} (DEV_MODE={DEV_MODE})")
-    print(f">> Payload: {json.dumps(payload, indent=2)}")
+    # Deliver anything earlier runs could not, then this log
+    items = itertools.chain(spool_items(), payloads())
+    counts = upload_all(api_key, items, args.concurrency, args.retries, args.backoff)
+    if not counts["rejected"] and not counts["spooled"]:
+        print(f"SUCCESS: {counts['ok']} proof bundle(s) stored")
+        return
 
-    try:
-        resp = requests.post(API_URL, headers=headers, json=payload, timeout=10)
-        if resp.status_code == 201:
-            print("SUCCESS:", json.dumps(resp.json(), indent=2))
-        else:
-            msg = f"API error {resp.status_code}: {resp.text}"
-            if strict_upload:
-                fail(msg)
-            warn(msg)
-            sys.exit(0)
-    except requests.exceptions.ConnectionError:
-        msg = "Connection failed. Is the local server running? Start with: uvicorn aicomplyr_server:app --reload"
-        if strict_upload:
-            fail(msg)
-        warn(msg)
-        sys.exit(0)
+    msg = ("Connection failed or server unavailable; undelivered bundles are spooled in "
+           f"{SPOOL_DIR} for the next run. Is the local server running? "
+           "Start with: uvicorn aicomplyr_server:app --reload") if counts["spooled"] else "Proof bundle rejected"
+    if strict_upload:
+        fail(msg)
+    warn(msg)
+    sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming Cursor log parser against the original read-everything parser.
+
+Generates synthetic logs of increasing size (task sections padded with noise
+lines) and reports, for each parser, wall time, throughput, Python heap peak
+(tracemalloc) and how many task sections it recovered. The original parser
+loads the whole file and keeps only the first section; the streaming parser
+memory-maps the file and should stay flat in memory while finding them all.
+
+Examples:
+  python scripts/bench_cursor_log_parser.py
+  python scripts/bench_cursor_log_parser.py --max-mb 2048
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aicomplyr_upload import iter_log_sections  # noqa: E402
+
+SIZES_MB = [1, 16, 128, 512, 2048]
+NOISE = b"[agent] step completed; tokens=1024 latency_ms=87 tool=edit_file path=src/app/module.py\n"
+
+
+def legacy_parse(path: str) -> list:
+    """The parser as it was: f.read() plus one re.search per field, first occurrence only"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    def g(rx):
+        m = re.search(rx, text, re.IGNORECASE | re.MULTILINE)
+        return m.group(1).strip() if m else None
+
+    files = g(r"Files touched:? (.+)")
+    return [{
+        "what": g(r"What was changed:? (.+)"),
+        "why": g(r"Why it was changed:? (.+)"),
+        "files": [f.strip() for f in files.split(",")] if files else [],
+        "status": g(r"Status:? (.+)"),
+    }]
+
+
+def streaming_parse(path: str) -> list:
+    # Count sections without keeping them, as the uploader's per-bundle consumer would
+    return [None for _ in iter_log_sections(path)]
+
+
+def write_log(path: str, size_mb: int) -> int:
+    """Write ~size_mb of log with a task section every 64 noise lines; returns the section count"""
+    target = size_mb * 1024 * 1024
+    written = sections = 0
+    with open(path, "wb") as f:
+        while written < target:
+            sections += 1
+            block = (
+                f"Task ID: TASK-{sections}\n"
+                f"What was changed: Refactored handler {sections}\n"
+                f"Why it was changed: Ticket {sections}\n"
+                f"Files touched: src/a{sections}.py, src/b{sections}.py\n"
+                f"Status: done\n"
+            ).encode("utf-8") + NOISE * 64
+            f.write(block)
+            written += len(block)
+    return sections
+
+
+def measure(parse, path: str):
+    """(seconds, heap peak bytes, sections found); tracing is a separate run so it does not skew the timing"""
+    start = time.perf_counter()
+    found = len(parse(path))
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    parse(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-mb", type=int, default=512, help="largest log to generate, in MiB")
+    parser.add_argument("--skip-legacy-over", type=int, default=512,
+                        help="skip the legacy parser above this size (it loads the whole file)")
+    args = parser.parse_args()
+
+    print(f"{'log MiB':>8}  {'parser':>9}  {'seconds':>8}  {'MiB/s':>8}  {'heap peak MiB':>13}  {'sections':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cursor_output.log")
+        for size_mb in [s for s in SIZES_MB if s <= args.max_mb]:
+            expected = write_log(path, size_mb)
+            runs = [("streaming", streaming_parse)]
+            if size_mb <= args.skip_legacy_over:
+                runs.insert(0, ("legacy", legacy_parse))
+            for name, parse in runs:
+                seconds, peak, found = measure(parse, path)
+                print(f"{size_mb:>8}  {name:>9}  {seconds:>8.2f}  {size_mb / seconds:>8.1f}  "
+                      f"{peak / 2**20:>13.1f}  {found:>5}/{expected:<6}")
+
+
+if __name__ == "__main__":
+    main()
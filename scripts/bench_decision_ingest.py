@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Compare governance decision ingest throughput across the API's write paths:
+
+  single   one POST /api/governance-decision per record
+  batch    POST /api/governance-decisions/batch with JSON arrays
+  ndjson   POST /api/governance-decisions/stream with an NDJSON body
+  gzip     the same NDJSON body with Content-Encoding: gzip
+
+Runs in-process against main.app through FastAPI's TestClient, so numbers
+reflect parsing, validation and storage cost rather than network latency.
+
+Examples:
+  python scripts/bench_decision_ingest.py
+  python scripts/bench_decision_ingest.py --records 50000 --batch-size 5000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+def synthetic_decisions(count: int) -> list:
+    rng = random.Random(count)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "decision_type": rng.choice(["approve", "flag", "modify", "escalate"]),
+            "ai_tool_used": rng.choice(["cursor", "claude-3.5", "midjourney", "chatgpt"]),
+            "regulatory_citation": rng.choice(["FDA 21 CFR 11.10(a)", "EMA GCP ICH E6 5.1.3", "ISO 27001 A.12.6.1"]),
+            "human_override": rng.random() < 0.2,
+            "compliance_score": rng.uniform(0.85, 1.0),
+            "anonymized_context": "Benchmark decision for ingest throughput",
+            "regulatory_framework": rng.choice(["FDA_21_CFR_11", "EMA_GCP", "ICH_E6", "ISO_27001"]),
+            "agency_relationship": rng.choice(["internal", "external_partner", "client_work"]),
+            "timestamp": (now - timedelta(seconds=count - i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def run_single(client: TestClient, records: list, _batch_size: int) -> None:
+    for record in records:
+        resp = client.post("/api/governance-decision", json=record)
+        resp.raise_for_status()
+
+
+def run_batch(client: TestClient, records: list, batch_size: int) -> None:
+    for start in range(0, len(records), batch_size):
+        resp = client.post("/api/governance-decisions/batch", json=records[start:start + batch_size])
+        resp.raise_for_status()
+
+
+def _ndjson(records: list) -> bytes:
+    return b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in records)
+
+
+def run_ndjson(client: TestClient, records: list, _batch_size: int) -> None:
+    resp = client.post(
+        "/api/governance-decisions/stream",
+        content=_ndjson(records),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    resp.raise_for_status()
+
+
+def run_gzip(client: TestClient, records: list, _batch_size: int) -> None:
+    resp = client.post(
+        "/api/governance-decisions/stream",
+        content=gzip.compress(_ndjson(records)),
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+    )
+    resp.raise_for_status()
+
+
+MODES = {"single": run_single, "batch": run_batch, "ndjson": run_ndjson, "gzip": run_gzip}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10_000, help="decisions per mode")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="records per /batch request")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of: " + ", ".join(MODES))
+    args = parser.parse_args()
+
+    records = synthetic_decisions(args.records)
+    client = TestClient(app)
+
+    baseline = None
+    print(f"{'mode':>8}  {'records':>9}  {'seconds':>8}  {'records/s':>11}  {'vs single':>9}")
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        start = time.perf_counter()
+        MODES[mode](client, records, args.batch_size)
+        elapsed = time.perf_counter() - start
+        rate = len(records) / elapsed
+        if mode == "single":
+            baseline = rate
+        speedup = f"{rate / baseline:>8.1f}x" if baseline else f"{'-':>9}"
+        print(f"{mode:>8}  {len(records):>9,}  {elapsed:>8.2f}  {rate:>11,.0f}  {speedup}")
+
+
+if __name__ == "__main__":
+    main()
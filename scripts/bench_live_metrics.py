@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/live-metrics latency against decision history size.
+
+Runs in-process against main.app through FastAPI's TestClient, so each call
+pays for routing, the response cache, rendering and serialisation, not just
+the aggregation. Three request shapes are timed per store size:
+
+  changed   one new decision before every GET, so each response is rendered afresh
+  cached    repeated GETs with no new decisions (cached body, 200)
+  304       the same GETs sent with If-None-Match: <last ETag>
+
+Decisions are appended to the router's store directly (unvalidated), which
+keeps filling 10M rows practical; the timed calls only go through HTTP.
+The running aggregates should keep every column flat as the store grows.
+
+Examples:
+  python scripts/bench_live_metrics.py
+  python scripts/bench_live_metrics.py --max 10000000 --calls 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from api.live_metrics import STORE  # noqa: E402
+from main import app  # noqa: E402
+from models.governance_decision import GovernanceDecision  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+CITATIONS = [
+    "FDA 21 CFR 11.10(a)",
+    "FDA 21 CFR 11.10(b)",
+    "EMA GCP ICH E6 5.1.3",
+    "ISO 27001 A.12.6.1",
+    "FDA 21 CFR 820.70(i)",
+]
+FILL_BATCH = 10_000
+URL = "/api/live-metrics"
+
+
+def synthetic_decisions(count: int, now: datetime, seed: int):
+    """`count` decisions spread over the last week, built without validation"""
+    rng = random.Random(seed)
+    # A small pool of timestamps keeps generation cheap at 10M rows
+    stamps = [now - timedelta(minutes=rng.randint(1, 10080)) for _ in range(4096)]
+    for i in range(count):
+        yield GovernanceDecision.model_construct(
+            id=f"bench-{seed}-{i}",
+            timestamp=stamps[i & 4095],
+            decision_type="approve",
+            ai_tool_used="cursor",
+            regulatory_citation=CITATIONS[i % len(CITATIONS)],
+            human_override=bool(i & 1),
+            compliance_score=0.85 + (i % 16) / 100,
+            anonymized_context="Benchmark decision for live-metrics latency",
+            regulatory_framework="FDA_21_CFR_11",
+            pharma_context=True,
+            agency_relationship="internal",
+            public_facing_impact=False,
+            decision_time=0.5 + (i % 40) / 10,
+        )
+
+
+def fill(count: int, now: datetime, seed: int) -> None:
+    batch = []
+    for decision in synthetic_decisions(count, now, seed):
+        batch.append(decision)
+        if len(batch) == FILL_BATCH:
+            STORE.append_many(batch)
+            batch = []
+    STORE.append_many(batch)
+
+
+def _timed_get(client: TestClient, headers: dict, expected: int) -> float:
+    start = time.perf_counter()
+    resp = client.get(URL, headers=headers)
+    elapsed = time.perf_counter() - start
+    if resp.status_code != expected:
+        raise RuntimeError(f"GET {URL} answered {resp.status_code}, expected {expected}")
+    return elapsed
+
+
+def time_changed(client: TestClient, calls: int, now: datetime) -> float:
+    """Mean microseconds per GET when a decision lands before every call"""
+    total = 0.0
+    for decision in synthetic_decisions(calls, now, seed=-len(STORE)):
+        STORE.append(decision)
+        total += _timed_get(client, {}, 200)
+    return total / calls * 1e6
+
+
+def time_unchanged(client: TestClient, calls: int, conditional: bool) -> float:
+    """Mean microseconds per GET of an unchanged store, optionally revalidating its ETag"""
+    etag = client.get(URL).headers["etag"]
+    headers = {"If-None-Match": etag} if conditional else {}
+    expected = 304 if conditional else 200
+    return sum(_timed_get(client, headers, expected) for _ in range(calls)) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max", type=int, default=1_000_000, help="largest store size to benchmark")
+    parser.add_argument("--calls", type=int, default=2_000, help="GET requests per size and request shape")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    client = TestClient(app)
+
+    print(f"{'decisions':>12}  {'fill (s)':>9}  {'changed (us)':>12}  {'cached (us)':>11}  {'304 (us)':>9}")
+    for size in [s for s in SIZES if s <= args.max]:
+        # Grow the same store so each size only pays for the delta
+        start = time.perf_counter()
+        fill(max(size - len(STORE), 0), now, seed=size)
+        fill_seconds = time.perf_counter() - start
+
+        changed = time_changed(client, args.calls, now)
+        cached = time_unchanged(client, args.calls, conditional=False)
+        revalidated = time_unchanged(client, args.calls, conditional=True)
+        print(f"{len(STORE):>12,}  {fill_seconds:>9.2f}  {changed:>12.1f}  {cached:>11.1f}  {revalidated:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+-- ================================
+-- ATOMIC CLAIMING OF AGENT TASK REQUESTS
+-- ================================
+-- Migration: 20260110000000
+-- Description: Let worker replicas claim pending tasks without double-processing them.
+-- claim_agent_task_requests() flips up to p_limit pending rows to 'processing' in one
+-- statement and returns only the rows this caller won. FOR UPDATE SKIP LOCKED makes
+-- concurrent callers take disjoint rows instead of queueing behind each other.
+
+-- Oldest-first scan over just the pending rows
+CREATE INDEX IF NOT EXISTS idx_agent_task_requests_pending_created_at
+    ON public.agent_task_requests(created_at)
+    WHERE status = 'pending';
+
+CREATE OR REPLACE FUNCTION public.claim_agent_task_requests(p_limit INTEGER DEFAULT 1)
+RETURNS SETOF public.agent_task_requests
+LANGUAGE sql
+AS $$
+    UPDATE public.agent_task_requests AS t
+    SET status = 'processing'
+    WHERE t.id IN (
+        SELECT id
+        FROM public.agent_task_requests
+        WHERE status = 'pending'
+        ORDER BY created_at
+        LIMIT GREATEST(p_limit, 0)
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING t.*;
+$$;
+
+-- Only the worker (service role) may claim tasks
+REVOKE ALL ON FUNCTION public.claim_agent_task_requests(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_agent_task_requests(INTEGER) TO service_role;
+
+COMMENT ON FUNCTION public.claim_agent_task_requests(INTEGER) IS 'Atomically move up to p_limit oldest pending agent tasks to processing and return them';
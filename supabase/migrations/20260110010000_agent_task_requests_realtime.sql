@@ -0,0 +1,19 @@
+-- ================================
+-- REALTIME FOR AGENT TASK REQUESTS
+-- ================================
+-- Migration: 20260110010000
+-- Description: Publish agent_task_requests changes over Supabase Realtime.
+-- The worker subscribes to INSERTs to pick up new tasks without polling, and the
+-- frontend (AgentTaskService) subscribes to UPDATEs to follow a task to completion.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_publication_tables
+        WHERE pubname = 'supabase_realtime'
+          AND schemaname = 'public'
+          AND tablename = 'agent_task_requests'
+    ) THEN
+        ALTER PUBLICATION supabase_realtime ADD TABLE public.agent_task_requests;
+    END IF;
+END $$;
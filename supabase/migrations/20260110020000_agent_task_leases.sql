@@ -0,0 +1,113 @@
+-- ================================
+-- LEASED OWNERSHIP OF AGENT TASK REQUESTS
+-- ================================
+-- Migration: 20260110020000
+-- Description: Recover tasks from workers that die mid-task.
+-- A claim now records the worker and a lease expiry and counts the attempt.
+-- Running workers extend their leases with heartbeats; reap_expired_agent_task_requests()
+-- returns tasks whose lease ran out to 'pending', or fails them (dead letter) once
+-- they have used up their attempts.
+
+ALTER TABLE public.agent_task_requests
+    ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS dead_lettered_at TIMESTAMPTZ;
+
+-- Reaper scan: processing rows ordered by lease expiry
+CREATE INDEX IF NOT EXISTS idx_agent_task_requests_processing_lease
+    ON public.agent_task_requests(lease_expires_at)
+    WHERE status = 'processing';
+
+COMMENT ON COLUMN public.agent_task_requests.claimed_by IS 'Worker currently holding the task lease';
+COMMENT ON COLUMN public.agent_task_requests.lease_expires_at IS 'When the claim lapses unless the worker heartbeats';
+COMMENT ON COLUMN public.agent_task_requests.attempts IS 'Number of times the task has been claimed';
+COMMENT ON COLUMN public.agent_task_requests.dead_lettered_at IS 'Set when the task was failed after exhausting its attempts';
+
+-- The claim function gains the worker id and lease length
+DROP FUNCTION IF EXISTS public.claim_agent_task_requests(INTEGER);
+
+CREATE OR REPLACE FUNCTION public.claim_agent_task_requests(
+    p_limit INTEGER DEFAULT 1,
+    p_worker_id TEXT DEFAULT NULL,
+    p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS SETOF public.agent_task_requests
+LANGUAGE sql
+AS $$
+    UPDATE public.agent_task_requests AS t
+    SET status = 'processing',
+        claimed_by = p_worker_id,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        attempts = t.attempts + 1
+    WHERE t.id IN (
+        SELECT id
+        FROM public.agent_task_requests
+        WHERE status = 'pending'
+        ORDER BY created_at
+        LIMIT GREATEST(p_limit, 0)
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING t.*;
+$$;
+
+-- Heartbeat: extend the leases this worker still holds; returns the ids it still owns
+CREATE OR REPLACE FUNCTION public.extend_agent_task_leases(
+    p_task_ids UUID[],
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS SETOF UUID
+LANGUAGE sql
+AS $$
+    UPDATE public.agent_task_requests
+    SET lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE id = ANY(p_task_ids)
+      AND status = 'processing'
+      AND claimed_by = p_worker_id
+    RETURNING id;
+$$;
+
+-- Reaper: requeue expired leases, dead-letter tasks that used up p_max_attempts.
+-- Rows claimed before leases existed have no expiry; they count as expired after p_legacy_timeout_seconds.
+CREATE OR REPLACE FUNCTION public.reap_expired_agent_task_requests(
+    p_max_attempts INTEGER DEFAULT 5,
+    p_legacy_timeout_seconds INTEGER DEFAULT 300
+)
+RETURNS TABLE (id UUID, status VARCHAR, attempts INTEGER)
+LANGUAGE sql
+AS $$
+    UPDATE public.agent_task_requests AS t
+    SET status = CASE WHEN t.attempts >= p_max_attempts THEN 'failed' ELSE 'pending' END,
+        response_payload = CASE
+            WHEN t.attempts >= p_max_attempts THEN jsonb_build_object(
+                'error', format('Task lease expired after %s attempt(s); moved to dead letter', t.attempts),
+                'dead_letter', true,
+                'last_worker', t.claimed_by
+            )
+            ELSE t.response_payload
+        END,
+        dead_lettered_at = CASE WHEN t.attempts >= p_max_attempts THEN NOW() ELSE NULL END,
+        claimed_by = NULL,
+        lease_expires_at = NULL
+    WHERE t.id IN (
+        SELECT r.id
+        FROM public.agent_task_requests r
+        WHERE r.status = 'processing'
+          AND COALESCE(r.lease_expires_at, r.updated_at + make_interval(secs => p_legacy_timeout_seconds)) < NOW()
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING t.id, t.status, t.attempts;
+$$;
+
+-- Only the worker (service role) may claim, heartbeat and reap
+REVOKE ALL ON FUNCTION public.claim_agent_task_requests(INTEGER, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.extend_agent_task_leases(UUID[], TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.reap_expired_agent_task_requests(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_agent_task_requests(INTEGER, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.extend_agent_task_leases(UUID[], TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.reap_expired_agent_task_requests(INTEGER, INTEGER) TO service_role;
+
+COMMENT ON FUNCTION public.claim_agent_task_requests(INTEGER, TEXT, INTEGER) IS 'Atomically lease up to p_limit oldest pending agent tasks to p_worker_id and return them';
+COMMENT ON FUNCTION public.extend_agent_task_leases(UUID[], TEXT, INTEGER) IS 'Heartbeat: extend the leases p_worker_id still holds and return those task ids';
+COMMENT ON FUNCTION public.reap_expired_agent_task_requests(INTEGER, INTEGER) IS 'Requeue processing tasks with expired leases; dead-letter those out of attempts';
@@ -0,0 +1,34 @@
+-- ================================
+-- BULK COMPLETION OF AGENT TASK REQUESTS
+-- ================================
+-- Migration: 20260110030000
+-- Description: Let a worker store many task results in one round trip.
+-- complete_agent_task_requests() applies a JSON array of
+-- {id, status, response_payload} results in one statement, only to rows that are
+-- still 'processing' under p_worker_id's lease, and returns the ids it stored.
+-- Results for tasks whose lease was lost are dropped, as with per-row updates.
+
+CREATE OR REPLACE FUNCTION public.complete_agent_task_requests(
+    p_worker_id TEXT,
+    p_results JSONB
+)
+RETURNS SETOF UUID
+LANGUAGE sql
+AS $$
+    UPDATE public.agent_task_requests AS t
+    SET status = r.status,
+        response_payload = r.response_payload,
+        lease_expires_at = NULL
+    FROM jsonb_to_recordset(p_results) AS r(id UUID, status VARCHAR, response_payload JSONB)
+    WHERE t.id = r.id
+      AND r.status IN ('completed', 'failed')
+      AND t.status = 'processing'
+      AND t.claimed_by IS NOT DISTINCT FROM p_worker_id
+    RETURNING t.id;
+$$;
+
+-- Only the worker (service role) may store results
+REVOKE ALL ON FUNCTION public.complete_agent_task_requests(TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.complete_agent_task_requests(TEXT, JSONB) TO service_role;
+
+COMMENT ON FUNCTION public.complete_agent_task_requests(TEXT, JSONB) IS 'Store a batch of task results for tasks p_worker_id still holds and return the stored ids';
@@ -0,0 +1,114 @@
+-- ================================
+-- AGENT TASK STATUS SUMMARY
+-- ================================
+-- Migration: 20260110040000
+-- Description: Cheap worker health checks on large task tables.
+-- agent_task_status_summary() returns one row per status with server-side counts
+-- and age/duration percentiles, so check-worker-status.py never pulls rows or
+-- payloads to count them:
+--   pending/processing: exact counts and age percentiles (small sets, partial indexes)
+--   completed/failed:   totals from the planner's statistics unless p_exact_totals,
+--                       plus exact counts and end-to-end percentiles (created_at -> updated_at, so queue
+--                       wait included) for the last p_window_seconds
+-- The updated_at index serves that window and the --watch mode's incremental fetches.
+
+CREATE INDEX IF NOT EXISTS idx_agent_task_requests_updated_at
+    ON public.agent_task_requests(updated_at);
+
+-- Dropped first: CREATE OR REPLACE cannot change the columns an earlier version returned
+DROP FUNCTION IF EXISTS public.agent_task_status_summary(INTEGER, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION public.agent_task_status_summary(
+    p_window_seconds INTEGER DEFAULT 3600,
+    p_exact_totals BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    status VARCHAR,
+    task_count BIGINT,
+    count_is_estimate BOOLEAN,
+    age_p50_seconds DOUBLE PRECISION,
+    age_p95_seconds DOUBLE PRECISION,
+    age_max_seconds DOUBLE PRECISION,
+    expired_leases BIGINT,
+    recent_count BIGINT,
+    end_to_end_p50_seconds DOUBLE PRECISION,
+    end_to_end_p95_seconds DOUBLE PRECISION,
+    end_to_end_p99_seconds DOUBLE PRECISION,
+    last_updated_at TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_rows DOUBLE PRECISION;
+BEGIN
+    IF NOT p_exact_totals THEN
+        SELECT c.reltuples INTO v_rows
+        FROM pg_class c
+        WHERE c.oid = 'public.agent_task_requests'::regclass;
+    END IF;
+
+    RETURN QUERY
+    WITH open_tasks AS (
+        SELECT t.status,
+               COUNT(*) AS task_count,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM NOW() - t.created_at)) AS age_p50,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM NOW() - t.created_at)) AS age_p95,
+               MAX(EXTRACT(EPOCH FROM NOW() - t.created_at))::DOUBLE PRECISION AS age_max,
+               COUNT(*) FILTER (WHERE t.lease_expires_at < NOW()) AS expired_leases
+        FROM public.agent_task_requests t
+        WHERE t.status IN ('pending', 'processing')
+        GROUP BY t.status
+    ),
+    recent AS (
+        SELECT t.status,
+               COUNT(*) AS recent_count,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM t.updated_at - t.created_at)) AS end_to_end_p50,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM t.updated_at - t.created_at)) AS end_to_end_p95,
+               percentile_cont(0.99) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM t.updated_at - t.created_at)) AS end_to_end_p99,
+               MAX(t.updated_at) AS last_updated_at
+        FROM public.agent_task_requests t
+        WHERE t.updated_at >= NOW() - make_interval(secs => p_window_seconds)
+          AND t.status IN ('completed', 'failed')
+        GROUP BY t.status
+    ),
+    -- Share of each status in the planner's sample; NULL until the table has been analyzed
+    estimated AS (
+        SELECT v.val AS status, v.freq
+        FROM pg_stats s,
+             LATERAL unnest(s.most_common_vals::TEXT::TEXT[], s.most_common_freqs) AS v(val, freq)
+        WHERE s.schemaname = 'public' AND s.tablename = 'agent_task_requests' AND s.attname = 'status'
+    ),
+    statuses(status) AS (
+        VALUES ('pending'::VARCHAR), ('processing'), ('completed'), ('failed')
+    )
+    SELECT s.status,
+           CASE
+               WHEN o.status IS NOT NULL THEN o.task_count
+               WHEN s.status IN ('pending', 'processing') THEN 0::BIGINT
+               WHEN NOT p_exact_totals AND v_rows > 0 AND e.freq IS NOT NULL THEN ROUND(v_rows * e.freq)::BIGINT
+               ELSE (SELECT COUNT(*) FROM public.agent_task_requests x WHERE x.status = s.status)
+           END,
+           (o.status IS NULL AND s.status IN ('completed', 'failed')
+               AND NOT p_exact_totals AND v_rows > 0 AND e.freq IS NOT NULL),
+           o.age_p50,
+           o.age_p95,
+           o.age_max,
+           o.expired_leases,
+           COALESCE(r.recent_count, 0),
+           r.end_to_end_p50,
+           r.end_to_end_p95,
+           r.end_to_end_p99,
+           r.last_updated_at
+    FROM statuses s
+    LEFT JOIN open_tasks o ON o.status = s.status
+    LEFT JOIN recent r ON r.status = s.status
+    LEFT JOIN estimated e ON e.status = s.status;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.agent_task_status_summary(INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.agent_task_status_summary(INTEGER, BOOLEAN) TO service_role;
+
+COMMENT ON FUNCTION public.agent_task_status_summary(INTEGER, BOOLEAN) IS 'Per-status task counts, open-task age percentiles and recent end-to-end percentiles for worker status checks';
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The FastAPI apps and their modules live at the repository root
+sys.path.insert(0, ROOT)
+# Scripts import each other as top-level modules, as they do when run directly
+sys.path.insert(1, os.path.join(ROOT, "scripts"))
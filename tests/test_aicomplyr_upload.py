@@ -0,0 +1,47 @@
+import argparse
+import threading
+
+import pytest
+
+import aicomplyr_upload
+from aicomplyr_upload import main_multi, parse_logs
+
+
+def _write_logs(directory, count, sections):
+    paths = []
+    for n in range(count):
+        path = directory / f"log{n}.log"
+        path.write_text("".join(f"Task ID: T-{n}-{i}\nStatus: done\n" for i in range(sections)))
+        paths.append(str(path))
+    return paths
+
+
+def test_closing_parse_logs_early_stops_the_parser_pool(tmp_path, monkeypatch):
+    # Enough sections that the parsers fill the bounded queue and block on it
+    monkeypatch.setattr(aicomplyr_upload, "PARSE_QUEUE_SIZE", 2)
+    paths = _write_logs(tmp_path, 4, 2000)
+    errors = []
+
+    def consume_one():
+        events = parse_logs(paths, 2, errors)
+        next(events)
+        events.close()
+
+    consumer = threading.Thread(target=consume_one, daemon=True)
+    consumer.start()
+    consumer.join(timeout=60)
+    assert not consumer.is_alive()
+    assert errors == []
+
+
+def test_unreadable_logs_are_reported_not_missing(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    args = argparse.Namespace(logs=["missing-a.log", "missing-b.log"], workers=1, concurrency=1, retries=0, backoff=0)
+
+    with pytest.raises(SystemExit):
+        main_multi(args, "key", strict_upload=True)
+
+    err = capsys.readouterr().err
+    assert "No logs" not in err
+    assert "Could not read missing-a.log" in err
+    assert "Could not read 2 of 2 logs" in err
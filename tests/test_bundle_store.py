@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+import aicomplyr_bundle_store
+from aicomplyr_bundle_store import ProofBundleStore
+
+
+@pytest.fixture
+def barriers(monkeypatch):
+    calls = {"fsync": 0, "syncfs": 0}
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        calls["fsync"] += 1
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    if aicomplyr_bundle_store._SYNCFS is not None:
+        real_syncfs = aicomplyr_bundle_store._SYNCFS
+
+        def syncfs(fd):
+            calls["syncfs"] += 1
+            return real_syncfs(fd)
+
+        monkeypatch.setattr(aicomplyr_bundle_store, "_SYNCFS", syncfs)
+    return calls
+
+
+def test_put_many_uses_two_barriers_per_batch(tmp_path, barriers):
+    if aicomplyr_bundle_store._SYNCFS is None:
+        pytest.skip("syncfs(2) is Linux only")
+    store = ProofBundleStore(str(tmp_path))
+    results = asyncio.run(store.put_many([{"n": i} for i in range(200)] + [{"n": 0}]))
+    store.close()
+
+    assert [created for _, created in results] == [True] * 200 + [False]
+    assert barriers == {"fsync": 0, "syncfs": 2}
+    assert sorted(store.iter_ids()) == sorted(digest for digest, _ in results[:200])
+
+
+def test_put_during_put_many_is_a_duplicate(tmp_path):
+    store = ProofBundleStore(str(tmp_path))
+
+    async def race():
+        batch = asyncio.ensure_future(store.put_many([{"n": i} for i in range(50)]))
+        await asyncio.sleep(0)  # let put_many register its writes
+        single = await store.put({"n": 7})
+        return await batch, single
+
+    batch, (digest, created) = asyncio.run(race())
+    store.close()
+
+    assert created is False
+    assert dict(batch)[digest] is True
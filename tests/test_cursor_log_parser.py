@@ -0,0 +1,49 @@
+import pytest
+
+from aicomplyr_upload import iter_cursor_sections, parse_cursor_output
+
+
+def _record(task_id=None, what=None, why=None, files=(), status=None) -> dict:
+    return {"task_id": task_id, "what": what, "why": why, "files": list(files), "status": status}
+
+
+# (name, log, expected sections): field markers only count at the start of a line, with or
+# without a colon, and only a Task ID line starts a new section
+CASES = [
+    (
+        "marker words inside a line",
+        b"Task ID: T-1\nWhat was changed: Parser\nFiles touched: a.py, b.py\n"
+        b"Running tests... checking status of build\nStatus: completed\n",
+        [_record("T-1", "Parser", files=["a.py", "b.py"], status="completed")],
+    ),
+    (
+        "repeated field overwrites",
+        b"Status: running\nnoise\nStatus: done\n",
+        [_record(status="done")],
+    ),
+    (
+        "Task ID lines split sections",
+        b"Task ID: A\nStatus: ok\n  Task ID: B\r\nstatus: failed\nmentions Task ID: C mid-line\n",
+        [_record("A", status="ok"), _record("B", status="failed")],
+    ),
+    (
+        "colon is optional",
+        b"Task ID T-2\nWhat was changed Parser\nWhy it was changed\tflaky\nFiles touched a.py\nStatus done\n",
+        [_record("T-2", "Parser", "flaky", ["a.py"], "done")],
+    ),
+    (
+        "marker must end at a separator",
+        b"Statuses: many\nStatus:done\n",
+        [_record(status="done")],
+    ),
+]
+
+
+@pytest.mark.parametrize("log, expected", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_iter_cursor_sections(log, expected):
+    assert list(iter_cursor_sections(log)) == expected
+
+
+def test_parse_cursor_output_matches_baseline_format():
+    text = "What was changed: Parser\nWhy it was changed: speed\nFiles touched: a.py, b.py\nStatus done\n"
+    assert parse_cursor_output(text) == {"what": "Parser", "why": "speed", "files": ["a.py", "b.py"], "status": "done"}
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from api.decision_backends import InProcessBackend, SQLiteBackend
+from api.decision_store import CATEGORICAL_FIELDS
+from models.governance_decision import GovernanceDecision
+
+
+def _decisions(n, seed=7):
+    rng = random.Random(seed)
+    return [
+        GovernanceDecision(
+            decision_type=rng.choice(["approve", "flag", "modify", "escalate"]),
+            ai_tool_used=rng.choice(["cursor", "claude-3.5", "midjourney"]),
+            regulatory_citation=f"FDA 21 CFR 11.{rng.randrange(12)}",
+            human_override=rng.random() < 0.2,
+            compliance_score=rng.choice([0.5, 0.7, 0.85, 0.95, rng.random()]),
+            anonymized_context="ctx",
+            regulatory_framework=rng.choice(["FDA_21_CFR_11", "EMA_GCP", "ICH_E6"]),
+            agency_relationship=rng.choice(["internal", "external_partner", "client_work"]),
+        )
+        for _ in range(n)
+    ]
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "decisions.db"))
+    backend.startup()
+    yield backend
+    backend.shutdown()
+
+
+@pytest.mark.parametrize("field", CATEGORICAL_FIELDS)
+def test_sqlite_breakdown_matches_in_process(sqlite_backend, field):
+    decisions = _decisions(500)
+    memory = InProcessBackend()
+    memory.append_many(decisions)
+    for start in range(0, len(decisions), 64):
+        sqlite_backend.append_many(decisions[start:start + 64])
+
+    assert sqlite_backend.breakdown(field) == memory.breakdown(field)
+
+
+def test_sqlite_breakdown_does_not_scan_decisions(sqlite_backend):
+    sqlite_backend.append_many(_decisions(50))
+    statements = []
+    sqlite_backend.conn.set_trace_callback(statements.append)
+
+    sqlite_backend.breakdown("regulatory_framework")
+
+    assert statements and not any("FROM decisions" in sql for sql in statements)
+
+
+@pytest.mark.parametrize("score", [0.95, 0.9499999999, 0.1234567891])
+def test_in_process_scores_agree_with_metrics_and_read_back_exactly(score):
+    backend = InProcessBackend()
+    decision = _decisions(1)[0].copy(update={"compliance_score": score})
+    backend.append(decision)
+
+    live_rate = backend.live_metrics()["compliance_rate"]
+    assert backend.breakdown("regulatory_framework")[decision.regulatory_framework]["compliance_rate"] == live_rate
+    assert backend.store.compliance_rate() == live_rate
+    assert backend.recent(1)[0].compliance_score == score
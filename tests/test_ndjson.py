@@ -0,0 +1,77 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.ndjson import NDJSONError, iter_ndjson_lines
+
+
+def _decision(n):
+    return {
+        "decision_type": "approve",
+        "ai_tool_used": "cursor",
+        "regulatory_citation": "FDA 21 CFR 11.10(a)",
+        "compliance_score": 0.9,
+        "anonymized_context": f"record {n}",
+        "regulatory_framework": "FDA_21_CFR_11",
+        "agency_relationship": "internal",
+    }
+
+
+def _ndjson(records):
+    return "".join(json.dumps(r) + "\n" for r in records).encode()
+
+
+def _lines(body, chunk_size=7, gzipped=True):
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def collect():
+        return [line async for _, line in iter_ndjson_lines(chunks(), gzipped=gzipped)]
+
+    return asyncio.run(collect())
+
+
+def test_concatenated_gzip_members_are_all_read():
+    body = gzip.compress(b'{"a":1}\n{"a":2}\n') + gzip.compress(b'{"a":3}\n') + gzip.compress(b'{"a":4}')
+    for chunk_size in (1, 7, len(body)):
+        assert _lines(body, chunk_size) == [b'{"a":1}', b'{"a":2}', b'{"a":3}', b'{"a":4}']
+
+
+def test_trailing_bytes_after_gzip_are_rejected():
+    with pytest.raises(NDJSONError, match="trailing data"):
+        _lines(gzip.compress(b'{"a":1}\n') + b"junk after the stream")
+
+
+def test_truncated_gzip_member_is_rejected():
+    second = gzip.compress(b'{"a":2}\n')
+    with pytest.raises(NDJSONError, match="truncated"):
+        _lines(gzip.compress(b'{"a":1}\n') + second[:len(second) // 2])
+
+
+@pytest.fixture
+def client():
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
+
+
+def test_stream_ingest_reads_every_gzip_member(client):
+    records = [_decision(n) for n in range(5)]
+    body = gzip.compress(_ndjson(records[:2])) + gzip.compress(_ndjson(records[2:]))
+    resp = client.post("/api/governance-decisions/stream", content=body,
+                       headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.json()["accepted"] == 5
+
+
+def test_stream_ingest_rejects_trailing_junk(client):
+    body = gzip.compress(_ndjson([_decision(0), _decision(1)])) + b"not gzip"
+    resp = client.post("/api/governance-decisions/stream", content=body,
+                       headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+    assert resp.status_code == 400
+    assert "trailing data" in resp.json()["detail"]
@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from aicomplyr_upload_store import MultipartFileStream, UploadError, UploadStore
+
+BOUNDARY = "----aicomplyr-test"
+
+
+def _form(*parts) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def _chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UploadStore(str(tmp_path), fsync=False)
+    yield store
+    store.close()
+
+
+async def _save_form(store, body: bytes, chunk_size: int) -> dict:
+    file = MultipartFileStream(f"multipart/form-data; boundary={BOUNDARY}", _chunked(body, chunk_size))
+    return await store.save_stream(await file.open(), file)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_multipart_file_streams_into_store(store, chunk_size):
+    data = os.urandom(20_000)
+    body = _form(("note", None, b"ignored"), ("file", "../evidence.bin", data), ("after", None, b"x"))
+
+    stored = asyncio.run(_save_form(store, body, chunk_size))
+
+    assert stored["filename"] == "evidence.bin"
+    assert stored["sha256"] == hashlib.sha256(data).hexdigest()
+    with open(stored["path"], "rb") as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize("body, status", [
+    (_form(("other", "a.txt", b"data")), 422),
+    (_form(("file", "a.txt", b"data" * 100))[:-100], 400),
+], ids=["no file field", "truncated file field"])
+def test_multipart_without_a_complete_file_field_is_rejected(store, body, status):
+    with pytest.raises(UploadError) as raised:
+        asyncio.run(_save_form(store, body, 64))
+    assert raised.value.status_code == status
+    assert os.listdir(os.path.join(store.root, ".partial")) == []
+
+
+def test_session_with_missing_part_file_is_not_found(tmp_path):
+    async def scenario():
+        store = UploadStore(str(tmp_path), fsync=False)
+        upload_id = (await store.create("a.txt"))["upload_id"]
+        store.close()
+        os.unlink(os.path.join(tmp_path, ".partial", upload_id + ".part"))
+
+        # A restarted server only has the session's metadata left
+        restarted = UploadStore(str(tmp_path), fsync=False)
+        try:
+            with pytest.raises(UploadError) as raised:
+                await restarted.status(upload_id)
+        finally:
+            restarted.close()
+        return raised.value.status_code
+
+    assert asyncio.run(scenario()) == 404
+    assert os.listdir(os.path.join(tmp_path, ".partial")) == []